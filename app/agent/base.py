@@ -1,5 +1,6 @@
 import asyncio
 import re
+import time
 from abc import ABC, abstractmethod
 from collections import defaultdict, deque
 from contextlib import asynccontextmanager
@@ -24,9 +25,11 @@ from app.config import Config
 from app.llm import LLM
 from app.logger import logger
 from app.memory import Memory
+from app.metrics import AGENT_STEP_SECONDS
 from app.sandbox.client import SANDBOX_CLIENT
 from app.schema import ROLE_TYPE, AgentState, Message
 
+
 EventHandler = Callable[..., Coroutine[Any, Any, None]]
 
 P = ParamSpec("P")
@@ -38,12 +41,17 @@ class EventItem(NamedTuple):
     kwargs: dict
     step: int
     timestamp: datetime
+    # `EventQueue.COALESCE` or `EventQueue.DROP`, applied to every queue it enters
+    policy: Optional[str] = None
 
 
 class EventPattern:
     def __init__(self, pattern: str, handler: EventHandler):
         self.pattern: Pattern = re.compile(pattern)
         self.handler: EventHandler = handler
+        # Events waiting for this handler, drained in order by a single worker
+        self.pending: deque[EventItem] = deque()
+        self.worker: Optional[asyncio.Task] = None
 
     # Event constants
 
@@ -66,24 +74,76 @@ class BaseAgentEvents:
     STATE_STUCK_DETECTED = f"{BASE_AGENT_EVENTS_PREFIX}:state:stuck_detected"
     STATE_STUCK_HANDLED = f"{BASE_AGENT_EVENTS_PREFIX}:state:stuck_handled"
     # Step events
+    STEP_START = f"{BASE_AGENT_EVENTS_PREFIX}:step:start"
+    STEP_COMPLETE = f"{BASE_AGENT_EVENTS_PREFIX}:step:complete"
+    STEP_ERROR = f"{BASE_AGENT_EVENTS_PREFIX}:step:error"
     STEP_MAX_REACHED = f"{BASE_AGENT_EVENTS_PREFIX}:step_max_reached"
     # Memory events
     MEMORY_ADDED = f"{BASE_AGENT_EVENTS_PREFIX}:memory:added"
+    # LLM events
+    LLM_STREAM = f"{BASE_AGENT_EVENTS_PREFIX}:llm:stream"
 
 
 class EventQueue:
-    def __init__(self):
+    """Queue dispatching agent events to the handlers whose pattern matches.
+
+    Every handler has its own worker, so a slow handler does not hold up the
+    others while each handler still receives events in emission order.
+
+    The queue, and the backlog of each handler, hold at most `max_size` events.
+    High-frequency events can be put with a policy: `COALESCE` merges the event
+    into the previous one when it has the same name and step (concatenating
+    their "delta"), `DROP` discards the event while the queue or backlog it
+    enters is full. Events without a policy are always queued.
+    """
+
+    COALESCE = "coalesce"
+    DROP = "drop"
+
+    def __init__(self, max_size: int = 10000):
         self.queue: deque[EventItem] = deque()
-        self._processing = False
-        self._lock = asyncio.Lock()
+        self.max_size = max_size
+        self.dropped = 0
         self._event = asyncio.Event()
         self._task: Optional[asyncio.Task] = None
         self._handlers: List[EventPattern] = []
+        # Event name -> matching handlers, reset whenever a handler is added
+        self._dispatch_cache: Dict[str, List[EventPattern]] = {}
 
-    def put(self, event: EventItem) -> None:
-        self.queue.append(event)
-        self._event.set()
-        pass
+    def put(self, event: EventItem, policy: Optional[str] = None) -> None:
+        if policy is not None:
+            event = event._replace(policy=policy)
+        if self._enqueue(self.queue, event):
+            self._event.set()
+
+    def _enqueue(self, queue: deque[EventItem], event: EventItem) -> bool:
+        """Append an event to the queue or a handler backlog, applying its policy.
+
+        Returns whether the event was appended rather than merged or dropped.
+        """
+        if event.policy == self.COALESCE and queue:
+            last = queue[-1]
+            if last.name == event.name and last.step == event.step:
+                queue[-1] = last._replace(kwargs=self._merge(last.kwargs, event.kwargs))
+                return False
+        if event.policy is not None and len(queue) >= self.max_size:
+            if not self.dropped:
+                logger.warning(
+                    f"Event queue full ({self.max_size}), dropping {event.name} events"
+                )
+            self.dropped += 1
+            return False
+        queue.append(event)
+        return True
+
+    @staticmethod
+    def _merge(previous: dict, current: dict) -> dict:
+        merged = {**previous, **current}
+        if isinstance(previous.get("delta"), str) and isinstance(
+            current.get("delta"), str
+        ):
+            merged["delta"] = previous["delta"] + current["delta"]
+        return merged
 
     def add_handler(self, event_pattern: str, handler: EventHandler) -> None:
         """Add an event handler with regex pattern support.
@@ -95,53 +155,41 @@ class EventQueue:
         if not callable(handler):
             raise ValueError("Event handler must be a callable")
         self._handlers.append(EventPattern(event_pattern, handler))
+        self._dispatch_cache.clear()
+
+    def _match(self, event_name: str) -> List[EventPattern]:
+        handlers = self._dispatch_cache.get(event_name)
+        if handlers is None:
+            handlers = [p for p in self._handlers if p.pattern.match(event_name)]
+            self._dispatch_cache[event_name] = handlers
+        return handlers
 
     async def process_events(self) -> None:
         logger.info("Event processing loop started")
         while True:
             try:
-                logger.debug("Waiting for events...")
                 await self._event.wait()
-                logger.debug("Event received, processing...")
-
-                async with self._lock:
-                    while self.queue:
-                        event = self.queue.popleft()
-                        logger.debug(f"Processing event: {event.name}")
-
-                        if not self._handlers:
-                            logger.warning("No event handlers registered")
-                            continue
-
-                        handler_found = False
-                        for pattern in self._handlers:
-                            if pattern.pattern.match(event.name):
-                                handler_found = True
-                                try:
-                                    kwargs = {
-                                        "event_name": event.name,
-                                        "step": event.step,
-                                        **event.kwargs,
-                                    }
-                                    logger.debug(
-                                        f"Calling handler for {event.name} with kwargs: {kwargs}"
-                                    )
-                                    await pattern.handler(**kwargs)
-                                except Exception as e:
-                                    logger.error(
-                                        f"Error in event handler for {event.name}: {str(e)}"
-                                    )
-                                    logger.exception(e)
-
-                        if not handler_found:
-                            logger.warning(
-                                f"No matching handler found for event: {event.name}"
+                self._event.clear()
+
+                while self.queue:
+                    event = self.queue.popleft()
+                    if not self._handlers:
+                        logger.warning("No event handlers registered")
+                        continue
+
+                    handlers = self._match(event.name)
+                    if not handlers:
+                        logger.warning(
+                            f"No matching handler found for event: {event.name}"
+                        )
+                    for pattern in handlers:
+                        # The worker may lag behind, so its backlog is bounded too
+                        self._enqueue(pattern.pending, event)
+                        if pattern.worker is None or pattern.worker.done():
+                            pattern.worker = asyncio.create_task(
+                                self._run_handler(pattern)
                             )
 
-                    if not self.queue:
-                        logger.debug("Queue empty, clearing event")
-                        self._event.clear()
-
             except asyncio.CancelledError:
                 logger.info("Event processing loop cancelled")
                 break
@@ -151,6 +199,19 @@ class EventQueue:
                 await asyncio.sleep(1)
                 continue
 
+    @staticmethod
+    async def _run_handler(pattern: EventPattern) -> None:
+        """Deliver the pending events of one handler, in order"""
+        while pattern.pending:
+            event = pattern.pending.popleft()
+            try:
+                await pattern.handler(
+                    event_name=event.name, step=event.step, **event.kwargs
+                )
+            except Exception as e:
+                logger.error(f"Error in event handler for {event.name}: {str(e)}")
+                logger.exception(e)
+
     def start(self) -> None:
         if self._task is None or self._task.done():
             self._task = asyncio.create_task(self.process_events())
@@ -158,6 +219,9 @@ class EventQueue:
     def stop(self) -> None:
         if self._task and not self._task.done():
             self._task.cancel()
+        for pattern in self._handlers:
+            if pattern.worker and not pattern.worker.done():
+                pattern.worker.cancel()
 
 
 class BaseAgent(BaseModel, ABC):
@@ -169,6 +233,8 @@ class BaseAgent(BaseModel, ABC):
 
     enable_event_queue: bool = Field(default=True, description="Enable event queue")
     _private_event_queue: EventQueue = PrivateAttr(default_factory=EventQueue)
+    # perf_counter() at the last step start, for the step duration metric
+    _step_started_at: Optional[float] = PrivateAttr(default=None)
 
     # Core attributes
     name: str = Field(..., description="Unique name of the agent")
@@ -351,9 +417,12 @@ class BaseAgent(BaseModel, ABC):
                     raise
 
                 # Check for stuck state
-                if self.is_stuck():
-                    self.emit(BaseAgentEvents.STATE_STUCK_DETECTED, {})
-                    self.handle_stuck_state()
+                stuck_reason = self.stuck_reason()
+                if stuck_reason:
+                    self.emit(
+                        BaseAgentEvents.STATE_STUCK_DETECTED, {"reason": stuck_reason}
+                    )
+                    self.handle_stuck_state(stuck_reason)
 
                 results.append(f"Step {self.current_step}: {step_result}")
 
@@ -474,9 +543,13 @@ class BaseAgent(BaseModel, ABC):
         - step:error: On step execution error
         """
 
-    def handle_stuck_state(self):
+    def handle_stuck_state(self, reason: str = "duplicate_content"):
         """Handle stuck state by adding a prompt to change strategy"""
-        stuck_prompt = "\
+        if reason == "repeated_tool_call":
+            stuck_prompt = "\
+        Observed the same tool call with the same arguments repeatedly. Its result will not change; use a different tool, different arguments, or a new strategy."
+        else:
+            stuck_prompt = "\
         Observed duplicate responses. Consider new strategies and avoid repeating ineffective paths already attempted."
         self.next_step_prompt = f"{stuck_prompt}\n{self.next_step_prompt}"
         logger.warning(f"Agent detected stuck state. Added prompt: {stuck_prompt}")
@@ -487,21 +560,19 @@ class BaseAgent(BaseModel, ABC):
 
     def is_stuck(self) -> bool:
         """Check if the agent is stuck in a loop by detecting duplicate content"""
-        if len(self.memory.messages) < 2:
-            return False
+        return self.stuck_reason() is not None
 
-        last_message = self.memory.messages[-1]
-        if not last_message.content:
-            return False
-
-        # Count identical content occurrences
-        duplicate_count = sum(
-            1
-            for msg in reversed(self.memory.messages[:-1])
-            if msg.role == "assistant" and msg.content == last_message.content
-        )
+    def stuck_reason(self) -> Optional[str]:
+        """Why the agent looks stuck in a loop, or None.
 
-        return duplicate_count >= self.duplicate_threshold
+        Uses the hash index kept by memory, so the check is constant time
+        regardless of the transcript length.
+        """
+        if self.memory.duplicate_count() >= self.duplicate_threshold:
+            return "duplicate_content"
+        if self.memory.repeated_tool_call_count() >= self.duplicate_threshold:
+            return "repeated_tool_call"
+        return None
 
     @property
     def messages(self) -> List[Message]:
@@ -540,12 +611,16 @@ class BaseAgent(BaseModel, ABC):
             raise ValueError("Event handler must be a callable")
         self._private_event_queue.add_handler(event_pattern, handler)
 
-    def emit(self, event_name: str, data: Dict[str, Any]) -> None:
+    def emit(
+        self, event_name: str, data: Dict[str, Any], policy: Optional[str] = None
+    ) -> None:
         """Emit an event and add it to the processing queue.
 
         Args:
             event_name: The name of the event to emit
             data: Event data dictionary
+            policy: Optional `EventQueue.COALESCE` or `EventQueue.DROP` for
+                high-frequency events, see `EventQueue`
 
         Example:
             ```python
@@ -562,6 +637,7 @@ class BaseAgent(BaseModel, ABC):
             agent.on("agent:state:.*", on_state_events)
             ```
         """
+        self._record_step_metrics(event_name)
         if not self.enable_event_queue:
             return
         event = EventItem(
@@ -570,7 +646,29 @@ class BaseAgent(BaseModel, ABC):
             step=self.current_step,
             timestamp=datetime.now(),
         )
-        self._private_event_queue.put(event)
+        self._private_event_queue.put(event, policy)
+
+    def _record_step_metrics(self, event_name: str) -> None:
+        if event_name == BaseAgentEvents.STEP_START:
+            self._step_started_at = time.perf_counter()
+        elif (
+            event_name in (BaseAgentEvents.STEP_COMPLETE, BaseAgentEvents.STEP_ERROR)
+            and self._step_started_at is not None
+        ):
+            AGENT_STEP_SECONDS.observe(
+                time.perf_counter() - self._step_started_at,
+                agent=self.name,
+                outcome=(
+                    "success"
+                    if event_name == BaseAgentEvents.STEP_COMPLETE
+                    else "error"
+                ),
+            )
+            self._step_started_at = None
+
+    def emit_llm_stream(self, delta: str) -> None:
+        """Stream sink for `LLM.ask` that forwards content deltas as events."""
+        self.emit(BaseAgentEvents.LLM_STREAM, {"delta": delta}, EventQueue.COALESCE)
 
     async def terminate(self):
         """Request to terminate the current task."""
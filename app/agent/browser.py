@@ -19,6 +19,7 @@ from app.prompt.browser import NEXT_STEP_PROMPT, SYSTEM_PROMPT
 from app.schema import Message, ToolChoice
 from app.tool import BrowserUseTool, Terminate, ToolCollection
 
+
 # Avoid circular import if BrowserAgent needs BrowserContextHelper
 if TYPE_CHECKING:
     from app.agent.base import BaseAgent  # Or wherever memory is defined
@@ -78,10 +79,6 @@ class BrowserContextHelper:
                 content_below_info = f" ({pixels_below} pixels)"
 
             if self._current_base64_image:
-                image_message = Message.user_message(
-                    content="Current browser screenshot:",
-                    base64_image=self._current_base64_image,
-                )
                 # Check if the current image is similar to the previous one
                 similar_image_found = False
                 if self._pre_base64_image and calculate_image_similarity(
@@ -108,6 +105,11 @@ class BrowserContextHelper:
                 self._pre_base64_image = self._current_base64_image
                 self._pre_base64_path = screenshot_path
 
+                image_message = Message.user_message(
+                    content="Current browser screenshot:",
+                    base64_image=self._current_base64_image,
+                    image_path=screenshot_path,
+                )
                 await self.agent.memory.add_message(image_message)
                 self._current_base64_image = None  # Consume the image after adding
 
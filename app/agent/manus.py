@@ -10,7 +10,7 @@ from app.agent.react import ReActAgent
 from app.agent.toolcall import ToolCallContextHelper
 from app.logger import logger
 from app.prompt.manus import NEXT_STEP_PROMPT, PLAN_PROMPT, SYSTEM_PROMPT
-from app.schema import Message
+from app.schema import Message, Role
 from app.tool import Terminate, ToolCollection
 from app.tool.base import BaseTool
 from app.tool.bash import Bash
@@ -22,6 +22,7 @@ from app.tool.python_execute import PythonExecute
 from app.tool.str_replace_editor import StrReplaceEditor
 from app.tool.web_search import WebSearch
 
+
 SYSTEM_TOOLS: list[BaseTool] = [
     Bash(),
     WebSearch(),
@@ -42,6 +43,8 @@ class McpToolConfig(BaseModel):
     command: str
     args: list[str]
     env: dict[str, str]
+    # Server tools whose calls may run in parallel, True for all of them
+    concurrency_safe: Union[bool, list[str]] = False
 
 
 class Manus(ReActAgent):
@@ -127,9 +130,11 @@ class Manus(ReActAgent):
             task_dir=self.task_dir,
         )
 
-        await self.update_memory(
-            role="system", content=self.system_prompt, base64_image=None
-        )
+        # A conversation resumed from the memory store already has its system prompt
+        if not any(message.role == Role.SYSTEM for message in self.memory.messages):
+            await self.update_memory(
+                role="system", content=self.system_prompt, base64_image=None
+            )
 
         self.browser_context_helper = BrowserContextHelper(self)
         self.tool_call_context_helper = ToolCallContextHelper(self)
@@ -152,6 +157,7 @@ class Manus(ReActAgent):
                             "command": tool.command,
                             "args": tool.args,
                             "env": tool.env,
+                            "concurrency_safe": tool.concurrency_safe,
                         }
                     )
 
@@ -176,6 +182,7 @@ class Manus(ReActAgent):
                 Message.user_message(self.task_request),
             ],
             system_msgs=[Message.system_message(self.system_prompt)],
+            stream_sink=self.emit_llm_stream,
         )
 
         # Add the planning message to memory
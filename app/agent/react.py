@@ -8,16 +8,13 @@ from app.llm import LLM
 from app.memory import Memory
 from app.schema import AgentState
 
+
 REACT_AGENT_EVENTS_PREFIX = "agent:lifecycle:step"
 REACT_AGENT_EVENTS_THINK_PREFIX = "agent:lifecycle:step:think"
 REACT_AGENT_EVENTS_ACT_PREFIX = "agent:lifecycle:step:act"
 
 
 class ReActAgentEvents(BaseAgentEvents):
-    STEP_START = f"{REACT_AGENT_EVENTS_PREFIX}:start"
-    STEP_COMPLETE = f"{REACT_AGENT_EVENTS_PREFIX}:complete"
-    STEP_ERROR = f"{REACT_AGENT_EVENTS_PREFIX}:error"
-
     THINK_START = f"{REACT_AGENT_EVENTS_THINK_PREFIX}:start"
     THINK_COMPLETE = f"{REACT_AGENT_EVENTS_THINK_PREFIX}:complete"
     THINK_ERROR = f"{REACT_AGENT_EVENTS_THINK_PREFIX}:error"
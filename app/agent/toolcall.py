@@ -1,19 +1,23 @@
 import asyncio
 import json
 import os
-from typing import TYPE_CHECKING, Any, List, Optional
+import time
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, Any, List, Optional, Tuple
 
 from pydantic import model_validator
 
-from app.agent.base import BaseAgent, BaseAgentEvents
+from app.agent.base import BaseAgent, BaseAgentEvents, EventQueue
 from app.agent.react import ReActAgent
 from app.exceptions import TokenLimitExceeded
 from app.logger import logger
+from app.metrics import TOOL_EXECUTION_SECONDS, TOOL_EXECUTIONS
 from app.schema import TOOL_CHOICE_TYPE, AgentState, Message, ToolCall, ToolChoice
 from app.tool import CreateChatCompletion, Terminate, ToolCollection
 from app.tool.base import BaseTool
-from app.tool.mcp_sandbox import MCPToolCallSandboxHost
 from app.tool.host_mcp import host_mcp_tools  # 导入宿主机MCP工具
+from app.tool.mcp_sandbox import MCPToolCallSandboxHost
+
 
 # Avoid circular import if BrowserAgent needs BrowserContextHelper
 if TYPE_CHECKING:
@@ -22,6 +26,12 @@ if TYPE_CHECKING:
 
 TOOL_CALL_REQUIRED = "Tool calls required but none provided"
 
+# Image returned by the tool call running in the current task, so concurrent
+# calls do not overwrite each other's image
+_tool_call_image: ContextVar[Optional[str]] = ContextVar(
+    "tool_call_image", default=None
+)
+
 
 TOOL_CALL_THINK_AGENT_EVENTS_PREFIX = "agent:lifecycle:step:think:tool"
 TOOL_CALL_ACT_AGENT_EVENTS_PREFIX = "agent:lifecycle:step:act:tool"
@@ -29,6 +39,9 @@ TOOL_CALL_ACT_AGENT_EVENTS_PREFIX = "agent:lifecycle:step:act:tool"
 
 class ToolCallAgentEvents(BaseAgentEvents):
     TOOL_SELECTED = f"{TOOL_CALL_THINK_AGENT_EVENTS_PREFIX}:selected"
+    # Streaming events, emitted while the LLM response is still being generated
+    TOOL_THOUGHT_DELTA = f"{TOOL_CALL_THINK_AGENT_EVENTS_PREFIX}:thought:delta"
+    TOOL_CALL_READY = f"{TOOL_CALL_THINK_AGENT_EVENTS_PREFIX}:call:ready"
 
     TOOL_START = f"{TOOL_CALL_ACT_AGENT_EVENTS_PREFIX}:start"
     TOOL_COMPLETE = f"{TOOL_CALL_ACT_AGENT_EVENTS_PREFIX}:complete"
@@ -52,6 +65,14 @@ class ToolCallContextHelper:
 
     max_observe: int = 10000
 
+    # Stream tool requests so thoughts and tool calls are emitted as they arrive,
+    # None follows the LLM config's `stream_tool_calls`
+    stream_tool_calls: Optional[bool] = None
+
+    # Run consecutive concurrency-safe tool calls of a step in parallel
+    parallel_tool_calls: bool = True
+    max_parallel_tool_calls: int = 4
+
     def __init__(self, agent: "BaseAgent"):
         self.agent = agent
         self.mcp = MCPToolCallSandboxHost(agent.task_id)
@@ -64,7 +85,11 @@ class ToolCallContextHelper:
     async def add_mcp(self, tool: dict) -> None:
         """Add a new MCP client to the available tools collection."""
         if isinstance(tool, dict) and "client_id" in tool and "server_url" in tool:
-            await self.mcp.add_sse_client(tool["client_id"], tool["server_url"])
+            await self.mcp.add_sse_client(
+                tool["client_id"],
+                tool["server_url"],
+                tool.get("concurrency_safe", False),
+            )
             client = self.mcp.get_client(tool["client_id"])
             if client:
                 for mcp_tool in client.tool_map.values():
@@ -75,6 +100,7 @@ class ToolCallContextHelper:
                 tool["command"],
                 tool.get("args", []),
                 tool.get("env", {}),
+                tool.get("concurrency_safe", False),
             )
             client = self.mcp.get_client(tool["client_id"])
             if client:
@@ -108,11 +134,16 @@ class ToolCallContextHelper:
                 logger.error(f"连接宿主机MCP服务失败: {str(e)}")
                 self.host_mcp_connected = False
 
+    def _memory_tokens(self) -> Optional[int]:
+        """The memory's running token total, if it was counted with the agent's LLM"""
+        memory = self.agent.memory
+        return memory.token_count if memory.llm is self.agent.llm else None
+
     async def ask_tool(self) -> bool:
         """Process current state and decide next actions using tools"""
         if self.agent.next_step_prompt:
             user_msg = Message.user_message(self.agent.next_step_prompt)
-            self.agent.messages += [user_msg]
+            await self.agent.memory.add_message(user_msg)
 
         try:
             # Get response with tool options
@@ -120,6 +151,18 @@ class ToolCallContextHelper:
                 messages=self.agent.messages,
                 tools=self.available_tools.to_params(),
                 tool_choice=self.tool_choices,
+                tools_tokens=self.available_tools.count_tokens(self.agent.llm),
+                messages_tokens=self._memory_tokens(),
+                formatted_messages=self.agent.memory.to_wire(
+                    self.agent.llm.supports_images
+                ),
+                stream=(
+                    self.stream_tool_calls
+                    if self.stream_tool_calls is not None
+                    else self.agent.llm.stream_tool_calls
+                ),
+                stream_sink=self._on_thought_delta,
+                on_tool_call=self._on_tool_call_ready,
             )
         except ValueError:
             raise
@@ -217,6 +260,23 @@ class ToolCallContextHelper:
             )
             return False
 
+    def _on_thought_delta(self, delta: str) -> None:
+        self.agent.emit(
+            ToolCallAgentEvents.TOOL_THOUGHT_DELTA,
+            {"delta": delta},
+            EventQueue.COALESCE,
+        )
+
+    def _on_tool_call_ready(self, call: Any) -> None:
+        self.agent.emit(
+            ToolCallAgentEvents.TOOL_CALL_READY,
+            {
+                "id": call.id,
+                "name": call.function.name,
+                "arguments": json.loads(call.function.arguments or "{}"),
+            },
+        )
+
     async def execute_tool(self) -> str:
         """Execute tool calls and handle their results"""
         self.agent.emit(
@@ -233,31 +293,73 @@ class ToolCallContextHelper:
             )
 
         results = []
+        for batch in self._tool_call_batches():
+            if len(batch) == 1:
+                outcomes = [await self._run_tool_call(batch[0])]
+            else:
+                semaphore = asyncio.Semaphore(self.max_parallel_tool_calls)
+
+                async def run_bounded(command: ToolCall) -> Tuple[str, Optional[str]]:
+                    async with semaphore:
+                        return await self._run_tool_call(command)
+
+                outcomes = await asyncio.gather(
+                    *(run_bounded(command) for command in batch)
+                )
+
+            # Add tool responses to memory in the order the calls were made
+            for command, (result, base64_image) in zip(batch, outcomes):
+                tool_msg = Message.tool_message(
+                    content=result,
+                    tool_call_id=command.id,
+                    name=command.function.name,
+                    base64_image=base64_image,
+                )
+                await self.agent.memory.add_message(tool_msg)
+                results.append(result)
+        self.agent.emit(ToolCallAgentEvents.TOOL_COMPLETE, {"results": results})
+        return results
 
+    def _tool_call_batches(self) -> List[List[ToolCall]]:
+        """Group consecutive concurrency-safe tool calls, other calls run alone.
+
+        Serial tools therefore still see the effects of every call made before them.
+        """
+        batches: List[List[ToolCall]] = []
+        batch_open = False
         for command in self.tool_calls:
-            # Reset base64_image for each tool call
-            self._current_base64_image = None
+            name = command.function.name if command and command.function else None
+            tool = self.available_tools.tool_map.get(name)
+            parallel = (
+                self.parallel_tool_calls and tool is not None and tool.concurrency_safe
+            )
+            if parallel and batch_open:
+                batches[-1].append(command)
+            else:
+                batches.append([command])
+            batch_open = parallel
+        return batches
 
-            result = await self.execute_tool_command(command)
+    async def _run_tool_call(self, command: ToolCall) -> Tuple[str, Optional[str]]:
+        """Execute a tool call, returning its (truncated) result and image"""
+        # Reset base64_image for each tool call
+        self._current_base64_image = None
+        _tool_call_image.set(None)
 
-            if self.max_observe:
-                result = result[: self.max_observe]
+        result = await self.execute_tool_command(command)
 
-            logger.info(
-                f"🎯 Tool '{command.function.name}' completed its mission! Result: {result}"
-            )
+        if self.max_observe:
+            result = result[: self.max_observe]
 
-            # Add tool response to memory
-            tool_msg = Message.tool_message(
-                content=result,
-                tool_call_id=command.id,
-                name=command.function.name,
-                base64_image=self._current_base64_image,
-            )
-            await self.agent.memory.add_message(tool_msg)
-            results.append(result)
-        self.agent.emit(ToolCallAgentEvents.TOOL_COMPLETE, {"results": results})
-        return results
+        logger.info(
+            f"🎯 Tool '{command.function.name}' completed its mission! Result: {result}"
+        )
+        return result, _tool_call_image.get()
+
+    @staticmethod
+    def _record_tool_metrics(name: str, started: float, outcome: str) -> None:
+        TOOL_EXECUTION_SECONDS.observe(time.perf_counter() - started, tool=name)
+        TOOL_EXECUTIONS.inc(tool=name, outcome=outcome)
 
     async def execute_tool_command(self, command: ToolCall) -> str:
         """Execute a single tool call with robust error handling"""
@@ -279,7 +381,15 @@ class ToolCallContextHelper:
                 ToolCallAgentEvents.TOOL_EXECUTE_START,
                 {"id": command_id, "name": name, "args": args},
             )
-            result = await self.available_tools.execute(name=name, tool_input=args)
+            started = time.perf_counter()
+            try:
+                result = await self.available_tools.execute(name=name, tool_input=args)
+            except Exception:
+                self._record_tool_metrics(name, started, "error")
+                raise
+            self._record_tool_metrics(
+                name, started, "error" if getattr(result, "error", None) else "success"
+            )
             self.agent.emit(
                 ToolCallAgentEvents.TOOL_EXECUTE_COMPLETE,
                 {
@@ -297,6 +407,7 @@ class ToolCallContextHelper:
             if hasattr(result, "base64_image") and result.base64_image:
                 # Store the base64_image for later use in tool_message
                 self._current_base64_image = result.base64_image
+                _tool_call_image.set(result.base64_image)
 
                 # Format result for display
                 observation = (
@@ -1,16 +1,38 @@
 from datetime import datetime
+from enum import Enum
+from typing import Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 from app.agent.manus import Manus
+from app.llm import TokenUsage
+
+
+class TaskStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    TERMINATED = "terminated"
+    FAILED = "failed"
+
+
+FINISHED_STATUSES = {TaskStatus.COMPLETED, TaskStatus.TERMINATED, TaskStatus.FAILED}
 
 
 class Task(BaseModel):
     id: str
     created_at: datetime
     agent: "Manus"
+    status: TaskStatus = TaskStatus.RUNNING
+    run_id: Optional[str] = None
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
+    # Tokens of this run only, the agent's LLM may be shared with other tasks
+    usage: TokenUsage = Field(default_factory=TokenUsage)
 
     def model_dump(self, *args, **kwargs):
         data = super().model_dump(*args, **kwargs)
         data["created_at"] = self.created_at.isoformat()
+        if self.finished_at is not None:
+            data["finished_at"] = self.finished_at.isoformat()
         return data
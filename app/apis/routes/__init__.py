@@ -1,11 +1,16 @@
 from fastapi import APIRouter
 
+from app.apis.routes.llm import router as llm_router
+from app.apis.routes.metrics import router as metrics_router
+from app.apis.routes.mounts import router as mounts_router
 from app.apis.routes.tasks import router as tasks_router
 from app.apis.routes.tools import router as tools_router
-from app.apis.routes.mounts import router as mounts_router
+
 
 router = APIRouter()
 
 router.include_router(tools_router)
 router.include_router(tasks_router)
+router.include_router(llm_router)
+router.include_router(metrics_router)
 router.include_router(mounts_router, prefix="/container", tags=["容器管理"])
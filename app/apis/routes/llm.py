@@ -0,0 +1,33 @@
+from fastapi import APIRouter
+
+from app.http_pool import http_client_pool
+from app.llm_cache import llm_response_cache
+from app.llm_router import router_stats
+from app.rate_limiter import rate_limiter_stats
+
+
+router = APIRouter(prefix="/llm", tags=["llm"])
+
+
+@router.get("/pool")
+async def get_pool_stats():
+    """Connection pool statistics of the shared LLM HTTP clients, keyed by base_url"""
+    return http_client_pool.stats()
+
+
+@router.get("/rate-limits")
+async def get_rate_limit_stats():
+    """Queue depth, in-flight requests and wait times of the LLM rate limiters"""
+    return rate_limiter_stats()
+
+
+@router.get("/cache")
+async def get_cache_stats():
+    """Hit/miss counters and saved tokens of the LLM response cache"""
+    return llm_response_cache.stats()
+
+
+@router.get("/endpoints")
+async def get_endpoint_stats():
+    """Latency percentiles, error rates and hedging counters of the LLM routers"""
+    return router_stats()
@@ -0,0 +1,17 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.apis.services.task_manager import BROKER_QUEUED_JOBS, task_manager
+from app.metrics import registry
+
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """LLM, agent step, tool, sandbox and task metrics in the Prometheus text format"""
+    BROKER_QUEUED_JOBS.set(await task_manager.broker.queued_jobs())
+    return PlainTextResponse(
+        registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
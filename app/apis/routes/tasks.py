@@ -1,138 +1,122 @@
 import asyncio
 import json
 from json import dumps
-from pathlib import Path
-from typing import List, Optional, Union, cast
-
-from fastapi import APIRouter, Body, File, Form, HTTPException, UploadFile
+from typing import List, Optional
+
+from fastapi import (
+    APIRouter,
+    Body,
+    File,
+    Form,
+    Header,
+    HTTPException,
+    Query,
+    UploadFile,
+)
 from fastapi.responses import JSONResponse, StreamingResponse
 
 from app.agent.base import BaseAgentEvents
-from app.agent.manus import Manus, McpToolConfig
-from app.apis.services.task_manager import task_manager
+from app.apis.models.task import Task, TaskStatus
+from app.apis.services.broker import TaskJob
+from app.apis.services.event_stream import coalesce_events, format_sse_frame
+from app.apis.services.task_lifecycle import memory_usage
+from app.apis.services.task_manager import TaskRejected, task_manager
+from app.apis.services.task_runner import check_capacity, parse_tools, submit_job
+from app.apis.services.upload_service import UploadRejected, save_uploads
 from app.config import LLMSettings, config
-from app.llm import LLM
 from app.logger import logger
-
-router = APIRouter(prefix="/tasks", tags=["tasks"])
-
-AGENT_NAME = "Manus"
+from app.metrics import SSE_SUBSCRIBERS
 
 
-async def handle_agent_event(task_id: str, event_name: str, step: int, **kwargs):
-    """Handle agent events and update task status.
-
-    Args:
-        event_name: Name of the event
-        **kwargs: Additional parameters related to the event
-    """
-    if not task_id:
-        logger.warning(f"No task_id provided for event: {event_name}")
-        return
-
-    # Update task step
-    await task_manager.update_task_progress(
-        task_id=task_id, event_name=event_name, step=step, **kwargs
-    )
+router = APIRouter(prefix="/tasks", tags=["tasks"])
 
 
-async def run_task(task_id: str, prompt: str):
-    """Run the task and set up corresponding event handlers.
+async def event_generator(task_id: str, last_event_id: Optional[str] = None):
+    """Stream a task's events, replaying those after `last_event_id` first.
 
-    Args:
-        task_id: Task ID
-        prompt: Task prompt
-        llm_config: Optional LLM configuration
+    Without a `last_event_id` the stream starts at the task's first event. Any
+    number of clients can stream the same task.
     """
-    try:
-        task = task_manager.tasks[task_id]
-        agent = task.agent
-
-        # Set up event handlers based on all event types defined in the Agent class hierarchy
-        event_patterns = [r"agent:.*"]
-        # Register handlers for each event pattern
-        for pattern in event_patterns:
-            agent.on(
-                pattern,
-                lambda event_name, step, **kwargs: handle_agent_event(
-                    task_id=task_id,
-                    event_name=event_name,
-                    step=step,
-                    **{k: v for k, v in kwargs.items() if k != "task_id"},
-                ),
-            )
-
-        # Run the agent
-        await agent.run(prompt)
-        await agent.cleanup()
-    except Exception as e:
-        logger.error(f"Error in task {task_id}: {str(e)}")
-
-
-async def event_generator(task_id: str):
-    if task_id not in task_manager.queues:
+    broker = task_manager.broker
+    if await broker.get_state(task_id) is None:
         yield f"event: error\ndata: {dumps({'message': 'Task not found'})}\n\n"
         return
 
-    queue = task_manager.queues[task_id]
+    settings = config.event_stream
+    cursor = last_event_id
 
-    while True:
-        try:
-            event = await asyncio.wait_for(queue.get(), timeout=10)
-            formatted_event = dumps(event)
+    SSE_SUBSCRIBERS.inc()
+    try:
+        while True:
+            try:
+                entries = await broker.read_events(
+                    task_id,
+                    cursor,
+                    timeout=10,
+                    window=settings.batch_window,
+                    max_size=settings.max_batch_size,
+                )
+                if entries is None:
+                    break
+                if not entries:
+                    yield ":heartbeat\n\n"
+                    continue
+
+                cursor = entries[-1][0]
+                events = [event for _, event in entries]
+                # Send actual event data
+                yield format_sse_frame(coalesce_events(events), event_id=cursor)
+
+                if any(
+                    event.get("event_name") == BaseAgentEvents.LIFECYCLE_COMPLETE
+                    for event in events
+                ):
+                    break
+            except asyncio.CancelledError:
+                logger.info(f"Client disconnected for task {task_id}")
+                break
+            except Exception as e:
+                logger.error(f"Error in event stream: {str(e)}")
+                yield f"event: error\ndata: {dumps({'message': str(e)})}\n\n"
+                break
+    finally:
+        SSE_SUBSCRIBERS.dec()
 
-            if not event.get("type"):
-                yield ":heartbeat\n\n"
-                continue
 
-            # Send actual event data
-            yield f"data: {formatted_event}\n\n"
+def too_many_tasks(error: TaskRejected) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail=str(error),
+        headers={"Retry-After": str(error.retry_after)},
+    )
 
-            if event.get("event_name") == BaseAgentEvents.LIFECYCLE_COMPLETE:
-                break
-        except asyncio.TimeoutError:
-            yield ":heartbeat\n\n"
-            continue
-        except asyncio.CancelledError:
-            logger.info(f"Client disconnected for task {task_id}")
-            break
-        except Exception as e:
-            logger.error(f"Error in event stream: {str(e)}")
-            yield f"event: error\ndata: {dumps({'message': str(e)})}\n\n"
-            break
-    # Remove the task from the task manager
-    await task_manager.remove_task(task_id)
 
+async def schedule_task(job: TaskJob) -> None:
+    """Queue the task's run, it starts once a slot is free"""
+    try:
+        await submit_job(job)
+    except TaskRejected as e:
+        raise too_many_tasks(e)
 
-def parse_tools(tools: list[str]) -> list[Union[str, McpToolConfig]]:
-    """Parse tools list which may contain both tool names and MCP configurations.
 
-    Args:
-        tools: List of tool strings, which can be either tool names or MCP config JSON strings
+def validate_tools(tools: list[str]) -> None:
+    """Reject invalid MCP tool configurations before the task is queued"""
+    try:
+        parse_tools(tools)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    Returns:
-        List of processed tools, containing both tool names and McpToolConfig objects
 
-    Raises:
-        HTTPException: If any tool configuration is invalid
-    """
-    processed_tools = []
-    for tool in tools:
-        try:
-            tool_config = json.loads(tool)
-            if isinstance(tool_config, dict):
-                mcp_tool = McpToolConfig.model_validate(tool_config)
-                processed_tools.append(mcp_tool)
-            else:
-                processed_tools.append(tool)
-        except json.JSONDecodeError:
-            processed_tools.append(tool)
-        except Exception as e:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Invalid tool configuration for '{tool}': {str(e)}",
-            )
-    return processed_tools
+async def store_uploads(task_id: str, files: List[UploadFile]) -> List[str]:
+    """Save the request's files to the task directory, returning their names"""
+    try:
+        saved = await save_uploads(task_id, files)
+    except UploadRejected as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error saving files of task {task_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error saving file: {str(e)}")
+    return [upload.filename for upload in saved]
 
 
 @router.post("")
@@ -143,8 +127,13 @@ async def create_task(
     tools: Optional[list[str]] = Form(None),
     preferences: Optional[str] = Form(None),
     llm_config: Optional[str] = Form(None),
+    priority: int = Form(0),
     files: Optional[List[UploadFile]] = File(None),
 ):
+    try:
+        await check_capacity()
+    except TaskRejected as e:
+        raise too_many_tasks(e)
     print(
         f"Creating task {task_id} with prompt: {prompt}, should_plan: {should_plan}, tools: {tools}, preferences: {preferences}, llm_config: {llm_config}"
     )
@@ -158,90 +147,43 @@ async def create_task(
                 status_code=400, detail="Invalid preferences JSON format"
             )
 
-    llm_config_obj = None
+    llm_config_dict = None
     if llm_config:
         try:
-            llm_config_obj = LLMSettings.model_validate_json(llm_config)
+            LLMSettings.model_validate_json(llm_config)
+            llm_config_dict = json.loads(llm_config)
         except Exception as e:
             raise HTTPException(
                 status_code=400, detail=f"Invalid llm_config format: {str(e)}"
             )
 
-    processed_tools = parse_tools(tools or [])
-
-    task = task_manager.create_task(
-        task_id,
-        Manus(
-            name=AGENT_NAME,
-            description="A versatile agent that can solve various tasks using multiple tools",
-            should_plan=should_plan,
-            llm=(
-                LLM(config_name=task_id, llm_config=llm_config_obj)
-                if llm_config_obj
-                else None
-            ),
-            enable_event_queue=True,  # Enable event queue
-        ),
-    )
-
-    task.agent.initialize(
-        task_id,
-        language=(
-            preferences_dict.get("language", "English") if preferences_dict else None
-        ),
-        tools=processed_tools,
-        task_request=prompt,
-    )
+    validate_tools(tools or [])
 
-    if files:
-        import os
+    filenames = await store_uploads(task_id, files) if files else []
 
-        task_dir = Path(
-            os.path.join(
-                config.workspace_root,
-                task.agent.task_dir.replace("/workspace/", ""),
-            )
-        )
-        task_dir.mkdir(parents=True, exist_ok=True)
-        for file in files or []:
-            print(task_dir)
-            print(file.filename)
-            file = cast(UploadFile, file)
-            try:
-                safe_filename = Path(file.filename).name
-                if not safe_filename:
-                    raise HTTPException(status_code=400, detail="Invalid filename")
-
-                file_path = task_dir / safe_filename
-
-                MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
-                file_content = file.file.read()
-                if len(file_content) > MAX_FILE_SIZE:
-                    raise HTTPException(status_code=400, detail="File too large")
-
-                with open(file_path, "wb") as f:
-                    f.write(file_content)
-
-            except Exception as e:
-                logger.error(f"Error saving file {file.filename}: {str(e)}")
-                raise HTTPException(
-                    status_code=500, detail=f"Error saving file: {str(e)}"
-                )
-        prompt = (
-            prompt
-            + "\n\n"
-            + "Here are the files I have uploaded: "
-            + "\n\n".join([f"File: {file.filename}" for file in files])
+    await schedule_task(
+        TaskJob(
+            task_id=task_id,
+            prompt=prompt,
+            should_plan=should_plan,
+            tools=tools or [],
+            preferences=preferences_dict,
+            llm_config=llm_config_dict,
+            files=filenames,
+            priority=priority,
         )
-
-    asyncio.create_task(run_task(task.id, prompt))
-    return {"task_id": task.id}
+    )
+    return {"task_id": task_id}
 
 
 @router.get("/{organization_id}/{task_id}/events")
-async def task_events(organization_id: str, task_id: str):
+async def task_events(
+    organization_id: str,
+    task_id: str,
+    last_event_id: Optional[str] = Header(None),
+):
     return StreamingResponse(
-        event_generator(f"{organization_id}/{task_id}"),
+        event_generator(f"{organization_id}/{task_id}", last_event_id),
         media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
@@ -252,12 +194,71 @@ async def task_events(organization_id: str, task_id: str):
 
 
 @router.get("")
-async def get_tasks():
-    sorted_tasks = sorted(
-        task_manager.tasks.values(), key=lambda task: task.created_at, reverse=True
+async def get_tasks(
+    status: Optional[TaskStatus] = Query(None),
+    organization: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(50, ge=1, le=200),
+):
+    """List tasks newest first, from the task index. Use `next_cursor` for the next page"""
+    try:
+        page = task_manager.index.page(
+            status=status, organization=organization, cursor=cursor, limit=limit
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    # Tasks run by workers change status in the broker, not in this index
+    await task_manager.sync_index([entry.id for entry in page.tasks])
+    page.tasks = [
+        entry for entry in page.tasks if task_manager.index.get(entry.id) is not None
+    ]
+    return JSONResponse(
+        content={**page.model_dump(mode="json"), "counts": task_manager.index.counts()},
+        headers={"Content-Type": "application/json"},
     )
+
+
+def agent_state(task: Task) -> dict:
+    agent = task.agent
+    return {
+        "name": agent.name,
+        "state": agent.state.value,
+        "current_step": agent.current_step,
+        "max_steps": agent.max_steps,
+        "should_plan": agent.should_plan,
+        "task_dir": agent.task_dir,
+        "model": agent.llm.model,
+        "total_input_tokens": task.usage.input_tokens,
+        "total_completion_tokens": task.usage.completion_tokens,
+    }
+
+
+@router.get("/{organization_id}/{task_id}")
+async def get_task(organization_id: str, task_id: str):
+    """Full state of a task.
+
+    While the task is held in memory this includes its agent; once evicted only
+    the archived summary of its last run is left.
+    """
+    task_id = f"{organization_id}/{task_id}"
+    entry = task_manager.index.get(task_id)
+    state = await task_manager.broker.get_state(task_id)
+    task = task_manager.tasks.get(task_id)
+    summary = None
+    if task is None or task.finished_at is not None:
+        summary = await task_manager.lifecycle.load_summary(task_id)
+    if entry is None and state is None and task is None and summary is None:
+        raise HTTPException(status_code=404, detail="Task not found")
     return JSONResponse(
-        content=[task.model_dump() for task in sorted_tasks],
+        content={
+            "id": task_id,
+            "index": entry.model_dump(mode="json") if entry else None,
+            "state": state,
+            "agent": agent_state(task) if task else None,
+            "memory": memory_usage(task) if task else None,
+            "messages": task.agent.memory.to_dict_list() if task else None,
+            "summary": summary.model_dump(mode="json") if summary else None,
+        },
         headers={"Content-Type": "application/json"},
     )
 
@@ -271,9 +272,15 @@ async def restart_task(
     preferences: Optional[str] = Form(None),
     llm_config: Optional[str] = Form(None),
     history: Optional[str] = Form(None),
+    priority: int = Form(0),
     files: Optional[list[UploadFile]] = File(None),
 ):
     """Restart a task."""
+    # A run still waiting for a slot is only replaced once the restart is queued
+    try:
+        await check_capacity(task_id)
+    except TaskRejected as e:
+        raise too_many_tasks(e)
     # Parse JSON strings
     preferences_dict = None
     if preferences:
@@ -284,10 +291,11 @@ async def restart_task(
                 status_code=400, detail="Invalid preferences JSON format"
             )
 
-    llm_config_obj = None
+    llm_config_dict = None
     if llm_config:
         try:
-            llm_config_obj = LLMSettings.model_validate_json(llm_config)
+            LLMSettings.model_validate_json(llm_config)
+            llm_config_dict = json.loads(llm_config)
         except Exception as e:
             raise HTTPException(
                 status_code=400, detail=f"Invalid llm_config format: {str(e)}"
@@ -300,82 +308,31 @@ async def restart_task(
         except json.JSONDecodeError:
             raise HTTPException(status_code=400, detail="Invalid history JSON format")
 
-    processed_tools = parse_tools(tools or [])
+    validate_tools(tools or [])
 
     if task_id in task_manager.tasks:
         task = task_manager.tasks[task_id]
         await task.agent.terminate()
+    if task_manager.broker.distributed:
+        await task_manager.broker.request_termination(task_id)
 
-    task = task_manager.create_task(
-        task_id,
-        Manus(
-            name=AGENT_NAME,
-            description="A versatile agent that can solve various tasks using multiple tools",
-            should_plan=should_plan,
-            llm=(
-                LLM(config_name=task_id, llm_config=llm_config_obj)
-                if llm_config_obj
-                else None
-            ),
-            enable_event_queue=True,
-        ),
-    )
-
-    if history_list:
-        for message in history_list:
-            if message["role"] == "user":
-                await task.agent.update_memory(role="user", content=message["message"])
-            else:
-                await task.agent.update_memory(
-                    role="assistant", content=message["message"]
-                )
-
-    task.agent.initialize(
-        task_id,
-        language=(
-            preferences_dict.get("language", "English") if preferences_dict else None
-        ),
-        tools=processed_tools,
-        task_request=prompt,
-    )
-
-    if files:
-        import os
-
-        task_dir = Path(os.path.join(config.workspace_root, task.agent.task_dir))
-        task_dir.mkdir(parents=True, exist_ok=True)
-
-        for file in files or []:
-            file = cast(UploadFile, file)
-            try:
-                safe_filename = Path(file.filename).name
-                if not safe_filename:
-                    raise HTTPException(status_code=400, detail="Invalid filename")
-
-                file_path = task_dir / safe_filename
-
-                MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
-                file_content = file.file.read()
-                if len(file_content) > MAX_FILE_SIZE:
-                    raise HTTPException(status_code=400, detail="File too large")
-
-                with open(file_path, "wb") as f:
-                    f.write(file_content)
+    filenames = await store_uploads(task_id, files) if files else []
 
-            except Exception as e:
-                logger.error(f"Error saving file {file.filename}: {str(e)}")
-                raise HTTPException(
-                    status_code=500, detail=f"Error saving file: {str(e)}"
-                )
-        prompt = (
-            prompt
-            + "\n\n"
-            + "Here are the files I have uploaded: "
-            + "\n\n".join([f"File: {file.filename}" for file in files])
+    await schedule_task(
+        TaskJob(
+            task_id=task_id,
+            prompt=prompt,
+            should_plan=should_plan,
+            tools=tools or [],
+            preferences=preferences_dict,
+            llm_config=llm_config_dict,
+            history=history_list,
+            files=filenames,
+            priority=priority,
+            restart=True,
         )
-
-    asyncio.create_task(run_task(task.id, prompt))
-    return {"task_id": task.id}
+    )
+    return {"task_id": task_id}
 
 
 @router.post("/terminate")
@@ -385,10 +342,33 @@ async def terminate_task(task_id: str = Body(..., embed=True)):
     Args:
         task_id: The ID of the task to terminate
     """
-    if task_id not in task_manager.tasks:
+    state = await task_manager.broker.get_state(task_id)
+    if state is None:
         return {"message": f"Task {task_id} not found"}
 
-    task = task_manager.tasks[task_id]
-    await task.agent.terminate()
+    if task_manager.scheduler.cancel(task_id):
+        # Never started, so the agent will not report the termination itself
+        await task_manager.publish_event(
+            task_id, BaseAgentEvents.LIFECYCLE_TERMINATED, {}
+        )
+        await task_manager.set_status(task_id, TaskStatus.TERMINATED)
+        task_manager.lifecycle.finished(task_id, state.get("run_id"))
+    elif task_id in task_manager.tasks:
+        task = task_manager.tasks[task_id]
+        await task.agent.terminate()
+    elif task_manager.broker.distributed:
+        await task_manager.broker.request_termination(task_id)
 
     return {"message": f"Task {task_id} terminated successfully", "task_id": task_id}
+
+
+@router.get("/stats")
+async def task_stats():
+    """Tasks held in memory, with the memory each one uses"""
+    return task_manager.lifecycle.stats()
+
+
+@router.get("/scheduler")
+async def scheduler_stats():
+    """Running and waiting tasks, globally and per organization"""
+    return task_manager.scheduler.stats()
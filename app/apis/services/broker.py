@@ -0,0 +1,332 @@
+"""Task brokers: where tasks are submitted, their state kept and their events streamed.
+
+`InProcessBroker` (default) keeps everything in the API process, which then also
+runs the agents. `RedisBroker` moves it to Redis, so any number of API replicas
+can accept tasks and serve their event streams while separate workers
+(`run_worker.py`) pull the tasks and run the agents.
+
+Event ids are opaque strings, sent to SSE clients as `id:` and resumed from via
+`Last-Event-ID`.
+"""
+
+import asyncio
+import json
+import uuid
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+from app.agent.base import BaseAgentEvents
+from app.apis.services.event_log import EventLog
+from app.apis.services.event_stream import is_lifecycle_event
+from app.config import BrokerSettings, config
+from app.logger import logger
+
+
+try:
+    from redis import asyncio as aioredis
+except ImportError:  # Only needed for the redis backend
+    aioredis = None
+
+
+# (event id, event) pairs, oldest first
+BrokerEvents = List[Tuple[str, dict]]
+
+
+class TaskJob(BaseModel):
+    """Everything a worker needs to build and run a task's agent"""
+
+    task_id: str
+    prompt: str
+    should_plan: bool = False
+    tools: List[str] = Field(default_factory=list)
+    preferences: Optional[Dict[str, Any]] = None
+    llm_config: Optional[Dict[str, Any]] = None
+    history: Optional[List[Dict[str, Any]]] = None
+    # Names of the files uploaded to the task directory
+    files: List[str] = Field(default_factory=list)
+    priority: int = 0
+    # Identifies this run of the task, a restart submits a new one
+    run_id: str = Field(default_factory=lambda: uuid.uuid4().hex)
+    # Restarts resume the stored conversation when no history is given
+    restart: bool = False
+
+
+class TaskBroker(ABC):
+    # Whether tasks are run by separate worker processes
+    distributed: bool = False
+
+    @abstractmethod
+    async def submit(self, job: TaskJob, max_queued: Optional[int] = None) -> bool:
+        """Queue a task for the workers, unless `max_queued` tasks already wait.
+
+        Returns whether the task was queued.
+        """
+
+    @abstractmethod
+    async def next_job(self, timeout: float) -> Optional[TaskJob]:
+        """Take the next queued task, or None after `timeout` seconds"""
+
+    @abstractmethod
+    async def queued_jobs(self) -> int:
+        """Number of tasks waiting for a worker"""
+
+    @abstractmethod
+    async def open_stream(self, task_id: str) -> None:
+        """Start (or continue, for a restart) the event stream of a task"""
+
+    @abstractmethod
+    async def publish(self, task_id: str, event: dict) -> Optional[str]:
+        """Append an event to a task's stream, returning its id"""
+
+    @abstractmethod
+    async def read_events(
+        self,
+        task_id: str,
+        after: Optional[str],
+        timeout: float,
+        window: float = 0,
+        max_size: int = 100,
+    ) -> Optional[BrokerEvents]:
+        """Events after the id `after` (from the start when None).
+
+        Waits up to `timeout` seconds for new events, then up to `window` seconds
+        for more to batch with them. Returns [] on timeout and None once the run
+        completed and every event was read.
+        """
+
+    @abstractmethod
+    async def set_state(self, task_id: str, **fields: Any) -> None:
+        """Update fields of a task's shared state"""
+
+    @abstractmethod
+    async def get_state(self, task_id: str) -> Optional[Dict[str, str]]:
+        """A task's shared state, or None for unknown tasks"""
+
+    async def get_states(self, task_ids: List[str]) -> List[Optional[Dict[str, str]]]:
+        """The shared state of several tasks, None for unknown ones"""
+        return [await self.get_state(task_id) for task_id in task_ids]
+
+    @abstractmethod
+    async def delete(self, task_id: str) -> None:
+        """Drop a task's state and events"""
+
+    async def request_termination(self, task_id: str) -> None:
+        """Ask the worker running (or about to run) the task's current run to stop it"""
+        state = await self.get_state(task_id)
+        if state and "run_id" in state:
+            await self.set_state(task_id, terminate_run=state["run_id"])
+
+    async def termination_requested(self, job: TaskJob) -> bool:
+        state = await self.get_state(job.task_id)
+        return bool(state) and state.get("terminate_run") == job.run_id
+
+    async def close(self) -> None:
+        pass
+
+
+class InProcessBroker(TaskBroker):
+    """Broker for a single API process, backed by `EventLog`s and dicts."""
+
+    def __init__(self, settings: Optional[BrokerSettings] = None):
+        self.event_logs: Dict[str, EventLog] = {}
+        self._jobs: asyncio.Queue = asyncio.Queue()
+        self._states: Dict[str, Dict[str, str]] = {}
+
+    async def submit(self, job: TaskJob, max_queued: Optional[int] = None) -> bool:
+        if max_queued is not None and self._jobs.qsize() >= max_queued:
+            return False
+        self._jobs.put_nowait(job)
+        return True
+
+    async def next_job(self, timeout: float) -> Optional[TaskJob]:
+        try:
+            return await asyncio.wait_for(self._jobs.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def queued_jobs(self) -> int:
+        return self._jobs.qsize()
+
+    async def open_stream(self, task_id: str) -> None:
+        # A restarted task keeps its log, so event ids keep increasing
+        if task_id in self.event_logs:
+            self.event_logs[task_id].reopen()
+        else:
+            self.event_logs[task_id] = EventLog(
+                task_id,
+                capacity=config.event_stream.buffer_size,
+                spill_dir=config.event_stream.spill_dir,
+            )
+
+    async def publish(self, task_id: str, event: dict) -> Optional[str]:
+        log = self.event_logs.get(task_id)
+        return str(log.append(event)) if log is not None else None
+
+    async def read_events(
+        self,
+        task_id: str,
+        after: Optional[str],
+        timeout: float,
+        window: float = 0,
+        max_size: int = 100,
+    ) -> Optional[BrokerEvents]:
+        log = self.event_logs.get(task_id)
+        if log is None:
+            return None
+        try:
+            cursor = int(after) if after else 0
+        except ValueError:
+            cursor = 0
+        entries = await log.read(
+            cursor, timeout=timeout, window=window, max_size=max_size
+        )
+        if not entries and log.closed and cursor >= log.last_id:
+            return None
+        return [(str(event_id), event) for event_id, event in entries]
+
+    async def set_state(self, task_id: str, **fields: Any) -> None:
+        self._states.setdefault(task_id, {}).update(
+            {key: str(value) for key, value in fields.items()}
+        )
+
+    async def get_state(self, task_id: str) -> Optional[Dict[str, str]]:
+        state = self._states.get(task_id)
+        return dict(state) if state is not None else None
+
+    async def delete(self, task_id: str) -> None:
+        self._states.pop(task_id, None)
+        log = self.event_logs.pop(task_id, None)
+        if log is not None:
+            await log.close()
+
+
+class RedisBroker(TaskBroker):
+    """Broker shared by API replicas and workers through Redis.
+
+    Tasks wait in a list, each task's events are a stream capped at about
+    `event_stream.buffer_size` entries, and its state is a hash.
+    """
+
+    distributed = True
+
+    def __init__(self, settings: Optional[BrokerSettings] = None):
+        if aioredis is None:
+            raise ImportError(
+                "The redis broker requires the redis package: pip install redis"
+            )
+        settings = settings or config.broker
+        self.prefix = settings.prefix
+        # RESP2 replies have the same shape across redis-py versions
+        self.redis = aioredis.from_url(settings.url, decode_responses=True, protocol=2)
+
+    def _key(self, *parts: str) -> str:
+        return ":".join((self.prefix, *parts))
+
+    async def submit(self, job: TaskJob, max_queued: Optional[int] = None) -> bool:
+        key = self._key("jobs")
+        data = job.model_dump_json()
+        # Checking the length returned by the push is atomic, checking it
+        # beforehand would race with other API replicas
+        length = await self.redis.lpush(key, data)
+        if max_queued is None or length <= max_queued:
+            return True
+        # Take the job back, unless a worker already picked it up
+        return not await self.redis.lrem(key, 1, data)
+
+    async def next_job(self, timeout: float) -> Optional[TaskJob]:
+        item = await self.redis.brpop([self._key("jobs")], timeout=max(int(timeout), 1))
+        if item is None:
+            return None
+        return TaskJob.model_validate_json(item[1])
+
+    async def queued_jobs(self) -> int:
+        return await self.redis.llen(self._key("jobs"))
+
+    async def open_stream(self, task_id: str) -> None:
+        await self.redis.hdel(self._key("task", task_id), "closed")
+
+    async def publish(self, task_id: str, event: dict) -> Optional[str]:
+        event_id = await self.redis.xadd(
+            self._key("events", task_id),
+            {"data": json.dumps(event)},
+            maxlen=config.event_stream.buffer_size,
+            approximate=True,
+        )
+        if event.get("event_name") == BaseAgentEvents.LIFECYCLE_COMPLETE:
+            await self.set_state(task_id, closed="1")
+        return event_id
+
+    async def _xread(self, key: str, after: str, count: int, block: Optional[int]):
+        response = await self.redis.xread({key: after}, count=count, block=block)
+        if not response:
+            return []
+        _, entries = response[0]
+        return [(event_id, json.loads(fields["data"])) for event_id, fields in entries]
+
+    async def read_events(
+        self,
+        task_id: str,
+        after: Optional[str],
+        timeout: float,
+        window: float = 0,
+        max_size: int = 100,
+    ) -> Optional[BrokerEvents]:
+        key = self._key("events", task_id)
+        after = after or "0-0"
+        entries = await self._xread(key, after, max_size, block=None)
+        if not entries:
+            state = await self.get_state(task_id)
+            if state is None or state.get("closed") == "1":
+                return None
+            entries = await self._xread(
+                key, after, max_size, block=max(int(timeout * 1000), 1)
+            )
+            if (
+                entries
+                and window > 0
+                and len(entries) < max_size
+                and not any(is_lifecycle_event(event) for _, event in entries)
+            ):
+                await asyncio.sleep(window)
+                entries += await self._xread(
+                    key, entries[-1][0], max_size - len(entries), block=None
+                )
+        return entries
+
+    async def set_state(self, task_id: str, **fields: Any) -> None:
+        await self.redis.hset(
+            self._key("task", task_id),
+            mapping={key: str(value) for key, value in fields.items()},
+        )
+
+    async def get_state(self, task_id: str) -> Optional[Dict[str, str]]:
+        state = await self.redis.hgetall(self._key("task", task_id))
+        return state or None
+
+    async def get_states(self, task_ids: List[str]) -> List[Optional[Dict[str, str]]]:
+        # One round trip for all of them
+        pipeline = self.redis.pipeline(transaction=False)
+        for task_id in task_ids:
+            pipeline.hgetall(self._key("task", task_id))
+        return [state or None for state in await pipeline.execute()]
+
+    async def delete(self, task_id: str) -> None:
+        await self.redis.delete(
+            self._key("task", task_id), self._key("events", task_id)
+        )
+
+    async def close(self) -> None:
+        await self.redis.aclose()
+
+
+BROKERS = {"memory": InProcessBroker, "redis": RedisBroker}
+
+
+def create_task_broker(settings: Optional[BrokerSettings] = None) -> TaskBroker:
+    settings = settings or config.broker
+    if settings.backend not in BROKERS:
+        raise ValueError(f"Unknown task broker backend: {settings.backend}")
+    logger.info(f"Using the {settings.backend} task broker")
+    return BROKERS[settings.backend](settings)
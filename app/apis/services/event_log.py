@@ -0,0 +1,195 @@
+"""Append-only, replayable log of a task's progress events.
+
+Every event gets a monotonically increasing id. The most recent `capacity` events
+are kept in memory; older ones are appended to a spill file when a spill
+directory is configured, and dropped otherwise. Spilled events are written by a
+background task in a worker thread, so appending never blocks the event loop on
+disk I/O. Any number of subscribers read the log independently from their own
+cursor, so a reconnecting client resumes from its `Last-Event-ID` instead of
+losing what was emitted meanwhile.
+"""
+
+import asyncio
+import json
+from collections import deque
+from itertools import islice
+from pathlib import Path
+from typing import IO, Deque, List, Optional, Tuple
+from urllib.parse import quote
+
+from app.agent.base import BaseAgentEvents
+from app.apis.services.event_stream import is_lifecycle_event
+from app.logger import logger
+
+
+# (event id, event) pairs
+LoggedEvents = List[Tuple[int, dict]]
+
+
+class EventLog:
+    def __init__(
+        self, task_id: str, capacity: int = 1000, spill_dir: Optional[str] = None
+    ):
+        self.task_id = task_id
+        self.capacity = capacity
+        self.spill_path = (
+            Path(spill_dir) / f"{quote(task_id, safe='')}.jsonl" if spill_dir else None
+        )
+        # The log is closed once the run completed, until the task is restarted
+        self.closed = False
+
+        self._events: Deque[Tuple[int, dict]] = deque()
+        self._last_id = 0
+        self._spill_file: Optional[IO[str]] = None
+        # Spill file lines not written yet, and the task writing them
+        self._spill_pending: List[str] = []
+        self._spill_writer: Optional[asyncio.Task] = None
+        self._appended = asyncio.Event()
+
+    @property
+    def last_id(self) -> int:
+        return self._last_id
+
+    @property
+    def first_id(self) -> int:
+        """Id of the oldest event held in memory"""
+        return self._events[0][0] if self._events else self._last_id + 1
+
+    def append(self, event: dict) -> int:
+        """Add an event and wake up the subscribers, returning the event id"""
+        self._last_id += 1
+        self._events.append((self._last_id, event))
+        if len(self._events) > self.capacity:
+            self._spill(self._events.popleft())
+        if event.get("event_name") == BaseAgentEvents.LIFECYCLE_COMPLETE:
+            self.closed = True
+        # Waiters hold the previous event object, replace it for the next append
+        self._appended.set()
+        self._appended = asyncio.Event()
+        return self._last_id
+
+    def reopen(self) -> None:
+        """Continue the log for a restarted run, keeping ids increasing"""
+        self.closed = False
+
+    def since(self, after_id: int, limit: Optional[int] = None) -> LoggedEvents:
+        """Events held in memory with an id greater than `after_id`"""
+        start = max(after_id - self.first_id + 1, 0)
+        stop = None if limit is None else start + limit
+        return list(islice(self._events, start, stop))
+
+    async def read(
+        self, after_id: int, timeout: float, window: float = 0, max_size: int = 100
+    ) -> LoggedEvents:
+        """Read the events after `after_id`, waiting up to `timeout` for new ones.
+
+        Once a new event arrives, waits up to `window` seconds for more so they can
+        be sent together, unless a lifecycle event is already pending. Returns an
+        empty list on timeout, or right away when the log is closed and read up to
+        its end.
+        """
+        if after_id < self.first_id - 1:
+            spilled = await self._read_spilled(after_id, max_size)
+            if spilled:
+                return spilled
+            logger.warning(
+                f"Events {after_id + 1}-{self.first_id - 1} of task {self.task_id} "
+                "are no longer available"
+            )
+            after_id = self.first_id - 1
+
+        entries = self.since(after_id, max_size)
+        if entries or self.closed:
+            return entries
+
+        if not await self._wait(timeout):
+            return []
+        if window > 0:
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + window
+            while not self._batch_ready(after_id, max_size):
+                remaining = deadline - loop.time()
+                if remaining <= 0 or not await self._wait(remaining):
+                    break
+        return self.since(after_id, max_size)
+
+    async def _wait(self, timeout: float) -> bool:
+        try:
+            await asyncio.wait_for(self._appended.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def _batch_ready(self, after_id: int, max_size: int) -> bool:
+        pending = self.since(after_id, max_size)
+        return len(pending) >= max_size or any(
+            is_lifecycle_event(event) for _, event in pending
+        )
+
+    def _spill(self, entry: Tuple[int, dict]) -> None:
+        if self.spill_path is None:
+            return
+        event_id, event = entry
+        try:
+            self._spill_pending.append(f"{event_id}\t{json.dumps(event)}\n")
+        except (TypeError, ValueError) as e:
+            logger.error(f"Failed to spill event of task {self.task_id}: {e}")
+            return
+        if self._spill_writer is None or self._spill_writer.done():
+            self._spill_writer = asyncio.get_running_loop().create_task(
+                self._write_spilled()
+            )
+
+    async def _write_spilled(self) -> None:
+        while self._spill_pending:
+            lines, self._spill_pending = self._spill_pending, []
+            try:
+                await asyncio.to_thread(self._write_spill_file, lines)
+            except OSError as e:
+                logger.error(
+                    f"Failed to spill {len(lines)} events of task {self.task_id}: {e}"
+                )
+
+    def _write_spill_file(self, lines: List[str]) -> None:
+        if self._spill_file is None:
+            self.spill_path.parent.mkdir(parents=True, exist_ok=True)
+            self._spill_file = open(self.spill_path, "a", encoding="utf-8")
+        self._spill_file.writelines(lines)
+        self._spill_file.flush()
+
+    async def _flush_spilled(self) -> None:
+        """Wait until every spilled event is in the spill file"""
+        while self._spill_writer is not None and not self._spill_writer.done():
+            await asyncio.shield(self._spill_writer)
+
+    async def _read_spilled(self, after_id: int, limit: int) -> LoggedEvents:
+        await self._flush_spilled()
+        if self._spill_file is None:
+            return []
+        return await asyncio.to_thread(self._scan_spill_file, after_id, limit)
+
+    def _scan_spill_file(self, after_id: int, limit: int) -> LoggedEvents:
+        entries: LoggedEvents = []
+        with open(self.spill_path, encoding="utf-8") as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    break  # Still being written
+                event_id, _, data = line.partition("\t")
+                if int(event_id) > after_id:
+                    entries.append((int(event_id), json.loads(data)))
+                    if len(entries) >= limit:
+                        break
+        return entries
+
+    def _remove_spill_file(self) -> None:
+        self._spill_file.close()
+        self._spill_file = None
+        self.spill_path.unlink(missing_ok=True)
+
+    async def close(self) -> None:
+        """Release the spill file, the log is not read after this"""
+        self.closed = True
+        self._appended.set()
+        await self._flush_spilled()
+        if self._spill_file is not None:
+            await asyncio.to_thread(self._remove_spill_file)
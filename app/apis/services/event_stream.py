@@ -0,0 +1,69 @@
+"""Batching of task progress events into SSE frames.
+
+Agents emit many small events (token deltas, tool events). Instead of one SSE
+frame per event, events arriving within `batch_window` are sent as one frame
+with one `data:` line per event, so clients that read `data:` lines keep
+working. Consecutive deltas of the same event are merged before sending.
+Lifecycle events end a batch and are sent immediately
+(see `TaskBroker.read_events`).
+"""
+
+from json import dumps
+from typing import List, Optional
+
+from app.agent.base import BaseAgentEvents
+
+
+# Events clients act on (task status), never held back by batching
+LIFECYCLE_EVENTS = {
+    BaseAgentEvents.LIFECYCLE_START,
+    BaseAgentEvents.LIFECYCLE_PREPARE_START,
+    BaseAgentEvents.LIFECYCLE_PREPARE_COMPLETE,
+    BaseAgentEvents.LIFECYCLE_PLAN_START,
+    BaseAgentEvents.LIFECYCLE_PLAN_COMPLETE,
+    BaseAgentEvents.LIFECYCLE_COMPLETE,
+    BaseAgentEvents.LIFECYCLE_TERMINATING,
+    BaseAgentEvents.LIFECYCLE_TERMINATED,
+}
+
+
+def is_lifecycle_event(event: dict) -> bool:
+    return event.get("event_name") in LIFECYCLE_EVENTS
+
+
+def _delta(event: dict) -> Optional[str]:
+    content = event.get("content")
+    if isinstance(content, dict) and isinstance(content.get("delta"), str):
+        return content["delta"]
+    return None
+
+
+def coalesce_events(events: List[dict]) -> List[dict]:
+    """Merge consecutive delta events of the same name and step"""
+    merged: List[dict] = []
+    for event in events:
+        previous = merged[-1] if merged else None
+        if (
+            previous is not None
+            and previous.get("event_name") == event.get("event_name")
+            and previous.get("step") == event.get("step")
+            and _delta(previous) is not None
+            and _delta(event) is not None
+        ):
+            content = {**previous["content"], **event["content"]}
+            content["delta"] = _delta(previous) + _delta(event)
+            merged[-1] = {**previous, "content": content}
+        else:
+            merged.append(event)
+    return merged
+
+
+def format_sse_frame(events: List[dict], event_id: Optional[str] = None) -> str:
+    """One SSE frame carrying each event on its own `data:` line.
+
+    `event_id` is the id of the last event in the frame, which the client sends
+    back as `Last-Event-ID` when it reconnects.
+    """
+    frame = f"id: {event_id}\n" if event_id is not None else ""
+    frame += "".join(f"data: {dumps(event)}\n" for event in events)
+    return frame + "\n"
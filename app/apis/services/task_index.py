@@ -0,0 +1,165 @@
+"""Lightweight index of the tasks known to this process, for listing them.
+
+Each task has a small entry (status, step, token totals) updated as the task
+progresses, so listing never touches the agents. Entries are kept in submission
+order in sorted sequence lists, one overall and one per status and per
+organization, so a filtered page is read directly from the matching list.
+Cursors are opaque sequence numbers: a page continues after the last entry of
+the previous one even when tasks are added or removed meanwhile.
+"""
+
+from bisect import bisect_left, insort
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+from app.apis.models.task import TaskStatus
+
+
+class TaskIndexEntry(BaseModel):
+    id: str
+    organization: str
+    status: TaskStatus
+    run_id: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.now)
+    finished_at: Optional[datetime] = None
+    step: int = 0
+    total_input_tokens: int = 0
+    total_completion_tokens: int = 0
+
+
+class TaskPage(BaseModel):
+    tasks: List[TaskIndexEntry]
+    # Pass as `cursor` to get the next (older) page, None on the last page
+    next_cursor: Optional[str] = None
+
+
+class TaskIndex:
+    def __init__(self):
+        self._entries: Dict[str, TaskIndexEntry] = {}
+        self._seqs: Dict[str, int] = {}
+        self._ids: Dict[int, str] = {}
+        self._all: List[int] = []
+        self._by_status: Dict[TaskStatus, List[int]] = {}
+        self._by_organization: Dict[str, List[int]] = {}
+        self._seq = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, task_id: str) -> Optional[TaskIndexEntry]:
+        return self._entries.get(task_id)
+
+    def ids(self) -> List[str]:
+        return list(self._entries)
+
+    def add(
+        self,
+        task_id: str,
+        organization: str,
+        status: TaskStatus = TaskStatus.QUEUED,
+        run_id: Optional[str] = None,
+    ) -> TaskIndexEntry:
+        """Index a submitted task. A restarted task keeps its place and creation time"""
+        if task_id in self._entries:
+            return self.update(
+                task_id,
+                status=status,
+                run_id=run_id,
+                finished_at=None,
+                step=0,
+                total_input_tokens=0,
+                total_completion_tokens=0,
+            )
+        self._seq += 1
+        entry = TaskIndexEntry(
+            id=task_id, organization=organization, status=status, run_id=run_id
+        )
+        self._entries[task_id] = entry
+        self._seqs[task_id] = self._seq
+        self._ids[self._seq] = task_id
+        self._all.append(self._seq)
+        self._by_status.setdefault(status, []).append(self._seq)
+        self._by_organization.setdefault(organization, []).append(self._seq)
+        return entry
+
+    def update(self, task_id: str, **fields) -> Optional[TaskIndexEntry]:
+        entry = self._entries.get(task_id)
+        if entry is None:
+            return None
+        status = fields.get("status")
+        if status is not None and status != entry.status:
+            seq = self._seqs[task_id]
+            self._discard(self._by_status, entry.status, seq)
+            insort(self._by_status.setdefault(status, []), seq)
+        for name, value in fields.items():
+            setattr(entry, name, value)
+        return entry
+
+    def remove(self, task_id: str) -> None:
+        entry = self._entries.pop(task_id, None)
+        if entry is None:
+            return
+        seq = self._seqs.pop(task_id)
+        del self._ids[seq]
+        self._remove_seq(self._all, seq)
+        self._discard(self._by_status, entry.status, seq)
+        self._discard(self._by_organization, entry.organization, seq)
+
+    def counts(self) -> Dict[str, int]:
+        """Number of indexed tasks per status"""
+        return {status.value: len(seqs) for status, seqs in self._by_status.items()}
+
+    def page(
+        self,
+        status: Optional[TaskStatus] = None,
+        organization: Optional[str] = None,
+        cursor: Optional[str] = None,
+        limit: int = 50,
+    ) -> TaskPage:
+        """Newest tasks first, optionally filtered by status and organization.
+
+        Raises:
+            ValueError: If the cursor is invalid
+        """
+        candidates = [
+            seqs
+            for seqs in (
+                self._by_status.get(status, []) if status is not None else None,
+                (
+                    self._by_organization.get(organization, [])
+                    if organization is not None
+                    else None
+                ),
+            )
+            if seqs is not None
+        ]
+        # Walk the shortest matching list, check the other filter per entry
+        seqs = min(candidates, key=len) if candidates else self._all
+        position = bisect_left(seqs, int(cursor)) if cursor else len(seqs)
+
+        tasks: List[TaskIndexEntry] = []
+        while position > 0 and len(tasks) < limit:
+            position -= 1
+            entry = self._entries[self._ids[seqs[position]]]
+            if (status is None or entry.status == status) and (
+                organization is None or entry.organization == organization
+            ):
+                tasks.append(entry)
+        next_cursor = str(self._seqs[tasks[-1].id]) if tasks and position > 0 else None
+        return TaskPage(tasks=tasks, next_cursor=next_cursor)
+
+    @staticmethod
+    def _remove_seq(seqs: List[int], seq: int) -> None:
+        position = bisect_left(seqs, seq)
+        if position < len(seqs) and seqs[position] == seq:
+            del seqs[position]
+
+    def _discard(self, lists: Dict, key, seq: int) -> None:
+        seqs = lists.get(key)
+        if seqs is None:
+            return
+        self._remove_seq(seqs, seq)
+        if not seqs:
+            del lists[key]
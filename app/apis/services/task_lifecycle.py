@@ -0,0 +1,220 @@
+"""Archiving and eviction of finished tasks.
+
+When a run ends, a compact summary of it (status, timings, token usage, memory
+size) is written to the archive directory. The task itself, with its agent,
+memory and LLM client, stays available for `finished_ttl` seconds so clients can
+still read its events, and is then evicted by a periodic sweep.
+"""
+
+import asyncio
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+import aiofiles
+import aiofiles.os
+from pydantic import BaseModel
+
+from app.apis.models.task import Task, TaskStatus
+from app.config import TaskLifecycleSettings, config
+from app.llm import LLM
+from app.logger import logger
+
+
+if TYPE_CHECKING:
+    from app.apis.services.task_manager import TaskManager
+
+
+class TaskSummary(BaseModel):
+    id: str
+    run_id: Optional[str] = None
+    status: TaskStatus
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+    duration: Optional[float] = None
+    steps: int = 0
+    total_input_tokens: int = 0
+    total_completion_tokens: int = 0
+    messages: int = 0
+    memory_tokens: int = 0
+    memory_bytes: int = 0
+
+
+def memory_usage(task: Task) -> dict:
+    """What a task's agent currently holds in memory"""
+    memory = task.agent.memory
+    return {
+        "messages": len(memory.messages),
+        "tokens": memory.token_count,
+        "bytes": memory.size_bytes,
+        "inline_images": sum(1 for message in memory.messages if message.base64_image),
+    }
+
+
+class TaskLifecycle:
+    def __init__(
+        self, manager: "TaskManager", settings: Optional[TaskLifecycleSettings] = None
+    ):
+        self.manager = manager
+        self.settings = settings or config.task_lifecycle
+        self.archive_dir = (
+            Path(self.settings.archive_dir)
+            if self.settings.archive_dir
+            else Path(config.workspace_root) / ".archive"
+        )
+        # Ended runs by task id: (run id, end time)
+        self._finished: Dict[str, Tuple[Optional[str], datetime]] = {}
+        self._sweeper: Optional[asyncio.Task] = None
+
+    def summarize(self, task: Task) -> TaskSummary:
+        usage = memory_usage(task)
+        return TaskSummary(
+            id=task.id,
+            run_id=task.run_id,
+            status=task.status,
+            error=task.error,
+            created_at=task.created_at,
+            finished_at=task.finished_at,
+            duration=(
+                (task.finished_at - task.created_at).total_seconds()
+                if task.finished_at
+                else None
+            ),
+            steps=task.agent.current_step,
+            total_input_tokens=task.usage.input_tokens,
+            total_completion_tokens=task.usage.completion_tokens,
+            messages=usage["messages"],
+            memory_tokens=usage["tokens"],
+            memory_bytes=usage["bytes"],
+        )
+
+    async def finish(self, task: Task) -> TaskSummary:
+        """Mark a run as ended, archive its summary and schedule its eviction"""
+        task.finished_at = datetime.now()
+        self.finished(task.id, task.run_id, task.finished_at)
+        summary = self.summarize(task)
+        self.manager.index.update(
+            task.id,
+            step=summary.steps,
+            total_input_tokens=summary.total_input_tokens,
+            total_completion_tokens=summary.total_completion_tokens,
+        )
+        if self.settings.archive:
+            await self._archive(summary)
+        return summary
+
+    def finished(
+        self, task_id: str, run_id: Optional[str], at: Optional[datetime] = None
+    ) -> None:
+        """Schedule the eviction of a run, including one that never started"""
+        self._finished[task_id] = (run_id, at or datetime.now())
+
+    def _archive_path(self, task_id: str) -> Path:
+        return self.archive_dir / f"{quote(task_id, safe='')}.json"
+
+    async def _archive(self, summary: TaskSummary) -> None:
+        try:
+            await aiofiles.os.makedirs(self.archive_dir, exist_ok=True)
+            async with aiofiles.open(
+                self._archive_path(summary.id), "w", encoding="utf-8"
+            ) as f:
+                await f.write(summary.model_dump_json())
+        except OSError as e:
+            logger.error(f"Failed to archive task {summary.id}: {e}")
+
+    async def load_summary(self, task_id: str) -> Optional[TaskSummary]:
+        """The archived summary of the task's last finished run"""
+        try:
+            async with aiofiles.open(
+                self._archive_path(task_id), encoding="utf-8"
+            ) as f:
+                return TaskSummary.model_validate(json.loads(await f.read()))
+        except FileNotFoundError:
+            return None
+
+    def expired(
+        self, now: Optional[datetime] = None
+    ) -> List[Tuple[str, Optional[str]]]:
+        """(task id, run id) of the runs that ended `finished_ttl` seconds ago"""
+        now = now or datetime.now()
+        return [
+            (task_id, run_id)
+            for task_id, (run_id, finished_at) in self._finished.items()
+            if (now - finished_at).total_seconds() >= self.settings.finished_ttl
+        ]
+
+    async def evict(self, task_id: str, run_id: Optional[str]) -> None:
+        """Drop an ended run: its agent, events and shared state"""
+        if task_id in self._finished and self._finished[task_id][0] == run_id:
+            del self._finished[task_id]
+        task = self.manager.tasks.get(task_id)
+        if task is not None and task.run_id == run_id:
+            del self.manager.tasks[task_id]
+            LLM.release(task_id)
+        entry = self.manager.index.get(task_id)
+        if entry is not None and entry.run_id == run_id:
+            self.manager.index.remove(task_id)
+        # A restart may have started a new run of the task meanwhile
+        state = await self.manager.broker.get_state(task_id)
+        if state is not None and state.get("run_id", run_id) != run_id:
+            return
+        await self.manager.broker.delete(task_id)
+
+    async def sweep(self) -> int:
+        """Evict every run that ended more than `finished_ttl` seconds ago.
+
+        Also drops the index entries of tasks that workers evicted.
+        """
+        expired = self.expired()
+        for task_id, run_id in expired:
+            try:
+                await self.evict(task_id, run_id)
+            except Exception as e:
+                logger.error(f"Failed to evict task {task_id}: {e}")
+        if expired:
+            logger.info(f"Evicted {len(expired)} finished tasks")
+        try:
+            await self.manager.sync_index()
+        except Exception as e:
+            logger.error(f"Failed to sync the task index: {e}")
+        return len(expired)
+
+    def start(self) -> None:
+        """Start sweeping in the background"""
+        if self._sweeper is None:
+            self._sweeper = asyncio.create_task(self._sweep_loop())
+
+    async def stop(self) -> None:
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+
+    async def _sweep_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.settings.sweep_interval)
+            await self.sweep()
+
+    def stats(self) -> dict:
+        tasks = sorted(
+            self.manager.tasks.values(), key=lambda task: task.created_at, reverse=True
+        )
+        entries = [
+            {
+                "id": task.id,
+                "status": task.status.value,
+                "created_at": task.created_at.isoformat(),
+                "finished_at": (
+                    task.finished_at.isoformat() if task.finished_at else None
+                ),
+                "memory": memory_usage(task),
+            }
+            for task in tasks
+        ]
+        return {
+            "tasks": entries,
+            "total_memory_bytes": sum(entry["memory"]["bytes"] for entry in entries),
+            "finished_ttl": self.settings.finished_ttl,
+        }
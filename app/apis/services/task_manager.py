@@ -1,40 +1,351 @@
 import asyncio
+import heapq
 import uuid
 from datetime import datetime
-from typing import Dict
+from typing import Awaitable, Callable, Dict, List, Optional, Set
 
 from app.agent.manus import Manus
-from app.apis.models.task import Task
+from app.apis.models.task import FINISHED_STATUSES, Task, TaskStatus
+from app.apis.services.broker import TaskBroker, create_task_broker
+from app.apis.services.task_index import TaskIndex
+from app.apis.services.task_lifecycle import TaskLifecycle
+from app.config import TaskSchedulerSettings, config
+from app.llm import LLM
+from app.metrics import registry
+
+
+TASK_QUEUED = "task:scheduler:queued"
+TASK_STARTED = "task:scheduler:started"
+
+DEFAULT_ORGANIZATION = "default"
+
+
+class TaskRejected(Exception):
+    """The scheduler backlog is full, the client should retry later"""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Too many queued tasks")
+        self.retry_after = retry_after
+
+
+class _ScheduledTask:
+    def __init__(
+        self,
+        task_id: str,
+        organization: str,
+        priority: int,
+        seq: int,
+        run: Callable[[], Awaitable[None]],
+    ):
+        self.task_id = task_id
+        self.organization = organization
+        self.priority = priority
+        self.seq = seq
+        self.run = run
+        self.position: Optional[int] = None
+
+    def __lt__(self, other: "_ScheduledTask") -> bool:
+        # Higher priority first, then first come first served
+        return (-self.priority, self.seq) < (-other.priority, other.seq)
+
+
+class TaskScheduler:
+    """Admission control for agent runs.
+
+    At most `max_running` tasks run at once, and at most `max_running_per_org`
+    per organization (the part of the task id before "/"), both unlimited when
+    not set. Waiting tasks are kept in one priority queue per organization; a
+    free slot goes to the organization with the fewest running tasks, so one
+    organization's burst does not starve the others. Submissions beyond
+    `max_queued` waiting tasks are rejected with `TaskRejected`.
+    """
+
+    def __init__(
+        self,
+        notify: Callable[[str, str, dict], None],
+        settings: Optional[TaskSchedulerSettings] = None,
+    ):
+        self.settings = settings or config.task_scheduler
+        # Publishes scheduler events to a task's event stream
+        self._notify = notify
+        self._queues: Dict[str, List[_ScheduledTask]] = {}
+        self._running: Dict[str, int] = {}
+        self._running_tasks: Set[asyncio.Task] = set()
+        self._seq = 0
+
+    @staticmethod
+    def organization_of(task_id: str) -> str:
+        return task_id.split("/", 1)[0] if "/" in task_id else DEFAULT_ORGANIZATION
+
+    @property
+    def queued(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    @property
+    def running(self) -> int:
+        return sum(self._running.values())
+
+    def is_queued(self, task_id: str) -> bool:
+        return any(
+            entry.task_id == task_id
+            for queue in self._queues.values()
+            for entry in queue
+        )
+
+    def check_capacity(self, task_id: Optional[str] = None) -> None:
+        """Reject early, before the caller builds an agent for a task that cannot queue.
+
+        A waiting run of `task_id` does not count, a restart replaces it.
+        """
+        queued = self.queued
+        if task_id is not None and self.is_queued(task_id):
+            queued -= 1
+        if queued >= self.settings.max_queued:
+            raise TaskRejected(self.settings.retry_after)
+
+    def submit(
+        self, task_id: str, run: Callable[[], Awaitable[None]], priority: int = 0
+    ) -> None:
+        """Run `run()` once a slot is free, or queue it.
+
+        A run of the task still waiting is replaced. Capacity is checked here
+        again, without awaiting in between, so `max_queued` holds even when
+        several requests passed the early check at once.
+        """
+        self.check_capacity(task_id)
+        self._remove(task_id)
+        self._seq += 1
+        entry = _ScheduledTask(
+            task_id, self.organization_of(task_id), priority, self._seq, run
+        )
+        heapq.heappush(self._queues.setdefault(entry.organization, []), entry)
+        self._dispatch()
+        self._publish_positions()
+
+    def cancel(self, task_id: str) -> bool:
+        """Drop a task that is still waiting, returns whether one was found"""
+        if not self._remove(task_id):
+            return False
+        self._dispatch()
+        self._publish_positions()
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "queued": self.queued,
+            "max_running": self.settings.max_running,
+            "max_running_per_org": self.settings.max_running_per_org,
+            "max_queued": self.settings.max_queued,
+            "organizations": {
+                organization: {
+                    "running": self._running.get(organization, 0),
+                    "queued": len(self._queues.get(organization, [])),
+                }
+                for organization in set(self._running) | set(self._queues)
+            },
+        }
+
+    def _remove(self, task_id: str) -> bool:
+        for organization, queue in list(self._queues.items()):
+            remaining = [entry for entry in queue if entry.task_id != task_id]
+            if len(remaining) != len(queue):
+                heapq.heapify(remaining)
+                self._set_queue(organization, remaining)
+                return True
+        return False
+
+    def _set_queue(self, organization: str, queue: List[_ScheduledTask]) -> None:
+        if queue:
+            self._queues[organization] = queue
+        else:
+            self._queues.pop(organization, None)
+
+    def _next(self) -> Optional[_ScheduledTask]:
+        """Pop the next task: least-served eligible organization, then priority"""
+        limit = self.settings.max_running_per_org
+        candidates = [
+            (self._running.get(organization, 0), queue[0], organization)
+            for organization, queue in self._queues.items()
+            if limit is None or self._running.get(organization, 0) < limit
+        ]
+        if not candidates:
+            return None
+        _, _, organization = min(candidates, key=lambda c: (c[0], c[1]))
+        queue = self._queues[organization]
+        entry = heapq.heappop(queue)
+        self._set_queue(organization, queue)
+        return entry
+
+    def _dispatch(self) -> None:
+        limit = self.settings.max_running
+        while limit is None or self.running < limit:
+            entry = self._next()
+            if entry is None:
+                return
+            self._running[entry.organization] = (
+                self._running.get(entry.organization, 0) + 1
+            )
+            self._notify(entry.task_id, TASK_STARTED, {})
+            runner = asyncio.create_task(self._run(entry))
+            self._running_tasks.add(runner)
+            runner.add_done_callback(self._running_tasks.discard)
+
+    async def _run(self, entry: _ScheduledTask) -> None:
+        try:
+            await entry.run()
+        finally:
+            self._running[entry.organization] -= 1
+            if not self._running[entry.organization]:
+                del self._running[entry.organization]
+            self._dispatch()
+            self._publish_positions()
+
+    def _publish_positions(self) -> None:
+        """Send each waiting task its estimated place in line when it changed"""
+        waiting = sorted(entry for queue in self._queues.values() for entry in queue)
+        for position, entry in enumerate(waiting, start=1):
+            if entry.position != position:
+                entry.position = position
+                self._notify(
+                    entry.task_id,
+                    TASK_QUEUED,
+                    {"position": position, "queued": len(waiting)},
+                )
+
+
+def _count_by_status(tasks) -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    for task in tasks:
+        counts[task.status.value] = counts.get(task.status.value, 0) + 1
+    return counts
 
 
 class TaskManager:
-    def __init__(self):
+    def __init__(self, broker: Optional[TaskBroker] = None):
+        # Tasks whose agent runs in this process
         self.tasks: Dict[str, Task] = {}
-        self.queues: Dict[str, asyncio.Queue] = {}
+        # Listing data of every known task, including queued and finished ones
+        self.index = TaskIndex()
+        self.broker = broker or create_task_broker()
+        self.scheduler = TaskScheduler(self.notify)
+        self.lifecycle = TaskLifecycle(self)
+        self._publishing: Set[asyncio.Task] = set()
 
-    def create_task(self, task_id: str, agent: Manus) -> Task:
+    def create_task(
+        self, task_id: str, agent: Manus, run_id: Optional[str] = None
+    ) -> Task:
         task = Task(
             id=task_id,
             created_at=datetime.now(),
             agent=agent,
+            run_id=run_id,
         )
         self.tasks[task_id] = task
-        self.queues[task_id] = asyncio.Queue()
         return task
 
+    async def publish_event(self, task_id: str, event_name: str, content: dict) -> None:
+        """Add a task-level (not agent) event to the task's event stream"""
+        await self.broker.publish(
+            task_id,
+            {
+                "type": "progress",
+                "event_name": event_name,
+                "step": 0,
+                "content": content,
+            },
+        )
+
+    def notify(self, task_id: str, event_name: str, content: dict) -> None:
+        """`publish_event` for synchronous callers such as the scheduler"""
+        publishing = asyncio.create_task(
+            self.publish_event(task_id, event_name, content)
+        )
+        self._publishing.add(publishing)
+        publishing.add_done_callback(self._publishing.discard)
+
+    async def is_current_run(self, task_id: str, run_id: Optional[str]) -> bool:
+        """Whether `run_id` is still the task's latest run, not replaced by a restart"""
+        state = await self.broker.get_state(task_id)
+        return state is not None and state.get("run_id") == run_id
+
+    async def set_status(
+        self,
+        task_id: str,
+        status: TaskStatus,
+        run_id: Optional[str] = None,
+        **state,
+    ) -> bool:
+        """Record a task's status in the index and in its shared state.
+
+        With `run_id`, the status is only recorded while that run is the task's
+        current one, so a run ending after its restart was queued does not
+        overwrite the restart's status. Returns whether it was recorded.
+        """
+        if run_id is not None and not await self.is_current_run(task_id, run_id):
+            return False
+        self.index.update(
+            task_id,
+            status=status,
+            finished_at=datetime.now() if status in FINISHED_STATUSES else None,
+        )
+        await self.broker.set_state(task_id, status=status.value, **state)
+        return True
+
+    async def sync_index(self, task_ids: Optional[List[str]] = None) -> None:
+        """Refresh index entries of tasks run by workers from their shared state.
+
+        With a distributed broker the index of an API process only sees the
+        tasks it submitted, while workers record their status changes. Entries
+        whose state is gone, because a worker evicted the task, are removed.
+        Defaults to every indexed task not running in this process.
+        """
+        if not self.broker.distributed:
+            return
+        if task_ids is None:
+            task_ids = self.index.ids()
+        task_ids = [task_id for task_id in task_ids if task_id not in self.tasks]
+        if not task_ids:
+            return
+        states = await self.broker.get_states(task_ids)
+        for task_id, state in zip(task_ids, states):
+            entry = self.index.get(task_id)
+            if entry is None:
+                continue
+            if state is None:
+                self.index.remove(task_id)
+                continue
+            status = TaskStatus(state.get("status", entry.status.value))
+            run_id = state.get("run_id", entry.run_id)
+            if status == entry.status and run_id == entry.run_id:
+                continue
+            finished_at = None
+            if status in FINISHED_STATUSES:
+                finished_at = entry.finished_at or datetime.now()
+            self.index.update(
+                task_id, status=status, run_id=run_id, finished_at=finished_at
+            )
+
     async def update_task_progress(
         self, task_id: str, event_name: str, step: int, **kwargs
     ):
-        if task_id in self.tasks:
-            task = self.tasks[task_id]
+        task = self.tasks.get(task_id)
+        if task is not None:
+            self.index.update(
+                task_id,
+                step=step,
+                total_input_tokens=task.usage.input_tokens,
+                total_completion_tokens=task.usage.completion_tokens,
+            )
             # Use the same step value for both progress and message
-            await self.queues[task_id].put(
+            await self.broker.publish(
+                task_id,
                 {
                     "type": "progress",
                     "event_name": event_name,
                     "step": step,
                     "content": kwargs,
-                }
+                },
             )
 
     async def terminate_task(self, task_id: str):
@@ -44,9 +355,56 @@ class TaskManager:
             await self.remove_task(task_id)
 
     async def remove_task(self, task_id: str):
-        if task_id in self.tasks:
-            del self.tasks[task_id]
-            del self.queues[task_id]
+        self.scheduler.cancel(task_id)
+        self.tasks.pop(task_id, None)
+        self.index.remove(task_id)
+        await self.broker.delete(task_id)
+        # Release the task's own LLM instance, if it was created with a custom config
+        LLM.release(task_id)
 
 
 task_manager = TaskManager()
+
+registry.gauge(
+    "openmanus_tasks_active",
+    "Tasks whose agent is held in this process, by status",
+    labels=("status",),
+    callback=lambda: (
+        ((status,), count)
+        for status, count in _count_by_status(task_manager.tasks.values()).items()
+    ),
+)
+registry.gauge(
+    "openmanus_tasks_indexed",
+    "Tasks known to the task index, by status",
+    labels=("status",),
+    callback=lambda: (
+        ((status,), count) for status, count in task_manager.index.counts().items()
+    ),
+)
+registry.gauge(
+    "openmanus_scheduler_running_tasks",
+    "Tasks holding a scheduler slot, by organization",
+    labels=("organization",),
+    callback=lambda: (
+        ((organization,), stats["running"])
+        for organization, stats in task_manager.scheduler.stats()[
+            "organizations"
+        ].items()
+    ),
+)
+registry.gauge(
+    "openmanus_scheduler_queued_tasks",
+    "Tasks waiting for a scheduler slot, by organization",
+    labels=("organization",),
+    callback=lambda: (
+        ((organization,), stats["queued"])
+        for organization, stats in task_manager.scheduler.stats()[
+            "organizations"
+        ].items()
+    ),
+)
+BROKER_QUEUED_JOBS = registry.gauge(
+    "openmanus_broker_queued_jobs",
+    "Jobs waiting in the task broker for a worker",
+)
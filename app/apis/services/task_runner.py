@@ -0,0 +1,305 @@
+"""Building and running task agents from `TaskJob`s.
+
+The API submits jobs with `submit_job`. With the in-process broker they are run
+by the API's own scheduler; with a distributed broker they are pulled by
+`run_worker` in separate worker processes (`run_worker.py`).
+"""
+
+import asyncio
+import json
+import os
+import socket
+from functools import partial
+from typing import List, Optional, Union
+
+from app.agent.base import BaseAgentEvents
+from app.agent.manus import Manus, McpToolConfig
+from app.apis.models.task import TaskStatus
+from app.apis.services.broker import TaskJob
+from app.apis.services.task_manager import TaskRejected, TaskScheduler, task_manager
+from app.config import LLMSettings, config
+from app.llm import LLM, llm_usage
+from app.logger import logger
+from app.rate_limiter import llm_request_owner
+
+
+AGENT_NAME = "Manus"
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def parse_tools(tools: List[str]) -> List[Union[str, McpToolConfig]]:
+    """Parse tools list which may contain both tool names and MCP configurations.
+
+    Args:
+        tools: List of tool strings, which can be either tool names or MCP config JSON strings
+
+    Returns:
+        List of processed tools, containing both tool names and McpToolConfig objects
+
+    Raises:
+        ValueError: If any tool configuration is invalid
+    """
+    processed_tools = []
+    for tool in tools:
+        try:
+            tool_config = json.loads(tool)
+            if isinstance(tool_config, dict):
+                mcp_tool = McpToolConfig.model_validate(tool_config)
+                processed_tools.append(mcp_tool)
+            else:
+                processed_tools.append(tool)
+        except json.JSONDecodeError:
+            processed_tools.append(tool)
+        except Exception as e:
+            raise ValueError(f"Invalid tool configuration for '{tool}': {str(e)}")
+    return processed_tools
+
+
+async def handle_agent_event(task_id: str, event_name: str, step: int, **kwargs):
+    """Handle agent events and update task status.
+
+    Args:
+        event_name: Name of the event
+        **kwargs: Additional parameters related to the event
+    """
+    if not task_id:
+        logger.warning(f"No task_id provided for event: {event_name}")
+        return
+
+    # Update task step
+    await task_manager.update_task_progress(
+        task_id=task_id, event_name=event_name, step=step, **kwargs
+    )
+
+
+async def run_task(task_id: str, prompt: str):
+    """Run the task and set up corresponding event handlers.
+
+    The outcome is recorded in the task's `status` and `error`.
+
+    Args:
+        task_id: Task ID
+        prompt: Task prompt
+    """
+    task = task_manager.tasks[task_id]
+    agent = task.agent
+    try:
+        # Queue this task's LLM requests separately for fair rate limiting
+        llm_request_owner.set(task_id)
+        # Count this run's tokens apart from other tasks sharing the LLM
+        llm_usage.set(task.usage)
+
+        # Set up event handlers based on all event types defined in the Agent class hierarchy
+        event_patterns = [r"agent:.*"]
+        # Register handlers for each event pattern
+        for pattern in event_patterns:
+            agent.on(
+                pattern,
+                lambda event_name, step, **kwargs: handle_agent_event(
+                    task_id=task_id,
+                    event_name=event_name,
+                    step=step,
+                    **{k: v for k, v in kwargs.items() if k != "task_id"},
+                ),
+            )
+
+        # Run the agent
+        await agent.run(prompt)
+        await agent.memory.flush()
+        task.status = (
+            TaskStatus.TERMINATED if agent.should_terminate else TaskStatus.COMPLETED
+        )
+    except Exception as e:
+        logger.error(f"Error in task {task_id}: {str(e)}")
+        task.status = TaskStatus.FAILED
+        task.error = str(e)
+    finally:
+        # Release browser and sandbox resources even when the run failed
+        await agent.cleanup()
+
+
+async def build_agent(job: TaskJob) -> Manus:
+    """Create and initialize the agent of a task run"""
+    llm_config = LLMSettings.model_validate(job.llm_config) if job.llm_config else None
+    agent = Manus(
+        name=AGENT_NAME,
+        description="A versatile agent that can solve various tasks using multiple tools",
+        should_plan=job.should_plan,
+        llm=(
+            LLM(config_name=job.task_id, llm_config=llm_config) if llm_config else None
+        ),
+        enable_event_queue=True,
+    )
+
+    # A restart without an explicit history continues the stored conversation,
+    # system prompt included, so `Manus.prepare` does not add a second one
+    if not job.restart or job.history or not await agent.memory.resume(job.task_id):
+        for message in job.history or []:
+            role = "user" if message["role"] == "user" else "assistant"
+            await agent.update_memory(role=role, content=message["message"])
+        agent.memory.attach_store(job.task_id)
+
+    agent.initialize(
+        job.task_id,
+        language=(
+            job.preferences.get("language", "English") if job.preferences else None
+        ),
+        tools=parse_tools(job.tools),
+        task_request=job.prompt,
+    )
+    return agent
+
+
+def job_prompt(job: TaskJob) -> str:
+    """The prompt the agent runs, telling it about uploaded files"""
+    if not job.files:
+        return job.prompt
+    return (
+        job.prompt
+        + "\n\n"
+        + "Here are the files I have uploaded: "
+        + "\n\n".join([f"File: {filename}" for filename in job.files])
+    )
+
+
+async def watch_termination(job: TaskJob, agent: Manus) -> None:
+    """Terminate the agent when the API asks for it through the broker"""
+    while True:
+        await asyncio.sleep(config.broker.termination_poll_interval)
+        if await task_manager.broker.termination_requested(job):
+            await agent.terminate()
+            return
+
+
+async def run_job(job: TaskJob) -> None:
+    """Build the agent of a task run and run it to the end"""
+    broker = task_manager.broker
+    # Workers see the task for the first time here
+    task_manager.index.add(
+        job.task_id, TaskScheduler.organization_of(job.task_id), run_id=job.run_id
+    )
+    if await broker.termination_requested(job):
+        # Terminated while waiting for a worker
+        await task_manager.publish_event(
+            job.task_id, BaseAgentEvents.LIFECYCLE_TERMINATED, {}
+        )
+        if await task_manager.set_status(
+            job.task_id, TaskStatus.TERMINATED, run_id=job.run_id
+        ):
+            task_manager.lifecycle.finished(job.task_id, job.run_id)
+        return
+
+    previous = task_manager.tasks.get(job.task_id)
+    if previous is not None:
+        await previous.agent.terminate()
+    # Drop the previous run's LLM instance so the new llm_config and counters apply
+    LLM.release(job.task_id)
+
+    try:
+        agent = await build_agent(job)
+    except Exception as e:
+        logger.error(f"Error starting task {job.task_id}: {str(e)}")
+        if await task_manager.set_status(
+            job.task_id, TaskStatus.FAILED, run_id=job.run_id, error=str(e)
+        ):
+            task_manager.lifecycle.finished(job.task_id, job.run_id)
+        return
+    task = task_manager.create_task(job.task_id, agent, run_id=job.run_id)
+    await task_manager.set_status(
+        job.task_id, TaskStatus.RUNNING, run_id=job.run_id, worker=WORKER_ID
+    )
+
+    watcher = (
+        asyncio.create_task(watch_termination(job, agent))
+        if broker.distributed
+        else None
+    )
+    try:
+        await run_task(job.task_id, job_prompt(job))
+    finally:
+        if watcher is not None:
+            watcher.cancel()
+        if await task_manager.is_current_run(job.task_id, job.run_id):
+            await task_manager.lifecycle.finish(task)
+            await task_manager.set_status(job.task_id, task.status, run_id=job.run_id)
+        elif task_manager.tasks.get(job.task_id) is task:
+            # Replaced by a restart that has not started yet, which owns the
+            # task's status, index entry and eviction from now on
+            del task_manager.tasks[job.task_id]
+
+
+async def check_capacity(task_id: Optional[str] = None) -> None:
+    """Reject a task early when the backlog of waiting tasks is full.
+
+    `submit_job` checks again when it queues the run, so this only spares the
+    work of preparing a task that cannot queue. A waiting run of `task_id` does
+    not count, a restart replaces it.
+    """
+    broker = task_manager.broker
+    scheduler = task_manager.scheduler
+    if not broker.distributed:
+        scheduler.check_capacity(task_id)
+    elif await broker.queued_jobs() >= scheduler.settings.max_queued:
+        raise TaskRejected(scheduler.settings.retry_after)
+
+
+async def submit_job(job: TaskJob) -> None:
+    """Open the task's event stream and queue its run.
+
+    Raises:
+        TaskRejected: If the backlog of waiting tasks is full
+    """
+    broker = task_manager.broker
+    settings = task_manager.scheduler.settings
+    await check_capacity(job.task_id)
+    await broker.open_stream(job.task_id)
+    task_manager.index.add(
+        job.task_id, TaskScheduler.organization_of(job.task_id), run_id=job.run_id
+    )
+    # Make this the task's current run, statuses of a replaced run are ignored
+    await broker.set_state(job.task_id, run_id=job.run_id)
+    await task_manager.set_status(job.task_id, TaskStatus.QUEUED, run_id=job.run_id)
+    try:
+        if broker.distributed:
+            if not await broker.submit(job, max_queued=settings.max_queued):
+                raise TaskRejected(settings.retry_after)
+        else:
+            task_manager.scheduler.submit(
+                job.task_id, partial(run_job, job), priority=job.priority
+            )
+    except TaskRejected as e:
+        if job.restart:
+            # The previous run was already stopped, the task keeps a failed status
+            await task_manager.set_status(
+                job.task_id, TaskStatus.FAILED, run_id=job.run_id, error=str(e)
+            )
+            task_manager.lifecycle.finished(job.task_id, job.run_id)
+        else:
+            await task_manager.remove_task(job.task_id)
+        raise
+
+
+async def run_worker() -> None:
+    """Pull task runs from the broker and run them.
+
+    A job is only taken while this worker has a free slot, so waiting tasks stay
+    in the broker for any worker to pick up.
+    """
+    broker = task_manager.broker
+    scheduler = task_manager.scheduler
+    if not broker.distributed:
+        raise RuntimeError(
+            'Workers need a shared broker, set backend = "redis" in [broker]'
+        )
+    task_manager.lifecycle.start()
+    logger.info(f"Worker {WORKER_ID} waiting for tasks")
+    while True:
+        limit = scheduler.settings.max_running
+        if limit is not None and scheduler.running + scheduler.queued >= limit:
+            await asyncio.sleep(0.5)
+            continue
+        job = await broker.next_job(timeout=5)
+        if job is not None:
+            logger.info(f"Worker {WORKER_ID} picked up task {job.task_id}")
+            scheduler.submit(job.task_id, partial(run_job, job), priority=job.priority)
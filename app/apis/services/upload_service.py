@@ -0,0 +1,127 @@
+"""Saving uploaded task files to the task directory.
+
+Starlette has already received the whole request by the time a route runs: each
+upload is spooled to a temporary file (kept in memory while small). Saving
+copies that file in chunks through an async file writer, so a large file
+neither sits in memory nor blocks the event loop. The size limit is checked
+while copying, which keeps oversized files out of the task directory but does
+not stop a client from sending them. The files of a request are saved
+concurrently. Each file is written to a temporary name first and renamed once
+complete, so the agent never sees a partial file.
+"""
+
+import asyncio
+import hashlib
+import uuid
+from pathlib import Path
+from typing import List, Optional
+
+import aiofiles
+import aiofiles.os
+from fastapi import UploadFile
+from pydantic import BaseModel
+
+from app.config import UploadSettings, config
+from app.logger import logger
+
+
+class UploadRejected(Exception):
+    """An uploaded file is invalid or too large"""
+
+
+class SavedUpload(BaseModel):
+    filename: str
+    size: int
+    # Set when hashing is enabled (`upload.dedupe`)
+    sha256: Optional[str] = None
+    # The task directory already held this exact file, it was not rewritten
+    reused: bool = False
+
+
+def _file_sha256(path: Path, chunk_size: int) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+async def _is_same_file(path: Path, size: int, sha256: str, chunk_size: int) -> bool:
+    try:
+        if (await aiofiles.os.stat(path)).st_size != size:
+            return False
+    except FileNotFoundError:
+        return False
+    return await asyncio.to_thread(_file_sha256, path, chunk_size) == sha256
+
+
+async def save_upload(
+    file: UploadFile, task_dir: Path, settings: Optional[UploadSettings] = None
+) -> SavedUpload:
+    """Copy one uploaded file from Starlette's spooled file into `task_dir`"""
+    settings = settings or config.upload
+    filename = Path(file.filename or "").name
+    if not filename:
+        raise UploadRejected("Invalid filename")
+    if file.size is not None and file.size > settings.max_file_size:
+        raise UploadRejected(f"File too large: {filename}")
+
+    digest = hashlib.sha256() if settings.dedupe else None
+    temp_path = task_dir / f".{filename}.{uuid.uuid4().hex}.part"
+    size = 0
+    try:
+        async with aiofiles.open(temp_path, "wb") as out:
+            while chunk := await file.read(settings.chunk_size):
+                size += len(chunk)
+                if size > settings.max_file_size:
+                    raise UploadRejected(f"File too large: {filename}")
+                if digest is not None:
+                    digest.update(chunk)
+                await out.write(chunk)
+
+        target = task_dir / filename
+        sha256 = digest.hexdigest() if digest is not None else None
+        if sha256 is not None and await _is_same_file(
+            target, size, sha256, settings.chunk_size
+        ):
+            return SavedUpload(filename=filename, size=size, sha256=sha256, reused=True)
+        await aiofiles.os.replace(temp_path, target)
+        return SavedUpload(filename=filename, size=size, sha256=sha256)
+    finally:
+        try:
+            await aiofiles.os.remove(temp_path)
+        except FileNotFoundError:
+            pass
+
+
+async def save_uploads(
+    task_id: str, files: List[UploadFile], settings: Optional[UploadSettings] = None
+) -> List[SavedUpload]:
+    """Save the files uploaded with a task to its directory, shared with the workers.
+
+    Raises:
+        UploadRejected: If a file has no usable name or exceeds the size limit
+    """
+    settings = settings or config.upload
+    task_dir = Path(config.workspace_root) / task_id
+    await aiofiles.os.makedirs(task_dir, exist_ok=True)
+
+    semaphore = asyncio.Semaphore(settings.max_concurrent_files)
+
+    async def save(file: UploadFile) -> SavedUpload:
+        async with semaphore:
+            return await save_upload(file, task_dir, settings)
+
+    # Let every file finish (and clean up) before reporting the first failure
+    results = await asyncio.gather(
+        *(save(file) for file in files), return_exceptions=True
+    )
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    for saved in results:
+        logger.info(
+            f"Saved upload {saved.filename} ({saved.size} bytes) for task {task_id}"
+            + (" (unchanged)" if saved.reused else "")
+        )
+    return results
@@ -1,11 +1,15 @@
+import asyncio
 import json
 import sys
 import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, List, Literal, Optional
+from functools import partial
+from typing import Any, AsyncIterator, Callable, Dict, List, Literal, Optional
 
 import boto3
+from botocore.config import Config as BotoConfig
 
 
 # Global variables to track the current tool use ID across function calls
@@ -36,26 +40,188 @@ class OpenAIResponse:
 
 # Main client class for interacting with Amazon Bedrock
 class BedrockClient:
-    def __init__(self):
+    """OpenAI-compatible async facade over the blocking boto3 Bedrock client.
+
+    boto3 calls run in a bounded thread pool, so a slow generation never blocks
+    the event loop. The pool size also caps the boto3 connection pool.
+    """
+
+    DEFAULT_MAX_WORKERS = 10
+
+    def __init__(
+        self,
+        endpoint_url: Optional[str] = None,
+        region_name: Optional[str] = None,
+        max_workers: Optional[int] = None,
+    ):
         # Initialize Bedrock client, you need to configure AWS env first
+        max_workers = max_workers or self.DEFAULT_MAX_WORKERS
         try:
-            self.client = boto3.client("bedrock-runtime")
-            self.chat = Chat(self.client)
+            self.client = boto3.client(
+                "bedrock-runtime",
+                endpoint_url=endpoint_url,
+                region_name=region_name,
+                config=BotoConfig(max_pool_connections=max_workers),
+            )
         except Exception as e:
             print(f"Error initializing Bedrock client: {e}")
             sys.exit(1)
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="bedrock"
+        )
+        self.chat = Chat(self.client, self.executor)
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=False)
 
 
 # Chat interface class
 class Chat:
-    def __init__(self, client):
-        self.completions = ChatCompletions(client)
+    def __init__(self, client, executor: Optional[ThreadPoolExecutor] = None):
+        self.completions = ChatCompletions(client, executor)
+
+
+class BedrockStream:
+    """Async iterator over a Bedrock event stream, yielding OpenAI-style chunks.
+
+    Every blocking read of the underlying event stream runs in the client's
+    thread pool.
+    """
+
+    def __init__(self, stream: Any, run: Callable, model: str):
+        self._stream = stream
+        self._events = iter(stream or [])
+        self._run = run
+        self.model = model
+        self.id = f"chatcmpl-{uuid.uuid4()}"
+        self._tool_index = -1
+
+    def __aiter__(self) -> AsyncIterator[OpenAIResponse]:
+        return self._iterate()
+
+    async def _iterate(self) -> AsyncIterator[OpenAIResponse]:
+        try:
+            while True:
+                event = await self._run(next, self._events, None)
+                if event is None:
+                    return
+                chunk = self._to_chunk(event)
+                if chunk is not None:
+                    yield chunk
+        finally:
+            await self.close()
+
+    async def close(self) -> None:
+        stream, self._stream = self._stream, None
+        if stream is not None and hasattr(stream, "close"):
+            await self._run(stream.close)
+
+    def _chunk(
+        self,
+        delta: Optional[dict] = None,
+        finish_reason: Optional[str] = None,
+        usage: Optional[dict] = None,
+    ) -> OpenAIResponse:
+        delta = {"role": None, "content": None, "tool_calls": None, **(delta or {})}
+        return OpenAIResponse(
+            {
+                "id": self.id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": self.model,
+                "choices": [
+                    {"index": 0, "delta": delta, "finish_reason": finish_reason}
+                ],
+                "usage": usage,
+            }
+        )
+
+    def _tool_call_delta(self, **fields) -> dict:
+        call = {
+            "index": self._tool_index,
+            "id": None,
+            "type": "function",
+            "function": {"name": None, "arguments": ""},
+        }
+        call.update(fields)
+        return {"tool_calls": [call]}
+
+    def _to_chunk(self, event: dict) -> Optional[OpenAIResponse]:
+        global CURRENT_TOOLUSE_ID
+        if "messageStart" in event:
+            return self._chunk({"role": event["messageStart"].get("role")})
+        if "contentBlockStart" in event:
+            tool_use = event["contentBlockStart"].get("start", {}).get("toolUse")
+            if not tool_use:
+                return None
+            self._tool_index += 1
+            CURRENT_TOOLUSE_ID = tool_use["toolUseId"]
+            return self._chunk(
+                self._tool_call_delta(
+                    id=tool_use["toolUseId"],
+                    function={"name": tool_use["name"], "arguments": ""},
+                )
+            )
+        if "contentBlockDelta" in event:
+            delta = event["contentBlockDelta"].get("delta", {})
+            if "text" in delta:
+                return self._chunk({"content": delta["text"]})
+            if "toolUse" in delta:
+                return self._chunk(
+                    self._tool_call_delta(
+                        function={
+                            "name": None,
+                            "arguments": delta["toolUse"].get("input", ""),
+                        }
+                    )
+                )
+            return None
+        if "messageStop" in event:
+            return self._chunk(finish_reason=event["messageStop"].get("stopReason"))
+        if "metadata" in event:
+            usage = event["metadata"].get("usage", {})
+            return self._chunk(
+                usage={
+                    "prompt_tokens": usage.get("inputTokens", 0),
+                    "completion_tokens": usage.get("outputTokens", 0),
+                    "total_tokens": usage.get("totalTokens", 0),
+                }
+            )
+        return None
 
 
 # Core class handling chat completions functionality
 class ChatCompletions:
-    def __init__(self, client):
+    def __init__(self, client, executor: Optional[ThreadPoolExecutor] = None):
         self.client = client
+        self.executor = executor
+
+    async def _run(self, func: Callable, *args, **kwargs) -> Any:
+        # Run a blocking boto3 call in the worker pool
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(func, *args, **kwargs))
+
+    def _converse_params(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        temperature: float,
+        tools: Optional[List[dict]] = None,
+    ) -> dict:
+        (
+            system_prompt,
+            bedrock_messages,
+        ) = self._convert_openai_messages_to_bedrock_format(messages)
+        params = {
+            "modelId": model,
+            "system": system_prompt,
+            "messages": bedrock_messages,
+            "inferenceConfig": {"temperature": temperature, "maxTokens": max_tokens},
+        }
+        if tools:
+            params["toolConfig"] = {"tools": tools}
+        return params
 
     def _convert_openai_tools_to_bedrock_format(self, tools):
         # Convert OpenAI function calling format to Bedrock tool format
@@ -203,17 +369,8 @@ class ChatCompletions:
         **kwargs,
     ) -> OpenAIResponse:
         # Non-streaming invocation of Bedrock model
-        (
-            system_prompt,
-            bedrock_messages,
-        ) = self._convert_openai_messages_to_bedrock_format(messages)
-        response = self.client.converse(
-            modelId=model,
-            system=system_prompt,
-            messages=bedrock_messages,
-            inferenceConfig={"temperature": temperature, "maxTokens": max_tokens},
-            toolConfig={"tools": tools} if tools else None,
-        )
+        params = self._converse_params(model, messages, max_tokens, temperature, tools)
+        response = await self._run(self.client.converse, **params)
         openai_response = self._convert_bedrock_response_to_openai_format(response)
         return openai_response
 
@@ -226,76 +383,11 @@ class ChatCompletions:
         tools: Optional[List[dict]] = None,
         tool_choice: Literal["none", "auto", "required"] = "auto",
         **kwargs,
-    ) -> OpenAIResponse:
+    ) -> BedrockStream:
         # Streaming invocation of Bedrock model
-        (
-            system_prompt,
-            bedrock_messages,
-        ) = self._convert_openai_messages_to_bedrock_format(messages)
-        response = self.client.converse_stream(
-            modelId=model,
-            system=system_prompt,
-            messages=bedrock_messages,
-            inferenceConfig={"temperature": temperature, "maxTokens": max_tokens},
-            toolConfig={"tools": tools} if tools else None,
-        )
-
-        # Initialize response structure
-        bedrock_response = {
-            "output": {"message": {"role": "", "content": []}},
-            "stopReason": "",
-            "usage": {},
-            "metrics": {},
-        }
-        bedrock_response_text = ""
-        bedrock_response_tool_input = ""
-
-        # Process streaming response
-        stream = response.get("stream")
-        if stream:
-            for event in stream:
-                if event.get("messageStart", {}).get("role"):
-                    bedrock_response["output"]["message"]["role"] = event[
-                        "messageStart"
-                    ]["role"]
-                if event.get("contentBlockDelta", {}).get("delta", {}).get("text"):
-                    bedrock_response_text += event["contentBlockDelta"]["delta"]["text"]
-                    print(
-                        event["contentBlockDelta"]["delta"]["text"], end="", flush=True
-                    )
-                if event.get("contentBlockStop", {}).get("contentBlockIndex") == 0:
-                    bedrock_response["output"]["message"]["content"].append(
-                        {"text": bedrock_response_text}
-                    )
-                if event.get("contentBlockStart", {}).get("start", {}).get("toolUse"):
-                    bedrock_tool_use = event["contentBlockStart"]["start"]["toolUse"]
-                    tool_use = {
-                        "toolUseId": bedrock_tool_use["toolUseId"],
-                        "name": bedrock_tool_use["name"],
-                    }
-                    bedrock_response["output"]["message"]["content"].append(
-                        {"toolUse": tool_use}
-                    )
-                    global CURRENT_TOOLUSE_ID
-                    CURRENT_TOOLUSE_ID = bedrock_tool_use["toolUseId"]
-                if event.get("contentBlockDelta", {}).get("delta", {}).get("toolUse"):
-                    bedrock_response_tool_input += event["contentBlockDelta"]["delta"][
-                        "toolUse"
-                    ]["input"]
-                    print(
-                        event["contentBlockDelta"]["delta"]["toolUse"]["input"],
-                        end="",
-                        flush=True,
-                    )
-                if event.get("contentBlockStop", {}).get("contentBlockIndex") == 1:
-                    bedrock_response["output"]["message"]["content"][1]["toolUse"][
-                        "input"
-                    ] = json.loads(bedrock_response_tool_input)
-        print()
-        openai_response = self._convert_bedrock_response_to_openai_format(
-            bedrock_response
-        )
-        return openai_response
+        params = self._converse_params(model, messages, max_tokens, temperature, tools)
+        response = await self._run(self.client.converse_stream, **params)
+        return BedrockStream(response.get("stream"), self._run, model)
 
     def create(
         self,
@@ -307,8 +399,9 @@ class ChatCompletions:
         tools: Optional[List[dict]] = None,
         tool_choice: Literal["none", "auto", "required"] = "auto",
         **kwargs,
-    ) -> OpenAIResponse:
-        # Main entry point for chat completion
+    ):
+        # Main entry point for chat completion, returns an awaitable of an
+        # OpenAIResponse, or of a BedrockStream when streaming
         bedrock_tools = []
         if tools is not None:
             bedrock_tools = self._convert_openai_tools_to_bedrock_format(tools)
@@ -28,6 +28,103 @@ class LLMSettings(BaseModel):
     temperature: float = Field(1.0, description="Sampling temperature")
     api_type: str = Field(..., description="Azure, Openai, or Ollama")
     api_version: str = Field(..., description="Azure Openai version if AzureOpenai")
+    requests_per_minute: Optional[int] = Field(
+        None, description="Request rate limit per model/base_url (None for unlimited)"
+    )
+    tokens_per_minute: Optional[int] = Field(
+        None,
+        description="Input token rate limit per model/base_url (None for unlimited)",
+    )
+    max_concurrent_requests: Optional[int] = Field(
+        None,
+        description="Maximum in-flight requests per model/base_url (None for unlimited)",
+    )
+    endpoints: Optional[List[str]] = Field(
+        None,
+        description="Names of other [llm.<name>] configs serving the same model to "
+        "route requests between by observed latency",
+    )
+    hedge_delay: Optional[float] = Field(
+        None,
+        description="Seconds before a duplicate request is sent to the next best "
+        "endpoint (None to disable hedging)",
+    )
+    stream_tool_calls: bool = Field(
+        False,
+        description="Stream tool requests, emitting thoughts and tool calls as they "
+        "arrive (completion tokens are then estimated, not reported by the API)",
+    )
+
+
+class HttpPoolSettings(BaseModel):
+    """Configuration for the HTTP connection pool shared by LLM clients"""
+
+    max_connections: int = Field(
+        100, description="Maximum number of connections per base_url"
+    )
+    max_keepalive_connections: int = Field(
+        20, description="Maximum number of idle keep-alive connections per base_url"
+    )
+    keepalive_expiry: float = Field(
+        30.0, description="Seconds an idle keep-alive connection is kept open"
+    )
+    http2: bool = Field(
+        False, description="Whether to enable HTTP/2 (requires the h2 package)"
+    )
+
+
+class LLMCacheSettings(BaseModel):
+    """Configuration for the exact-match LLM response cache"""
+
+    enabled: bool = Field(False, description="Whether to cache LLM responses")
+    max_entries: int = Field(1024, description="Maximum entries in the memory tier")
+    disk_path: Optional[str] = Field(
+        None, description="SQLite file for the disk tier (None for memory only)"
+    )
+    ttl: int = Field(86400, description="Seconds a cached response stays valid")
+    force: bool = Field(
+        False, description="Also cache requests with a temperature above 0"
+    )
+
+
+class MemorySettings(BaseModel):
+    """Configuration for agent memory trimming and compaction"""
+
+    max_messages: int = Field(100, description="Maximum messages kept in memory")
+    token_budget: Optional[int] = Field(
+        None,
+        description="Compact memory once its messages exceed this many tokens "
+        "(None to only trim by max_messages)",
+    )
+    compaction_target: float = Field(
+        0.75,
+        description="Fraction of token_budget to compact down to, so compaction "
+        "does not run again on every new message",
+    )
+    summarize: bool = Field(
+        False,
+        description="Replace evicted turns with an LLM-written summary instead of "
+        "dropping them",
+    )
+    max_inline_images: Optional[int] = Field(
+        3,
+        description="Number of most recent images sent inline, older ones are "
+        "replaced by a reference to their workspace file (None to keep all)",
+    )
+    store: Optional[str] = Field(
+        None,
+        description="Durable memory backend, 'sqlite' or None to keep memory in "
+        "process only",
+    )
+    store_path: str = Field(
+        "workspace/.memory/memory.sqlite", description="SQLite file of the store"
+    )
+    store_batch_size: int = Field(
+        100, description="Queued writes that trigger an immediate flush"
+    )
+    store_flush_interval: float = Field(
+        0.2, description="Seconds between write-behind flushes"
+    )
 
 
 class ProxySettings(BaseModel):
@@ -107,6 +204,89 @@ class MCPSettings(BaseModel):
     )
 
 
+class EventStreamSettings(BaseModel):
+    """Configuration for the task event streams (SSE)"""
+
+    batch_window: float = Field(
+        0.025,
+        description="Seconds events are collected into one SSE frame (0 disables batching)",
+    )
+    max_batch_size: int = Field(100, description="Maximum number of events per frame")
+    buffer_size: int = Field(
+        1000, description="Number of recent events per task kept in memory for replay"
+    )
+    spill_dir: Optional[str] = Field(
+        None,
+        description="Directory older events are written to, so any event can be replayed",
+    )
+
+
+class TaskSchedulerSettings(BaseModel):
+    """Configuration for task admission control in the tasks API"""
+
+    max_running: Optional[int] = Field(
+        None, description="Maximum number of tasks running at once, unlimited if unset"
+    )
+    max_running_per_org: Optional[int] = Field(
+        None,
+        description="Maximum number of running tasks per organization, unlimited if unset",
+    )
+    max_queued: int = Field(
+        100, description="Maximum number of waiting tasks before new ones are rejected"
+    )
+    retry_after: int = Field(
+        30, description="Retry-After seconds sent when a task is rejected"
+    )
+
+
+class BrokerSettings(BaseModel):
+    """Configuration for where tasks are queued and their events streamed"""
+
+    backend: str = Field(
+        "memory",
+        description="Task broker: memory (API runs the tasks) or redis (workers run them)",
+    )
+    url: str = Field("redis://localhost:6379/0", description="Redis URL")
+    prefix: str = Field("openmanus", description="Prefix of the broker's Redis keys")
+    termination_poll_interval: float = Field(
+        1.0, description="Seconds between checks of workers for terminate requests"
+    )
+
+
+class UploadSettings(BaseModel):
+    """Configuration for files uploaded with tasks"""
+
+    max_file_size: int = Field(
+        10 * 1024 * 1024, description="Maximum size of a file in bytes"
+    )
+    chunk_size: int = Field(
+        1024 * 1024, description="Bytes read and written at a time while saving"
+    )
+    max_concurrent_files: int = Field(
+        4, description="Number of files of one request saved at once"
+    )
+    dedupe: bool = Field(
+        False,
+        description="Hash uploads and skip rewriting files the task already has",
+    )
+
+
+class TaskLifecycleSettings(BaseModel):
+    """Configuration for evicting and archiving finished tasks"""
+
+    finished_ttl: float = Field(
+        600, description="Seconds a finished task stays in memory and replayable"
+    )
+    sweep_interval: float = Field(
+        60, description="Seconds between checks for expired tasks"
+    )
+    archive: bool = Field(True, description="Write a summary of each finished task")
+    archive_dir: Optional[str] = Field(
+        None,
+        description="Directory of the summaries, <workspace_root>/.archive by default",
+    )
+
+
 class AppConfig(BaseModel):
     llm: Dict[str, LLMSettings]
     sandbox: Optional[SandboxSettings] = Field(
@@ -119,6 +299,30 @@ class AppConfig(BaseModel):
         None, description="Search configuration"
     )
     mcp_config: Optional[MCPSettings] = Field(None, description="MCP configuration")
+    http_pool: Optional[HttpPoolSettings] = Field(
+        None, description="LLM HTTP connection pool configuration"
+    )
+    llm_cache: Optional[LLMCacheSettings] = Field(
+        None, description="LLM response cache configuration"
+    )
+    memory: Optional[MemorySettings] = Field(
+        None, description="Agent memory configuration"
+    )
+    event_stream: Optional[EventStreamSettings] = Field(
+        None, description="Task event stream configuration"
+    )
+    task_scheduler: Optional[TaskSchedulerSettings] = Field(
+        None, description="Task scheduler configuration"
+    )
+    broker: Optional[BrokerSettings] = Field(
+        None, description="Task broker configuration"
+    )
+    upload: Optional[UploadSettings] = Field(
+        None, description="File upload configuration"
+    )
+    task_lifecycle: Optional[TaskLifecycleSettings] = Field(
+        None, description="Task lifecycle configuration"
+    )
 
     class Config:
         arbitrary_types_allowed = True
@@ -176,6 +380,10 @@ class Config:
             "temperature": base_llm.get("temperature", 1.0),
             "api_type": base_llm.get("api_type", ""),
             "api_version": base_llm.get("api_version", ""),
+            "requests_per_minute": base_llm.get("requests_per_minute"),
+            "tokens_per_minute": base_llm.get("tokens_per_minute"),
+            "max_concurrent_requests": base_llm.get("max_concurrent_requests"),
+            "stream_tool_calls": base_llm.get("stream_tool_calls", False),
         }
 
         # handle browser config.
@@ -228,9 +436,62 @@ class Config:
         else:
             mcp_settings = MCPSettings()
 
+        http_pool_config = raw_config.get("http_pool", {})
+        if http_pool_config:
+            http_pool_settings = HttpPoolSettings(**http_pool_config)
+        else:
+            http_pool_settings = HttpPoolSettings()
+
+        llm_cache_config = raw_config.get("llm_cache", {})
+        if llm_cache_config:
+            llm_cache_settings = LLMCacheSettings(**llm_cache_config)
+        else:
+            llm_cache_settings = LLMCacheSettings()
+
+        memory_config = raw_config.get("memory", {})
+        if memory_config:
+            memory_settings = MemorySettings(**memory_config)
+        else:
+            memory_settings = MemorySettings()
+
+        event_stream_config = raw_config.get("event_stream", {})
+        if event_stream_config:
+            event_stream_settings = EventStreamSettings(**event_stream_config)
+        else:
+            event_stream_settings = EventStreamSettings()
+
+        task_scheduler_config = raw_config.get("task_scheduler", {})
+        if task_scheduler_config:
+            task_scheduler_settings = TaskSchedulerSettings(**task_scheduler_config)
+        else:
+            task_scheduler_settings = TaskSchedulerSettings()
+
+        broker_config = raw_config.get("broker", {})
+        if broker_config:
+            broker_settings = BrokerSettings(**broker_config)
+        else:
+            broker_settings = BrokerSettings()
+
+        upload_config = raw_config.get("upload", {})
+        if upload_config:
+            upload_settings = UploadSettings(**upload_config)
+        else:
+            upload_settings = UploadSettings()
+
+        task_lifecycle_config = raw_config.get("task_lifecycle", {})
+        if task_lifecycle_config:
+            task_lifecycle_settings = TaskLifecycleSettings(**task_lifecycle_config)
+        else:
+            task_lifecycle_settings = TaskLifecycleSettings()
+
         config_dict = {
             "llm": {
-                "default": default_settings,
+                # Routing settings are not inherited by the named configs
+                "default": {
+                    **default_settings,
+                    "endpoints": base_llm.get("endpoints"),
+                    "hedge_delay": base_llm.get("hedge_delay"),
+                },
                 **{
                     name: {**default_settings, **override_config}
                     for name, override_config in llm_overrides.items()
@@ -240,6 +501,14 @@ class Config:
             "browser_config": browser_settings,
             "search_config": search_settings,
             "mcp_config": mcp_settings,
+            "http_pool": http_pool_settings,
+            "llm_cache": llm_cache_settings,
+            "memory": memory_settings,
+            "event_stream": event_stream_settings,
+            "task_scheduler": task_scheduler_settings,
+            "broker": broker_settings,
+            "upload": upload_settings,
+            "task_lifecycle": task_lifecycle_settings,
         }
 
         self._config = AppConfig(**config_dict)
@@ -265,6 +534,46 @@ class Config:
         """Get the MCP configuration"""
         return self._config.mcp_config
 
+    @property
+    def http_pool(self) -> HttpPoolSettings:
+        """Get the LLM HTTP connection pool configuration"""
+        return self._config.http_pool
+
+    @property
+    def llm_cache(self) -> LLMCacheSettings:
+        """Get the LLM response cache configuration"""
+        return self._config.llm_cache
+
+    @property
+    def memory(self) -> MemorySettings:
+        """Get the agent memory configuration"""
+        return self._config.memory
+
+    @property
+    def event_stream(self) -> EventStreamSettings:
+        """Get the task event stream configuration"""
+        return self._config.event_stream
+
+    @property
+    def task_scheduler(self) -> TaskSchedulerSettings:
+        """Get the task scheduler configuration"""
+        return self._config.task_scheduler
+
+    @property
+    def broker(self) -> BrokerSettings:
+        """Get the task broker configuration"""
+        return self._config.broker
+
+    @property
+    def upload(self) -> UploadSettings:
+        """Get the file upload configuration"""
+        return self._config.upload
+
+    @property
+    def task_lifecycle(self) -> TaskLifecycleSettings:
+        """Get the task lifecycle configuration"""
+        return self._config.task_lifecycle
+
     @property
     def workspace_root(self) -> Path:
         """
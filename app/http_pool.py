@@ -0,0 +1,135 @@
+"""Process-wide HTTP connection pools shared by LLM clients.
+
+Every `LLM` instance that targets the same base_url reuses one `httpx.AsyncClient`,
+so tasks with their own LLM configuration do not each open a new connection pool
+and pay for fresh TLS handshakes on their first request.
+"""
+
+import importlib.util
+import threading
+from typing import Dict, Optional
+
+import httpx
+from openai import DefaultAsyncHttpxClient
+
+from app.config import HttpPoolSettings, config
+from app.logger import logger
+
+
+class PoolStats:
+    """Request counters for a single shared pool."""
+
+    def __init__(self):
+        self.requests_total = 0
+        self.requests_in_flight = 0
+        self.errors_total = 0
+
+    def to_dict(self) -> dict:
+        return {
+            "requests_total": self.requests_total,
+            "requests_in_flight": self.requests_in_flight,
+            "errors_total": self.errors_total,
+        }
+
+
+class CountingTransport(httpx.AsyncHTTPTransport):
+    """Transport that records request counters into a `PoolStats`."""
+
+    def __init__(self, stats: PoolStats, **kwargs):
+        super().__init__(**kwargs)
+        self.pool_stats = stats
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.pool_stats.requests_total += 1
+        self.pool_stats.requests_in_flight += 1
+        try:
+            response = await super().handle_async_request(request)
+        except Exception:
+            self.pool_stats.errors_total += 1
+            raise
+        finally:
+            self.pool_stats.requests_in_flight -= 1
+        if response.status_code >= 400:
+            self.pool_stats.errors_total += 1
+        return response
+
+
+class HttpClientPool:
+    """Registry of shared `httpx.AsyncClient` instances keyed by base_url."""
+
+    def __init__(self, settings: Optional[HttpPoolSettings] = None):
+        self.settings = settings or config.http_pool or HttpPoolSettings()
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._stats: Dict[str, PoolStats] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(base_url: str) -> str:
+        return (base_url or "").rstrip("/")
+
+    def get_client(self, base_url: str) -> httpx.AsyncClient:
+        """Get the shared client for a base_url, creating it on first use."""
+        key = self._normalize(base_url)
+        client = self._clients.get(key)
+        if client is not None and not client.is_closed:
+            return client
+
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None or client.is_closed:
+                client = self._create_client(key)
+                self._clients[key] = client
+            return client
+
+    def _create_client(self, key: str) -> httpx.AsyncClient:
+        http2 = self.settings.http2
+        if http2 and importlib.util.find_spec("h2") is None:
+            logger.warning(
+                "HTTP/2 is enabled for the LLM connection pool but the 'h2' package "
+                "is not installed, falling back to HTTP/1.1"
+            )
+            http2 = False
+
+        stats = self._stats.setdefault(key, PoolStats())
+        logger.info(
+            f"Creating shared HTTP pool for {key or '<default>'} "
+            f"(max_connections={self.settings.max_connections}, "
+            f"max_keepalive={self.settings.max_keepalive_connections}, http2={http2})"
+        )
+        transport = CountingTransport(
+            stats,
+            limits=httpx.Limits(
+                max_connections=self.settings.max_connections,
+                max_keepalive_connections=self.settings.max_keepalive_connections,
+                keepalive_expiry=self.settings.keepalive_expiry,
+            ),
+            http2=http2,
+        )
+        return DefaultAsyncHttpxClient(transport=transport)
+
+    def stats(self) -> Dict[str, dict]:
+        """Return connection and request statistics for every shared pool."""
+        result = {}
+        for key, client in list(self._clients.items()):
+            transport = getattr(client, "_transport", None)
+            connections = getattr(getattr(transport, "_pool", None), "connections", [])
+            idle = sum(1 for conn in connections if conn.is_idle())
+            result[key] = {
+                "connections": len(connections),
+                "idle_connections": idle,
+                "active_connections": len(connections) - idle,
+                "closed": client.is_closed,
+                **self._stats.get(key, PoolStats()).to_dict(),
+            }
+        return result
+
+    async def aclose(self) -> None:
+        """Close every shared client, e.g. on application shutdown."""
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+        for client in clients:
+            await client.aclose()
+
+
+http_client_pool = HttpClientPool()
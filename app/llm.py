@@ -1,5 +1,11 @@
+import json
 import math
-from typing import Dict, List, Optional, Union
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Hashable, List, Optional, Union
 
 import tiktoken
 from openai import (
@@ -10,7 +16,13 @@ from openai import (
     OpenAIError,
     RateLimitError,
 )
-from openai.types.chat import ChatCompletion, ChatCompletionMessage
+from openai.types.chat import (
+    ChatCompletion,
+    ChatCompletionMessage,
+    ChatCompletionMessageToolCall,
+)
+from openai.types.chat.chat_completion_message_tool_call import Function
+from pydantic import BaseModel
 from tenacity import (
     retry,
     retry_if_exception_type,
@@ -21,15 +33,23 @@ from tenacity import (
 from app.bedrock import BedrockClient
 from app.config import LLMSettings, config
 from app.exceptions import TokenLimitExceeded
+from app.http_pool import http_client_pool
+from app.llm_cache import llm_response_cache
+from app.llm_router import Endpoint, LLMRouter, get_llm_router
+from app.llm_stream import StreamCallback, closes_stream_sink, invoke_stream_callback
 from app.logger import logger  # Assuming a logger is set up in your app
+from app.metrics import LLM_REQUEST_SECONDS, LLM_TOKENS
+from app.rate_limiter import get_rate_limiter
 from app.schema import (
     ROLE_VALUES,
     TOOL_CHOICE_TYPE,
     TOOL_CHOICE_VALUES,
     Message,
     ToolChoice,
+    format_wire_message,
 )
 
+
 REASONING_MODELS = ["o1", "o3-mini"]
 MULTIMODAL_MODELS = [
     "gpt-4-vision-preview",
@@ -41,6 +61,19 @@ MULTIMODAL_MODELS = [
 ]
 
 
+class TokenUsage(BaseModel):
+    """Tokens used by the LLM requests of one unit of work, e.g. a task run"""
+
+    input_tokens: int = 0
+    completion_tokens: int = 0
+
+
+# Usage of the current context (e.g. a task run), counted by every LLM instance.
+# Instances can be shared between tasks (e.g. "default"), so their own counters
+# are process-wide.
+llm_usage: ContextVar[Optional[TokenUsage]] = ContextVar("llm_usage", default=None)
+
+
 class TokenCounter:
     # Token constants
     BASE_MESSAGE_TOKENS = 4
@@ -53,8 +86,15 @@ class TokenCounter:
     HIGH_DETAIL_TARGET_SHORT_SIDE = 768
     TILE_SIZE = 512
 
-    def __init__(self, tokenizer):
+    # Per-message token count cache size
+    DEFAULT_CACHE_SIZE = 4096
+
+    def __init__(self, tokenizer, cache_size: int = DEFAULT_CACHE_SIZE):
         self.tokenizer = tokenizer
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[Hashable, int]" = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
 
     def count_text(self, text: str) -> int:
         """Calculate tokens for a text string"""
@@ -150,44 +190,227 @@ class TokenCounter:
                 token_count += self.count_text(function.get("arguments", ""))
         return token_count
 
+    def count_single_message(self, message: dict) -> int:
+        """Calculate tokens for a single message, using the LRU cache when possible"""
+        key = self._message_key(message)
+        if key is not None:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.cache_hits += 1
+                return cached
+
+        tokens = self.BASE_MESSAGE_TOKENS  # Base tokens per message
+
+        # Add role tokens
+        tokens += self.count_text(message.get("role", ""))
+
+        # Add content tokens
+        if "content" in message:
+            tokens += self.count_content(message["content"])
+
+        # Add tool calls tokens
+        if "tool_calls" in message:
+            tokens += self.count_tool_calls(message["tool_calls"])
+
+        # Add name and tool_call_id tokens
+        tokens += self.count_text(message.get("name", ""))
+        tokens += self.count_text(message.get("tool_call_id", ""))
+
+        self.cache_misses += 1
+        if key is not None and self.cache_size > 0:
+            self._cache[key] = tokens
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return tokens
+
     def count_message_tokens(self, messages: List[dict]) -> int:
         """Calculate the total number of tokens in a message list"""
         total_tokens = self.FORMAT_TOKENS  # Base format tokens
 
         for message in messages:
-            tokens = self.BASE_MESSAGE_TOKENS  # Base tokens per message
+            total_tokens += self.count_single_message(message)
+
+        return total_tokens
 
-            # Add role tokens
-            tokens += self.count_text(message.get("role", ""))
+    def clear_cache(self) -> None:
+        """Drop all cached per-message token counts"""
+        self._cache.clear()
 
-            # Add content tokens
-            if "content" in message:
-                tokens += self.count_content(message["content"])
+    @staticmethod
+    def _message_key(message: dict) -> Optional[Hashable]:
+        """Build a cache key from the fields that affect the token count.
+
+        The key is a tuple of the message's own strings, so hashing it reuses the
+        hash cached on each string object and is O(1) for messages seen before.
+        Images only contribute their detail level and dimensions, since the image
+        payload itself does not change the token count. Returns None when the
+        message contains values that cannot be keyed.
+        """
+        content = message.get("content")
+        if isinstance(content, list):
+            parts = []
+            for item in content:
+                if isinstance(item, str):
+                    parts.append(item)
+                elif isinstance(item, dict) and "text" in item:
+                    parts.append(("text", item["text"]))
+                elif isinstance(item, dict) and "image_url" in item:
+                    dimensions = item.get("dimensions")
+                    parts.append(
+                        (
+                            "image_url",
+                            item.get("detail", "medium"),
+                            tuple(dimensions) if dimensions else None,
+                        )
+                    )
+                else:
+                    return None
+            content = tuple(parts)
+        elif content is not None and not isinstance(content, str):
+            return None
 
-            # Add tool calls tokens
-            if "tool_calls" in message:
-                tokens += self.count_tool_calls(message["tool_calls"])
+        tool_calls = message.get("tool_calls")
+        if tool_calls:
+            try:
+                tool_calls = tuple(
+                    (
+                        call["function"].get("name", ""),
+                        call["function"].get("arguments", ""),
+                    )
+                    for call in tool_calls
+                    if "function" in call
+                )
+            except (AttributeError, TypeError):
+                return None
 
-            # Add name and tool_call_id tokens
-            tokens += self.count_text(message.get("name", ""))
-            tokens += self.count_text(message.get("tool_call_id", ""))
+        return (
+            message.get("role", ""),
+            content,
+            tool_calls,
+            message.get("name", ""),
+            message.get("tool_call_id", ""),
+        )
 
-            total_tokens += tokens
 
-        return total_tokens
+@lru_cache(maxsize=None)
+def _get_token_counter(model: str) -> TokenCounter:
+    """Tokenizer and token count cache, shared by every LLM using the same model"""
+    try:
+        tokenizer = tiktoken.encoding_for_model(model)
+    except KeyError:
+        # If the model is not in tiktoken's presets, use cl100k_base as default
+        tokenizer = tiktoken.get_encoding("cl100k_base")
+    return TokenCounter(tokenizer)
+
+
+@lru_cache(maxsize=64)
+def _get_client(
+    api_type: str,
+    base_url: str,
+    api_key: str,
+    api_version: str,
+    max_workers: Optional[int] = None,
+):
+    """API client, shared by every LLM using the same endpoint and credentials"""
+    # Clients targeting the same base_url share one pooled HTTP transport
+    if api_type == "azure":
+        return AsyncAzureOpenAI(
+            base_url=base_url,
+            api_key=api_key,
+            api_version=api_version,
+            http_client=http_client_pool.get_client(base_url),
+        )
+    elif api_type == "aws":
+        # base_url is only used as endpoint override when it is a full URL
+        return BedrockClient(
+            endpoint_url=base_url if "://" in (base_url or "") else None,
+            max_workers=max_workers,
+        )
+    return AsyncOpenAI(
+        api_key=api_key,
+        base_url=base_url,
+        http_client=http_client_pool.get_client(base_url),
+    )
+
+
+def _get_router(config_name: str, llm_config: LLMSettings) -> Optional[LLMRouter]:
+    """Router over the config's own endpoint and its equivalent `endpoints`"""
+    names = [
+        name
+        for name in dict.fromkeys(llm_config.endpoints or [])
+        if name != config_name
+    ]
+    if not names:
+        return None
+    missing = [name for name in names if name not in config.llm]
+    if missing:
+        raise ValueError(f"Unknown LLM endpoints for '{config_name}': {missing}")
+
+    key = (
+        llm_config.model,
+        llm_config.base_url,
+        tuple(names),
+        llm_config.hedge_delay,
+    )
+
+    def build() -> LLMRouter:
+        endpoints = []
+        for name, settings in [(config_name, llm_config)] + [
+            (name, config.llm[name]) for name in names
+        ]:
+            endpoints.append(
+                Endpoint(
+                    name=name,
+                    model=settings.model,
+                    client=_get_client(
+                        settings.api_type,
+                        settings.base_url,
+                        settings.api_key,
+                        settings.api_version,
+                        settings.max_concurrent_requests,
+                    ),
+                    rate_limiter=get_rate_limiter(
+                        settings.model,
+                        settings.base_url,
+                        requests_per_minute=settings.requests_per_minute,
+                        tokens_per_minute=settings.tokens_per_minute,
+                        max_concurrent_requests=settings.max_concurrent_requests,
+                    ),
+                )
+            )
+        return LLMRouter(endpoints, hedge_delay=llm_config.hedge_delay)
+
+    return get_llm_router(key, build)
 
 
 class LLM:
-    _instances: Dict[str, "LLM"] = {}
+    """LLM client with per-instance token usage counters.
+
+    Instances are registered by config name. Names defined in the config file are
+    kept for the lifetime of the process; other names (e.g. per-task configs
+    created by the tasks API) live in a bounded LRU and should be released with
+    `LLM.release` once the task is done. The API client, tokenizer and token count
+    cache are shared between instances, so an instance itself only owns its
+    settings and usage counters.
+    """
+
+    _instances: "OrderedDict[str, LLM]" = OrderedDict()
+    # Maximum number of registered instances whose name is not in the config file
+    max_instances: int = 128
 
     def __new__(
         cls, config_name: str = "default", llm_config: Optional[LLMSettings] = None
     ):
-        if config_name not in cls._instances:
+        instance = cls._instances.get(config_name)
+        if instance is None:
             instance = super().__new__(cls)
             instance.__init__(config_name, llm_config)
             cls._instances[config_name] = instance
-        return cls._instances[config_name]
+            cls._evict_instances()
+        else:
+            cls._instances.move_to_end(config_name)
+        return instance
 
     def __init__(
         self, config_name: str = "default", llm_config: Optional[LLMSettings] = None
@@ -196,6 +419,7 @@ class LLM:
             llm_config = llm_config or config.llm.get(
                 config_name, config.llm["default"]
             )
+            self.config_name = config_name
             self.model = llm_config.model
             self.max_tokens = llm_config.max_tokens
             self.temperature = llm_config.temperature
@@ -203,6 +427,7 @@ class LLM:
             self.api_key = llm_config.api_key
             self.api_version = llm_config.api_version
             self.base_url = llm_config.base_url
+            self.stream_tool_calls = llm_config.stream_tool_calls
 
             # Add token counting related attributes
             self.total_input_tokens = 0
@@ -213,25 +438,44 @@ class LLM:
                 else None
             )
 
-            # Initialize tokenizer
-            try:
-                self.tokenizer = tiktoken.encoding_for_model(self.model)
-            except KeyError:
-                # If the model is not in tiktoken's presets, use cl100k_base as default
-                self.tokenizer = tiktoken.get_encoding("cl100k_base")
-
-            if self.api_type == "azure":
-                self.client = AsyncAzureOpenAI(
-                    base_url=self.base_url,
-                    api_key=self.api_key,
-                    api_version=self.api_version,
-                )
-            elif self.api_type == "aws":
-                self.client = BedrockClient()
-            else:
-                self.client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url)
+            # Shared resources
+            self.token_counter = _get_token_counter(self.model)
+            self.tokenizer = self.token_counter.tokenizer
+            self.client = _get_client(
+                self.api_type,
+                self.base_url,
+                self.api_key,
+                self.api_version,
+                llm_config.max_concurrent_requests,
+            )
+            self.rate_limiter = get_rate_limiter(
+                self.model,
+                self.base_url,
+                requests_per_minute=llm_config.requests_per_minute,
+                tokens_per_minute=llm_config.tokens_per_minute,
+                max_concurrent_requests=llm_config.max_concurrent_requests,
+            )
+            self.response_cache = llm_response_cache
+            self.router = _get_router(config_name, llm_config)
 
-            self.token_counter = TokenCounter(self.tokenizer)
+    @classmethod
+    def _evict_instances(cls) -> None:
+        """Drop the least recently used instances that are not defined in the config"""
+        evictable = [name for name in cls._instances if name not in config.llm]
+        for name in evictable[: max(0, len(evictable) - cls.max_instances)]:
+            logger.debug(f"Evicting LLM instance '{name}' from the registry")
+            del cls._instances[name]
+
+    @classmethod
+    def release(cls, config_name: str) -> bool:
+        """Remove an instance from the registry, e.g. when its task is removed.
+
+        Returns:
+            bool: Whether an instance was registered under the name
+        """
+        if config_name in config.llm:
+            return False
+        return cls._instances.pop(config_name, None) is not None
 
     def count_tokens(self, text: str) -> int:
         """Calculate the number of tokens in a text"""
@@ -242,11 +486,182 @@ class LLM:
     def count_message_tokens(self, messages: List[dict]) -> int:
         return self.token_counter.count_message_tokens(messages)
 
-    def update_token_count(self, input_tokens: int, completion_tokens: int = 0) -> None:
-        """Update token counts"""
-        # Only track tokens if max_input_tokens is set
+    def _count_input_tokens(
+        self,
+        messages: List[dict],
+        system_msgs: Optional[List[dict]],
+        messages_tokens: Optional[int],
+    ) -> int:
+        """Token count of a formatted request.
+
+        With a precomputed count of the conversation only the system messages are
+        counted, so the cost does not grow with the conversation.
+        """
+        if messages_tokens is None:
+            return self.count_message_tokens(messages)
+        return self.count_message_tokens(system_msgs or []) + messages_tokens
+
+    @property
+    def supports_images(self) -> bool:
+        """Whether images are sent to the model, see `format_messages`"""
+        return self.model in MULTIMODAL_MODELS
+
+    def count_message(self, message: Union[dict, Message]) -> int:
+        """Calculate the number of tokens a single message adds to a request"""
+        formatted = self.format_messages([message], self.supports_images)
+        if not formatted:
+            return 0
+        return self.token_counter.count_single_message(formatted[0])
+
+    @asynccontextmanager
+    async def _completion(self, input_tokens: int, **params):
+        """Send a chat completion request once the rate limiter admits it.
+
+        The limiter slot is held until the block exits, so a streamed response
+        counts as in flight until it has been fully consumed. Configs with
+        `endpoints` are sent through the latency-aware router instead.
+        """
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            if self.router is not None:
+                async with self.router.completion(input_tokens, **params) as response:
+                    yield response
+            elif self.rate_limiter is None:
+                yield await self.client.chat.completions.create(**params)
+            else:
+                async with self.rate_limiter.acquire(input_tokens):
+                    yield await self.client.chat.completions.create(**params)
+            outcome = "success"
+        finally:
+            LLM_REQUEST_SECONDS.observe(
+                time.perf_counter() - started,
+                model=params.get("model", self.model),
+                outcome=outcome,
+            )
+
+    async def _create_completion(self, input_tokens: int, **params):
+        """Send a non-streaming chat completion request through the rate limiter"""
+        async with self._completion(input_tokens, **params) as response:
+            return response
+
+    def _response_cache_key(
+        self, params: dict, use_cache: Optional[bool] = None
+    ) -> Optional[str]:
+        """Cache key of a request, or None if the request must not be cached"""
+        if use_cache is False or not self.response_cache.should_cache(
+            params.get("temperature", self.temperature), force=bool(use_cache)
+        ):
+            return None
+        return self.response_cache.make_key(
+            params["model"],
+            params["messages"],
+            tools=params.get("tools"),
+            tool_choice=params.get("tool_choice"),
+            temperature=params.get("temperature"),
+        )
+
+    async def _stream_tool_response(
+        self,
+        input_tokens: int,
+        params: dict,
+        stream_sink: Optional[StreamCallback] = None,
+        on_tool_call: Optional[StreamCallback] = None,
+    ) -> ChatCompletionMessage:
+        """Stream a tool request and assemble the tool-call deltas into a message.
+
+        Content deltas are passed to `stream_sink` as they arrive. A tool call is
+        complete once a delta for the next tool call index starts (or the stream
+        ends); its arguments are JSON-validated at that point and the call is passed
+        to `on_tool_call`, so callers can act on it before the stream finishes.
+        """
+        content_parts: List[str] = []
+        calls: "OrderedDict[int, dict]" = OrderedDict()
+        finished: set = set()
+
+        async def finish_call(index: int) -> None:
+            if index in finished:
+                return
+            finished.add(index)
+            call = calls[index]
+            try:
+                json.loads(call["arguments"] or "{}")
+            except json.JSONDecodeError as e:
+                logger.warning(
+                    f"Streamed arguments of tool '{call['name']}' are not valid JSON: {e}"
+                )
+                return
+            await invoke_stream_callback(on_tool_call, self._build_tool_call(call))
+
+        async with self._completion(input_tokens, **params, stream=True) as response:
+            async for chunk in response:
+                if not chunk.choices or not chunk.choices[0].delta:
+                    continue
+                delta = chunk.choices[0].delta
+                if delta.content:
+                    content_parts.append(delta.content)
+                    await invoke_stream_callback(stream_sink, delta.content)
+                for tool_delta in delta.tool_calls or []:
+                    index = tool_delta.index
+                    if index not in calls:
+                        # A new tool call started, the previous ones are complete
+                        for previous in list(calls):
+                            await finish_call(previous)
+                        calls[index] = {"id": "", "name": "", "arguments": ""}
+                    call = calls[index]
+                    if tool_delta.id:
+                        call["id"] = tool_delta.id
+                    if tool_delta.function:
+                        if tool_delta.function.name:
+                            call["name"] += tool_delta.function.name
+                        if tool_delta.function.arguments:
+                            call["arguments"] += tool_delta.function.arguments
+        for index in calls:
+            await finish_call(index)
+
+        content = "".join(content_parts)
+        tool_calls = [self._build_tool_call(call) for call in calls.values()]
+
+        # Estimate completion tokens, streamed responses carry no usage
+        completion_tokens = self.count_tokens(content) + sum(
+            self.count_tokens(call["name"] + call["arguments"])
+            for call in calls.values()
+        )
+        self._add_usage(0, completion_tokens)
+        logger.info(
+            f"Estimated completion tokens for streaming tool response: {completion_tokens}"
+        )
+
+        return ChatCompletionMessage(
+            role="assistant",
+            content=content or None,
+            tool_calls=tool_calls or None,
+        )
+
+    @staticmethod
+    def _build_tool_call(call: dict) -> ChatCompletionMessageToolCall:
+        return ChatCompletionMessageToolCall(
+            id=call["id"],
+            type="function",
+            function=Function(name=call["name"], arguments=call["arguments"]),
+        )
+
+    def _add_usage(self, input_tokens: int, completion_tokens: int) -> None:
+        """Add to the instance totals, the context's `llm_usage` and the metrics"""
         self.total_input_tokens += input_tokens
         self.total_completion_tokens += completion_tokens
+        usage = llm_usage.get()
+        if usage is not None:
+            usage.input_tokens += input_tokens
+            usage.completion_tokens += completion_tokens
+        if input_tokens:
+            LLM_TOKENS.inc(input_tokens, model=self.model, kind="input")
+        if completion_tokens:
+            LLM_TOKENS.inc(completion_tokens, model=self.model, kind="completion")
+
+    def update_token_count(self, input_tokens: int, completion_tokens: int = 0) -> None:
+        """Update token counts"""
+        self._add_usage(input_tokens, completion_tokens)
         logger.info(
             f"Token usage: Input={input_tokens}, Completion={completion_tokens}, "
             f"Cumulative Input={self.total_input_tokens}, Cumulative Completion={self.total_completion_tokens}, "
@@ -299,58 +714,17 @@ class LLM:
         formatted_messages = []
 
         for message in messages:
-            # Convert Message objects to dictionaries
+            # Message objects cache their formatted dict, only new ones are built
             if isinstance(message, Message):
-                message = message.to_dict()
-
-            if isinstance(message, dict):
-                # If message is a dict, ensure it has required fields
-                if "role" not in message:
-                    raise ValueError("Message dict must contain 'role' field")
-
-                # Process base64 images if present and model supports images
-                if supports_images and message.get("base64_image"):
-                    # Initialize or convert content to appropriate format
-                    if not message.get("content"):
-                        message["content"] = []
-                    elif isinstance(message["content"], str):
-                        message["content"] = [
-                            {"type": "text", "text": message["content"]}
-                        ]
-                    elif isinstance(message["content"], list):
-                        # Convert string items to proper text objects
-                        message["content"] = [
-                            (
-                                {"type": "text", "text": item}
-                                if isinstance(item, str)
-                                else item
-                            )
-                            for item in message["content"]
-                        ]
-
-                    # Add the image to content
-                    message["content"].append(
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/jpeg;base64,{message['base64_image']}"
-                            },
-                        }
-                    )
-
-                    # Remove the base64_image field
-                    del message["base64_image"]
-                # If model doesn't support images but message has base64_image, handle gracefully
-                elif not supports_images and message.get("base64_image"):
-                    # Just remove the base64_image field and keep the text content
-                    del message["base64_image"]
-
-                if "content" in message or "tool_calls" in message:
-                    formatted_messages.append(message)
-                # else: do not include the message
+                formatted = message.to_wire(supports_images)
+            elif isinstance(message, dict):
+                formatted = format_wire_message(message, supports_images)
             else:
                 raise TypeError(f"Unsupported message type: {type(message)}")
 
+            if formatted is not None:
+                formatted_messages.append(formatted)
+
         # Validate all messages have required fields
         for msg in formatted_messages:
             if msg["role"] not in ROLE_VALUES:
@@ -358,6 +732,7 @@ class LLM:
 
         return formatted_messages
 
+    @closes_stream_sink()
     @retry(
         wait=wait_random_exponential(min=1, max=60),
         stop=stop_after_attempt(6),
@@ -371,6 +746,9 @@ class LLM:
         system_msgs: Optional[List[Union[dict, Message]]] = None,
         stream: bool = True,
         temperature: Optional[float] = None,
+        use_cache: Optional[bool] = None,
+        stream_sink: Optional[StreamCallback] = None,
+        messages_tokens: Optional[int] = None,
     ) -> str:
         """
         Send a prompt to the LLM and get the response.
@@ -380,6 +758,13 @@ class LLM:
             system_msgs: Optional system messages to prepend
             stream (bool): Whether to stream the response
             temperature (float): Sampling temperature for the response
+            use_cache (bool): Force (True) or bypass (False) the response cache;
+                by default only deterministic requests are cached when enabled
+            stream_sink: Called with each content delta when streaming, e.g.
+                `BaseAgent.emit_llm_stream` or `print_stream_sink`; deltas are
+                discarded if None
+            messages_tokens: Precomputed token count of `messages` (without
+                system messages), e.g. `Memory.token_count`; counted if None
 
         Returns:
             str: The generated response
@@ -392,7 +777,7 @@ class LLM:
         """
         try:
             # Check if the model supports images
-            supports_images = self.model in MULTIMODAL_MODELS
+            supports_images = self.supports_images
 
             # Format system and user messages with image support check
             if system_msgs:
@@ -402,7 +787,9 @@ class LLM:
                 messages = self.format_messages(messages, supports_images)
 
             # Calculate input token count
-            input_tokens = self.count_message_tokens(messages)
+            input_tokens = self._count_input_tokens(
+                messages, system_msgs, messages_tokens
+            )
 
             # Check if token limits are exceeded
             if not self.check_token_limit(input_tokens):
@@ -423,10 +810,18 @@ class LLM:
                     temperature if temperature is not None else self.temperature
                 )
 
+            cache_key = self._response_cache_key(params, use_cache)
+            if cache_key:
+                cached = await self.response_cache.get(cache_key)
+                if cached is not None:
+                    logger.info("Serving LLM response from cache")
+                    return cached
+            start_time = time.monotonic()
+
             if not stream:
                 # Non-streaming request
-                response = await self.client.chat.completions.create(
-                    **params, stream=False
+                response = await self._create_completion(
+                    input_tokens, **params, stream=False
                 )
 
                 if not response.choices or not response.choices[0].message.content:
@@ -437,28 +832,38 @@ class LLM:
                     response.usage.prompt_tokens, response.usage.completion_tokens
                 )
 
-                return response.choices[0].message.content
+                content = response.choices[0].message.content
+                if cache_key:
+                    await self.response_cache.set(
+                        cache_key,
+                        content,
+                        input_tokens=response.usage.prompt_tokens,
+                        completion_tokens=response.usage.completion_tokens,
+                        latency=time.monotonic() - start_time,
+                    )
+                return content
 
             # Streaming request, For streaming, update estimated token count before making the request
             self.update_token_count(input_tokens)
 
-            response = await self.client.chat.completions.create(**params, stream=True)
-
             collected_messages = []
             completion_text = ""
-            async for chunk in response:
-                chunk_message = (
-                    chunk.choices[0].delta.content
-                    if chunk.choices
-                    and chunk.choices[0].delta
-                    and chunk.choices[0].delta.content
-                    else ""
-                )
-                collected_messages.append(chunk_message)
-                completion_text += chunk_message
-                print(chunk_message, end="", flush=True)
+            async with self._completion(
+                input_tokens, **params, stream=True
+            ) as response:
+                async for chunk in response:
+                    chunk_message = (
+                        chunk.choices[0].delta.content
+                        if chunk.choices
+                        and chunk.choices[0].delta
+                        and chunk.choices[0].delta.content
+                        else ""
+                    )
+                    collected_messages.append(chunk_message)
+                    completion_text += chunk_message
+                    if chunk_message:
+                        await invoke_stream_callback(stream_sink, chunk_message)
 
-            print()  # Newline after streaming
             full_response = "".join(collected_messages).strip()
             if not full_response:
                 raise ValueError("Empty response from streaming LLM")
@@ -468,8 +873,16 @@ class LLM:
             logger.info(
                 f"Estimated completion tokens for streaming response: {completion_tokens}"
             )
-            self.total_completion_tokens += completion_tokens
-
+            self._add_usage(0, completion_tokens)
+
+            if cache_key:
+                await self.response_cache.set(
+                    cache_key,
+                    full_response,
+                    input_tokens=input_tokens,
+                    completion_tokens=completion_tokens,
+                    latency=time.monotonic() - start_time,
+                )
             return full_response
 
         except TokenLimitExceeded:
@@ -491,6 +904,7 @@ class LLM:
             logger.exception(f"Unexpected error in ask")
             raise
 
+    @closes_stream_sink()
     @retry(
         wait=wait_random_exponential(min=1, max=60),
         stop=stop_after_attempt(6),
@@ -505,6 +919,7 @@ class LLM:
         system_msgs: Optional[List[Union[dict, Message]]] = None,
         stream: bool = False,
         temperature: Optional[float] = None,
+        stream_sink: Optional[StreamCallback] = None,
     ) -> str:
         """
         Send a prompt with images to the LLM and get the response.
@@ -515,6 +930,8 @@ class LLM:
             system_msgs: Optional system messages to prepend
             stream (bool): Whether to stream the response
             temperature (float): Sampling temperature for the response
+            stream_sink: Called with each content delta when streaming; deltas
+                are discarded if None
 
         Returns:
             str: The generated response
@@ -542,15 +959,19 @@ class LLM:
                     "The last message must be from the user to attach images"
                 )
 
-            # Process the last user message to include images
-            last_message = formatted_messages[-1]
+            # Process the last user message to include images (formatted dicts are
+            # cached on the messages, so work on a copy)
+            last_message = dict(formatted_messages[-1])
+            formatted_messages[-1] = last_message
 
             # Convert content to multimodal format if needed
             content = last_message["content"]
             multimodal_content = (
                 [{"type": "text", "text": content}]
                 if isinstance(content, str)
-                else content if isinstance(content, list) else []
+                else list(content)
+                if isinstance(content, list)
+                else []
             )
 
             # Add images to content
@@ -601,7 +1022,7 @@ class LLM:
 
             # Handle non-streaming request
             if not stream:
-                response = await self.client.chat.completions.create(**params)
+                response = await self._create_completion(input_tokens, **params)
 
                 if not response.choices or not response.choices[0].message.content:
                     raise ValueError("Empty or invalid response from LLM")
@@ -611,21 +1032,20 @@ class LLM:
 
             # Handle streaming request
             self.update_token_count(input_tokens)
-            response = await self.client.chat.completions.create(**params)
-
             collected_messages = []
-            async for chunk in response:
-                chunk_message = (
-                    chunk.choices[0].delta.content
-                    if chunk.choices
-                    and chunk.choices[0].delta
-                    and chunk.choices[0].delta.content
-                    else ""
-                )
-                collected_messages.append(chunk_message)
-                print(chunk_message, end="", flush=True)
+            async with self._completion(input_tokens, **params) as response:
+                async for chunk in response:
+                    chunk_message = (
+                        chunk.choices[0].delta.content
+                        if chunk.choices
+                        and chunk.choices[0].delta
+                        and chunk.choices[0].delta.content
+                        else ""
+                    )
+                    collected_messages.append(chunk_message)
+                    if chunk_message:
+                        await invoke_stream_callback(stream_sink, chunk_message)
 
-            print()  # Newline after streaming
             full_response = "".join(collected_messages).strip()
 
             if not full_response:
@@ -651,6 +1071,7 @@ class LLM:
             logger.error(f"Unexpected error in ask_with_images: {e}")
             raise
 
+    @closes_stream_sink()
     @retry(
         wait=wait_random_exponential(min=1, max=60),
         stop=stop_after_attempt(6),
@@ -666,6 +1087,13 @@ class LLM:
         tools: Optional[List[dict]] = None,
         tool_choice: TOOL_CHOICE_TYPE = ToolChoice.AUTO,  # type: ignore
         temperature: Optional[float] = None,
+        tools_tokens: Optional[int] = None,
+        messages_tokens: Optional[int] = None,
+        formatted_messages: Optional[List[dict]] = None,
+        use_cache: Optional[bool] = None,
+        stream: bool = False,
+        stream_sink: Optional[StreamCallback] = None,
+        on_tool_call: Optional[StreamCallback] = None,
         **kwargs,
     ) -> ChatCompletionMessage | None:
         """
@@ -678,6 +1106,18 @@ class LLM:
             tools: List of tools to use
             tool_choice: Tool choice strategy
             temperature: Sampling temperature for the response
+            tools_tokens: Precomputed token count of the tools, e.g. from
+                `ToolCollection.count_tokens`; computed from `tools` if None
+            messages_tokens: Precomputed token count of `messages` (without
+                system messages), e.g. `Memory.token_count`; counted if None
+            formatted_messages: `messages` already in request format, e.g.
+                `Memory.to_wire(llm.supports_images)`; formatted if None
+            use_cache: Force (True) or bypass (False) the response cache; by
+                default only deterministic requests are cached when enabled
+            stream: Stream the response and assemble the tool calls incrementally
+            stream_sink: Called with each content delta when streaming
+            on_tool_call: Called with each tool call as soon as its arguments are
+                complete and valid JSON when streaming
             **kwargs: Additional completion arguments
 
         Returns:
@@ -695,23 +1135,29 @@ class LLM:
                 raise ValueError(f"Invalid tool_choice: {tool_choice}")
 
             # Check if the model supports images
-            supports_images = self.model in MULTIMODAL_MODELS
+            supports_images = self.supports_images
 
             # Format messages
+            if formatted_messages is None:
+                formatted_messages = self.format_messages(messages, supports_images)
             if system_msgs:
                 system_msgs = self.format_messages(system_msgs, supports_images)
-                messages = system_msgs + self.format_messages(messages, supports_images)
+                messages = system_msgs + formatted_messages
             else:
-                messages = self.format_messages(messages, supports_images)
+                # Copy, the formatted list may be shared (see `Memory.to_wire`)
+                messages = list(formatted_messages)
 
             # Calculate input token count
-            input_tokens = self.count_message_tokens(messages)
+            input_tokens = self._count_input_tokens(
+                messages, system_msgs, messages_tokens
+            )
 
             # If there are tools, calculate token count for tool descriptions
-            tools_tokens = 0
-            if tools:
-                for tool in tools:
-                    tools_tokens += self.count_tokens(str(tool))
+            if tools_tokens is None:
+                tools_tokens = 0
+                if tools:
+                    for tool in tools:
+                        tools_tokens += self.count_tokens(str(tool))
 
             input_tokens += tools_tokens
 
@@ -745,9 +1191,31 @@ class LLM:
                     temperature if temperature is not None else self.temperature
                 )
 
-            params["stream"] = False  # Always use non-streaming for tool requests
-            response: ChatCompletion = await self.client.chat.completions.create(
-                **params
+            cache_key = self._response_cache_key(params, use_cache)
+            if cache_key:
+                cached = await self.response_cache.get(cache_key)
+                if cached is not None:
+                    logger.info("Serving LLM tool response from cache")
+                    return ChatCompletionMessage.model_validate(cached)
+            start_time = time.monotonic()
+
+            if stream:
+                self.update_token_count(input_tokens)
+                message = await self._stream_tool_response(
+                    input_tokens, params, stream_sink, on_tool_call
+                )
+                if cache_key and (message.content or message.tool_calls):
+                    await self.response_cache.set(
+                        cache_key,
+                        message.model_dump(),
+                        input_tokens=input_tokens,
+                        latency=time.monotonic() - start_time,
+                    )
+                return message
+
+            params["stream"] = False
+            response: ChatCompletion = await self._create_completion(
+                input_tokens, **params
             )
 
             # Check if response is valid
@@ -761,7 +1229,17 @@ class LLM:
                 response.usage.prompt_tokens, response.usage.completion_tokens
             )
 
-            return response.choices[0].message
+            message = response.choices[0].message
+            # Bedrock returns duck-typed responses, only cache real OpenAI messages
+            if cache_key and isinstance(message, ChatCompletionMessage):
+                await self.response_cache.set(
+                    cache_key,
+                    message.model_dump(),
+                    input_tokens=response.usage.prompt_tokens,
+                    completion_tokens=response.usage.completion_tokens,
+                    latency=time.monotonic() - start_time,
+                )
+            return message
 
         except TokenLimitExceeded:
             # Re-raise token limit errors without logging
@@ -0,0 +1,190 @@
+"""Exact-match response cache for LLM requests.
+
+Responses are keyed by a hash of everything that determines the completion
+(model, messages, tools, tool_choice, temperature). Entries live in an in-memory
+LRU and, optionally, in a SQLite file so they survive restarts. Only
+deterministic requests (temperature 0) are cached unless caching is forced.
+"""
+
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Optional
+
+from app.config import LLMCacheSettings, config
+from app.logger import logger
+
+
+class LLMResponseCache:
+    """Two-tier (memory LRU + SQLite) cache of LLM responses."""
+
+    def __init__(self, settings: Optional[LLMCacheSettings] = None):
+        self.settings = settings or config.llm_cache or LLMCacheSettings()
+        self._memory: "OrderedDict[str, dict]" = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+
+        # Statistics
+        self.hits = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.saved_input_tokens = 0
+        self.saved_completion_tokens = 0
+        self.saved_seconds = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.settings.enabled
+
+    def should_cache(self, temperature: Optional[float], force: bool = False) -> bool:
+        """Whether a request with this temperature may be served from the cache."""
+        if not self.enabled:
+            return False
+        return force or self.settings.force or not temperature
+
+    @staticmethod
+    def make_key(
+        model: str,
+        messages: list,
+        tools: Optional[list] = None,
+        tool_choice: Optional[str] = None,
+        temperature: Optional[float] = None,
+    ) -> str:
+        payload = json.dumps(
+            [model, messages, tools, tool_choice, temperature],
+            sort_keys=True,
+            ensure_ascii=False,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        if not self.settings.disk_path:
+            return None
+        if self._db is None:
+            path = Path(self.settings.disk_path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(path), check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.commit()
+        return self._db
+
+    def _disk_get(self, key: str) -> Optional[dict]:
+        with self._db_lock:
+            db = self._connect()
+            if db is None:
+                return None
+            row = db.execute(
+                "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < time.time():
+                db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                db.commit()
+                return None
+            return json.loads(row[0])
+
+    def _disk_set(self, key: str, entry: dict) -> None:
+        with self._db_lock:
+            db = self._connect()
+            if db is None:
+                return
+            db.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(entry), entry["expires_at"]),
+            )
+            db.commit()
+
+    def _remember(self, key: str, entry: dict) -> None:
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.settings.max_entries:
+            self._memory.popitem(last=False)
+
+    async def get(self, key: str) -> Optional[Any]:
+        """Return the cached response for a key, or None on a miss."""
+        entry = self._memory.get(key)
+        if entry is not None and entry["expires_at"] < time.time():
+            del self._memory[key]
+            entry = None
+        if entry is not None:
+            self._memory.move_to_end(key)
+            self.memory_hits += 1
+        else:
+            try:
+                entry = await asyncio.to_thread(self._disk_get, key)
+            except sqlite3.Error as e:
+                logger.warning(f"LLM cache disk lookup failed: {e}")
+                entry = None
+            if entry is not None:
+                self._remember(key, entry)
+                self.disk_hits += 1
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.saved_input_tokens += entry.get("input_tokens", 0)
+        self.saved_completion_tokens += entry.get("completion_tokens", 0)
+        self.saved_seconds += entry.get("latency", 0.0)
+        return entry["response"]
+
+    async def set(
+        self,
+        key: str,
+        response: Any,
+        input_tokens: int = 0,
+        completion_tokens: int = 0,
+        latency: float = 0.0,
+    ) -> None:
+        """Store a JSON-serializable response."""
+        entry = {
+            "response": response,
+            "input_tokens": input_tokens,
+            "completion_tokens": completion_tokens,
+            "latency": latency,
+            "expires_at": time.time() + self.settings.ttl,
+        }
+        self._remember(key, entry)
+        try:
+            await asyncio.to_thread(self._disk_set, key, entry)
+        except sqlite3.Error as e:
+            logger.warning(f"LLM cache disk write failed: {e}")
+
+    def clear(self) -> None:
+        self._memory.clear()
+        with self._db_lock:
+            db = self._connect()
+            if db is not None:
+                db.execute("DELETE FROM llm_cache")
+                db.commit()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "saved_input_tokens": self.saved_input_tokens,
+            "saved_completion_tokens": self.saved_completion_tokens,
+            "saved_seconds": round(self.saved_seconds, 3),
+        }
+
+
+llm_response_cache = LLMResponseCache()
@@ -0,0 +1,257 @@
+"""Latency-aware routing of LLM requests across equivalent endpoints.
+
+An `LLMRouter` fronts several endpoints that serve the same model (e.g. several
+OpenAI-compatible gateways or Azure deployments). Each request goes to the
+endpoint with the best observed latency and error rate. With a hedge delay
+configured, a duplicate request is sent to the next best endpoint if the first
+one has not answered in time; whichever answers first wins and the other request
+is cancelled.
+"""
+
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+from app.logger import logger
+from app.rate_limiter import RateLimiter
+
+
+class EndpointStats:
+    """Sliding window of latencies and outcomes of one endpoint."""
+
+    # Number of recent requests the statistics are computed over
+    WINDOW = 200
+    # Endpoints with fewer samples are preferred so every endpoint gets measured
+    MIN_SAMPLES = 3
+    # How strongly the error rate inflates the latency score
+    ERROR_PENALTY = 10.0
+
+    def __init__(self):
+        self.latencies: Deque[float] = deque(maxlen=self.WINDOW)
+        self.outcomes: Deque[bool] = deque(maxlen=self.WINDOW)
+        self.requests_total = 0
+        self.errors_total = 0
+        self.hedges_won = 0
+        self.cancelled_total = 0
+        self.in_flight = 0
+
+    def record_success(self, latency: float) -> None:
+        self.requests_total += 1
+        self.latencies.append(latency)
+        self.outcomes.append(True)
+
+    def record_latency(self, latency: float) -> None:
+        self.latencies.append(latency)
+        self.outcomes.append(True)
+
+    def record_error(self) -> None:
+        self.requests_total += 1
+        self.errors_total += 1
+        self.outcomes.append(False)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))
+        return ordered[index]
+
+    @property
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    def score(self) -> Tuple[int, float, float]:
+        """Sort key, lower is better."""
+        if len(self.outcomes) < self.MIN_SAMPLES:
+            return (0, float(len(self.outcomes)), 0.0)
+        p50 = self.percentile(0.5)
+        p99 = self.percentile(0.99)
+        if p50 is None:  # Only errors so far
+            return (1, math.inf, math.inf)
+        penalty = 1 + self.error_rate * self.ERROR_PENALTY
+        return (1, p50 * penalty, p99 * penalty)
+
+    def to_dict(self) -> dict:
+        p50 = self.percentile(0.5)
+        p99 = self.percentile(0.99)
+        return {
+            "requests_total": self.requests_total,
+            "errors_total": self.errors_total,
+            "error_rate": round(self.error_rate, 3),
+            "p50_seconds": round(p50, 3) if p50 is not None else None,
+            "p99_seconds": round(p99, 3) if p99 is not None else None,
+            "in_flight": self.in_flight,
+            "hedges_won": self.hedges_won,
+            "cancelled_total": self.cancelled_total,
+        }
+
+
+class Endpoint:
+    """One API endpoint a router can send requests to."""
+
+    def __init__(
+        self,
+        name: str,
+        model: str,
+        client: Any,
+        rate_limiter: Optional[RateLimiter] = None,
+    ):
+        self.name = name
+        self.model = model
+        self.client = client
+        self.rate_limiter = rate_limiter
+        self.stats = EndpointStats()
+
+
+class LLMRouter:
+    """Routes chat completion requests to the best of several equivalent endpoints."""
+
+    def __init__(self, endpoints: List[Endpoint], hedge_delay: Optional[float] = None):
+        if not endpoints:
+            raise ValueError("LLMRouter needs at least one endpoint")
+        self.endpoints = endpoints
+        self.hedge_delay = hedge_delay
+        self.hedged_total = 0
+
+    def ranked(self) -> List[Endpoint]:
+        """Endpoints ordered from best to worst observed latency and error rate."""
+        return sorted(self.endpoints, key=lambda endpoint: endpoint.stats.score())
+
+    async def _attempt(
+        self, endpoint: Endpoint, input_tokens: int, params: dict
+    ) -> Tuple[Any, AsyncExitStack]:
+        """Send the request to one endpoint.
+
+        Returns the response and an exit stack holding the endpoint's rate limiter
+        slot, which the caller must close once the response has been consumed.
+        """
+        stack = AsyncExitStack()
+        start: Optional[float] = None
+        endpoint.stats.in_flight += 1
+        try:
+            if endpoint.rate_limiter is not None:
+                await stack.enter_async_context(
+                    endpoint.rate_limiter.acquire(input_tokens)
+                )
+            start = time.monotonic()
+            response = await endpoint.client.chat.completions.create(
+                **{**params, "model": endpoint.model}
+            )
+            endpoint.stats.record_success(time.monotonic() - start)
+            return response, stack
+        except asyncio.CancelledError:
+            endpoint.stats.cancelled_total += 1
+            if start is not None:
+                # Lost a hedge race: the time so far is a lower bound of its latency
+                endpoint.stats.record_latency(time.monotonic() - start)
+            await stack.aclose()
+            raise
+        except Exception:
+            endpoint.stats.record_error()
+            await stack.aclose()
+            raise
+        finally:
+            endpoint.stats.in_flight -= 1
+
+    @staticmethod
+    async def _discard(task: asyncio.Task) -> None:
+        """Cancel a losing attempt and release whatever it acquired."""
+        task.cancel()
+        try:
+            response, stack = await task
+        except BaseException:
+            return
+        close = getattr(response, "close", None)
+        if close is not None:
+            try:
+                await close()
+            except Exception:
+                pass
+        await stack.aclose()
+
+    async def _race(
+        self, input_tokens: int, params: dict
+    ) -> Tuple[Any, AsyncExitStack]:
+        ranked = self.ranked()
+        primary = asyncio.create_task(self._attempt(ranked[0], input_tokens, params))
+        tasks: Dict[asyncio.Task, Endpoint] = {primary: ranked[0]}
+
+        if self.hedge_delay is not None and len(ranked) > 1:
+            done, _ = await asyncio.wait({primary}, timeout=self.hedge_delay)
+            if not done:
+                self.hedged_total += 1
+                logger.info(
+                    f"No response from LLM endpoint '{ranked[0].name}' after "
+                    f"{self.hedge_delay}s, hedging on '{ranked[1].name}'"
+                )
+                hedge = asyncio.create_task(
+                    self._attempt(ranked[1], input_tokens, params)
+                )
+                tasks[hedge] = ranked[1]
+
+        pending = set(tasks)
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    if task is not primary:
+                        tasks[task].stats.hedges_won += 1
+                    for other in done | pending:
+                        if other is not task:
+                            await self._discard(other)
+                    return task.result()
+        except asyncio.CancelledError:
+            for task in tasks:
+                await self._discard(task)
+            raise
+        raise error
+
+    @asynccontextmanager
+    async def completion(self, input_tokens: int, **params) -> AsyncIterator[Any]:
+        """Send a chat completion request to the best endpoint.
+
+        Latency is measured until the response (or, for streams, the response
+        headers) arrives. The endpoint's rate limiter slot is held until the block
+        exits.
+        """
+        response, stack = await self._race(input_tokens, params)
+        async with stack:
+            yield response
+
+    def stats(self) -> dict:
+        return {
+            "hedge_delay": self.hedge_delay,
+            "hedged_total": self.hedged_total,
+            "endpoints": {
+                endpoint.name: endpoint.stats.to_dict() for endpoint in self.endpoints
+            },
+        }
+
+
+_routers: Dict[Tuple, LLMRouter] = {}
+
+
+def get_llm_router(key: Tuple, build) -> LLMRouter:
+    """Get the router registered under `key`, creating it with `build()` once."""
+    if key not in _routers:
+        _routers[key] = build()
+    return _routers[key]
+
+
+def router_stats() -> Dict[str, dict]:
+    """Per-endpoint latency, error and hedging statistics of every router."""
+    return {
+        "+".join(endpoint.name for endpoint in router.endpoints): router.stats()
+        for router in _routers.values()
+    }
@@ -0,0 +1,113 @@
+"""Sinks for streamed LLM output.
+
+A stream sink is any callable taking a content delta; it may be sync or async.
+Sinks that also define `close()` are closed once the call has ended, after all
+of its retries. The API server routes deltas to the agent event queue (see
+`BaseAgent.emit_llm_stream`), `PrintStreamSink` echoes them to stdout for
+interactive runs, and `QueueStreamSink` exposes them as an async iterator.
+Streaming calls made without a sink discard their deltas, so library and
+server processes never write model output to stdout.
+"""
+
+import asyncio
+import inspect
+from functools import wraps
+from typing import Any, AsyncIterator, Callable, Optional
+
+from app.logger import logger
+
+
+# Callback receiving streamed content deltas or completed tool calls
+StreamCallback = Callable[[Any], Any]
+
+_STREAM_END = object()
+
+
+async def invoke_stream_callback(
+    callback: Optional[StreamCallback], value: Any
+) -> None:
+    """Call a sync or async stream callback, never letting it break the stream"""
+    if callback is None:
+        return
+    try:
+        result = callback(value)
+        if inspect.isawaitable(result):
+            await result
+    except Exception as e:
+        logger.warning(f"Stream callback failed: {e}")
+
+
+async def close_stream_sink(sink: Optional[StreamCallback]) -> None:
+    """Signal the end of a stream to sinks that support it"""
+    close = getattr(sink, "close", None)
+    if close is None:
+        return
+    try:
+        result = close()
+        if inspect.isawaitable(result):
+            await result
+    except Exception as e:
+        logger.warning(f"Closing stream sink failed: {e}")
+
+
+def closes_stream_sink(default: Optional[StreamCallback] = None):
+    """Decorate an LLM call taking `stream` and `stream_sink` arguments.
+
+    The sink of a streaming call is closed once the call returns or fails for
+    good. Placed outside the retry decorator, so a failed attempt does not end
+    the stream of a `QueueStreamSink` while the next attempt still writes to it.
+    Streaming calls made without a sink use `default`, if any.
+    """
+
+    def decorator(func: Callable) -> Callable:
+        signature = inspect.signature(func)
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            if not bound.arguments.get("stream"):
+                return await func(*bound.args, **bound.kwargs)
+            if bound.arguments.get("stream_sink") is None:
+                bound.arguments["stream_sink"] = default
+            try:
+                return await func(*bound.args, **bound.kwargs)
+            finally:
+                await close_stream_sink(bound.arguments["stream_sink"])
+
+        return wrapper
+
+    return decorator
+
+
+class PrintStreamSink:
+    """Echo streamed deltas to stdout, for interactive CLI runs."""
+
+    def __call__(self, delta: str) -> None:
+        print(delta, end="", flush=True)
+
+    def close(self) -> None:
+        print()  # Newline after streaming
+
+
+class QueueStreamSink:
+    """Collect streamed deltas into a queue that can be consumed with `async for`."""
+
+    def __init__(self, maxsize: int = 0):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+
+    async def __call__(self, delta: str) -> None:
+        await self.queue.put(delta)
+
+    async def close(self) -> None:
+        await self.queue.put(_STREAM_END)
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        while True:
+            delta = await self.queue.get()
+            if delta is _STREAM_END:
+                return
+            yield delta
+
+
+print_stream_sink = PrintStreamSink()
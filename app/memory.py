@@ -1,35 +1,153 @@
-from typing import List, Optional
+import json
+from collections import Counter
+from typing import Dict, List, Optional, Set, Tuple
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 
+from app.config import config
 from app.llm import LLM
-from app.schema import Message
+from app.logger import logger
+from app.memory_store import MemoryStore, StoredMessages, get_memory_store
+from app.schema import Message, Role
+
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+SUMMARY_PROMPT = (
+    "Summarize the following part of an agent's conversation. Keep the facts, "
+    "decisions, tool results and open problems that later steps may need, and "
+    "drop everything else. Answer with the summary only.\n\n{conversation}"
+)
+# Characters of each evicted message passed to the summarizer
+SUMMARY_MESSAGE_CHARS = 2000
 
 
 class Memory(BaseModel):
     messages: List[Message] = Field(default_factory=list)
-    max_messages: int = Field(default=100)
+    max_messages: int = Field(default_factory=lambda: config.memory.max_messages)
+    token_budget: Optional[int] = Field(
+        default_factory=lambda: config.memory.token_budget
+    )
+    compaction_target: float = Field(
+        default_factory=lambda: config.memory.compaction_target
+    )
+    summarize: bool = Field(default_factory=lambda: config.memory.summarize)
+    max_inline_images: Optional[int] = Field(
+        default_factory=lambda: config.memory.max_inline_images
+    )
     llm: Optional[LLM] = Field(default=None)
+    # Durable store the messages are persisted to, see `attach_store`
+    task_id: Optional[str] = Field(default=None)
+    store: Optional[MemoryStore] = Field(default=None, exclude=True)
+
+    # Per-message token counts, kept parallel to `messages`
+    _token_counts: List[int] = PrivateAttr(default_factory=list)
+    _token_total: int = PrivateAttr(default=0)
+    # Request dicts of the messages by images support, with the number of
+    # messages they cover; extended as messages are appended
+    _wire: Dict[bool, Tuple[int, List[dict]]] = PrivateAttr(default_factory=dict)
+    # Store sequence numbers, kept parallel to `messages` while a store is attached
+    _seqs: List[float] = PrivateAttr(default_factory=list)
+    _next_seq: int = PrivateAttr(default=0)
+    # Occurrences of assistant contents, by hash
+    _content_counts: Counter = PrivateAttr(default_factory=Counter)
+    # Signature of the latest assistant tool calls and how many assistant
+    # messages in a row made exactly these calls
+    _last_tool_call: Optional[int] = PrivateAttr(default=None)
+    _tool_call_run: int = PrivateAttr(default=0)
 
     model_config = {"arbitrary_types_allowed": True}
 
     async def add_message(self, message: Message) -> None:
-        """Add a message to memory"""
+        """Add a message to memory.
+
+        Messages are treated as immutable once added: their token counts and
+        request dicts are cached. Replace a message instead of changing it.
+        """
+        self._sync_token_counts()
+        self._sync_store()
         self.messages.append(message)
-        # Optional: Implement message limit
-        if len(self.messages) > self.max_messages:
-            self.messages = self.messages[-self.max_messages :]
+        self._count_new_messages()
+        self._persist_new_messages()
+        self._evict_images()
+        await self._compact()
 
     async def add_messages(self, messages: List[Message]) -> None:
         """Add multiple messages to memory"""
+        self._sync_token_counts()
+        self._sync_store()
         self.messages.extend(messages)
-        # Optional: Implement message limit
-        if len(self.messages) > self.max_messages:
-            self.messages = self.messages[-self.max_messages :]
+        self._count_new_messages()
+        self._persist_new_messages()
+        self._evict_images()
+        await self._compact()
 
     def clear(self) -> None:
         """Clear all messages"""
+        if self._has_store():
+            self.store.deactivate(self.task_id, self._seqs)
         self.messages.clear()
+        self._token_counts.clear()
+        self._token_total = 0
+        self._wire.clear()
+        self._seqs = []
+        self._reset_index()
+
+    def attach_store(self, task_id: str, store: Optional[MemoryStore] = None) -> None:
+        """Persist this memory as the conversation of a new task.
+
+        Anything the store held for the task id is replaced by the current messages.
+        Does nothing when no store is given or configured.
+        """
+        store = store or get_memory_store()
+        if store is None:
+            return
+        self.task_id = task_id
+        self.store = store
+        store.delete(task_id)
+        self._seqs = []
+        self._next_seq = 0
+        self._persist_new_messages()
+
+    async def resume(self, task_id: str, store: Optional[MemoryStore] = None) -> int:
+        """Replace the messages with the task's stored conversation.
+
+        Only the active conversation is loaded; turns evicted by compaction stay in
+        the store and can be paged in with `load_history`.
+
+        Returns:
+            int: Number of messages restored (0 if nothing was stored)
+        """
+        store = store or get_memory_store()
+        if store is None:
+            return 0
+        stored = await store.load(task_id)
+        if not stored:
+            return 0
+        self.task_id = task_id
+        self.store = store
+        self.messages[:] = [message for _, message in stored]
+        self._seqs = [seq for seq, _ in stored]
+        self._next_seq = int(max(self._seqs)) + 1
+        self._token_counts = []
+        self._token_total = 0
+        self._wire.clear()
+        self._reset_index()
+        self._count_new_messages()
+        logger.info(f"Resumed {len(stored)} messages of task {task_id} from the store")
+        return len(stored)
+
+    async def load_history(
+        self, before: Optional[float] = None, limit: int = 50
+    ) -> StoredMessages:
+        """Page in turns evicted from the active conversation, oldest first"""
+        if not self._has_store():
+            return []
+        return await self.store.history(self.task_id, before=before, limit=limit)
+
+    async def flush(self) -> None:
+        """Wait until every change is persisted to the store"""
+        if self.store is not None:
+            await self.store.flush()
 
     def get_recent_messages(self, n: int) -> List[Message]:
         """Get n most recent messages"""
@@ -38,3 +156,322 @@ class Memory(BaseModel):
     def to_dict_list(self) -> List[dict]:
         """Convert messages to list of dicts"""
         return [msg.to_dict() for msg in self.messages]
+
+    def to_wire(self, supports_images: bool) -> List[dict]:
+        """The messages in request format, see `LLM.format_messages`.
+
+        Only messages appended since the previous call are formatted; the list
+        is rebuilt after compaction or image eviction. It is shared between calls
+        and must be treated as read-only.
+        """
+        self._sync_token_counts()
+        covered, wire = self._wire.get(supports_images, (0, []))
+        for message in self.messages[covered:]:
+            formatted = message.to_wire(supports_images)
+            if formatted is not None:
+                wire.append(formatted)
+        self._wire[supports_images] = (len(self.messages), wire)
+        return wire
+
+    @property
+    def token_count(self) -> int:
+        """Total tokens of the messages in memory, maintained incrementally"""
+        self._sync_token_counts()
+        return self._token_total
+
+    @property
+    def size_bytes(self) -> int:
+        """Approximate size of the held message payloads (text, images, tool calls)"""
+        size = 0
+        for message in self.messages:
+            size += len(message.content or "") + len(message.base64_image or "")
+            for tool_call in message.tool_calls or []:
+                size += len(tool_call.function.name) + len(tool_call.function.arguments)
+        return size
+
+    def duplicate_count(self) -> int:
+        """Number of earlier assistant messages with the same content as the last message"""
+        self._sync_token_counts()
+        if not self.messages or not self.messages[-1].content:
+            return 0
+        last = self.messages[-1]
+        count = self._content_counts[hash(last.content)]
+        return count - 1 if last.role == Role.ASSISTANT else count
+
+    def repeated_tool_call_count(self) -> int:
+        """How many times in a row the latest tool calls had already been made.
+
+        Only consecutive repeats count: a different call in between resets it, so
+        e.g. scrolling again after other actions is not a loop.
+        """
+        self._sync_token_counts()
+        if self._last_tool_call is None:
+            return 0
+        return self._tool_call_run - 1
+
+    @staticmethod
+    def _tool_call_signature(message: Message) -> int:
+        """Hash of the called tools and their arguments, ignoring key order and ids"""
+        calls = []
+        for call in message.tool_calls:
+            try:
+                arguments = json.dumps(
+                    json.loads(call.function.arguments or "{}"), sort_keys=True
+                )
+            except json.JSONDecodeError:
+                arguments = call.function.arguments
+            calls.append((call.function.name, arguments))
+        return hash(tuple(calls))
+
+    def _index_message(self, message: Message, delta: int = 1) -> None:
+        if message.role != Role.ASSISTANT:
+            return
+        if message.content:
+            self._content_counts[hash(message.content)] += delta
+
+    def _track_tool_calls(self, message: Message) -> None:
+        signature = self._tool_call_signature(message) if message.tool_calls else None
+        if signature is not None and signature == self._last_tool_call:
+            self._tool_call_run += 1
+        else:
+            self._tool_call_run = 1 if signature is not None else 0
+        self._last_tool_call = signature
+
+    def _reset_index(self) -> None:
+        self._content_counts = Counter()
+        self._last_tool_call = None
+        self._tool_call_run = 0
+
+    def _count_new_messages(self) -> None:
+        """Count tokens and index only the messages appended since the last count"""
+        for message in self.messages[len(self._token_counts) :]:
+            tokens = self.llm.count_message(message) if self.llm else 0
+            self._token_counts.append(tokens)
+            self._token_total += tokens
+            self._index_message(message)
+            if message.role == Role.ASSISTANT:
+                self._track_tool_calls(message)
+
+    def _sync_token_counts(self) -> None:
+        """Reconcile the counts when `messages` was changed outside of add_message"""
+        if len(self._token_counts) > len(self.messages):
+            # The list was replaced or shrunk, recount (cheap: counts are cached by the LLM)
+            self._token_counts = []
+            self._token_total = 0
+            self._wire.clear()
+            self._reset_index()
+        self._count_new_messages()
+
+    def _has_store(self) -> bool:
+        return self.store is not None and self.task_id is not None
+
+    def _sync_store(self) -> None:
+        """Re-persist everything when `messages` was replaced outside of add_message"""
+        if self._has_store() and len(self._seqs) > len(self.messages):
+            self.store.deactivate(self.task_id, self._seqs)
+            self._seqs = []
+            self._persist_new_messages()
+
+    def _persist_new_messages(self) -> None:
+        """Enqueue the messages appended since the last call to the store"""
+        if not self._has_store():
+            return
+        entries = []
+        for message in self.messages[len(self._seqs) :]:
+            seq = float(self._next_seq)
+            self._next_seq += 1
+            self._seqs.append(seq)
+            entries.append((seq, message))
+        self.store.save(self.task_id, entries)
+
+    def _evict_images(self) -> None:
+        """Keep only the `max_inline_images` most recent images inline.
+
+        Older images are replaced by a text reference to their workspace file, so
+        they stop being resent (and counted) on every request.
+        """
+        if self.max_inline_images is None:
+            return
+        inline = 0
+        for index in range(len(self.messages) - 1, -1, -1):
+            message = self.messages[index]
+            if not message.base64_image:
+                continue
+            inline += 1
+            if inline <= self.max_inline_images:
+                continue
+            reference = (
+                f"[Image omitted, saved at {message.image_path}]"
+                if message.image_path
+                else "[Image omitted]"
+            )
+            # Replace instead of mutating, the message may be referenced elsewhere
+            self._index_message(message, -1)
+            self.messages[index] = message.model_copy(
+                update={
+                    "base64_image": None,
+                    "content": f"{message.content}\n{reference}"
+                    if message.content
+                    else reference,
+                }
+            )
+            self._index_message(self.messages[index], 1)
+            self._wire.clear()
+            tokens = self.llm.count_message(self.messages[index]) if self.llm else 0
+            self._token_total += tokens - self._token_counts[index]
+            self._token_counts[index] = tokens
+            if self._has_store():
+                self.store.save(
+                    self.task_id, [(self._seqs[index], self.messages[index])]
+                )
+
+    def _turn_groups(self) -> List[Tuple[int, int]]:
+        """Split messages into [start, end) groups that must be kept or evicted together.
+
+        An assistant message with tool calls forms one group with the tool
+        responses that follow it; every other message is a group of its own.
+        """
+        groups: List[Tuple[int, int]] = []
+        for index, message in enumerate(self.messages):
+            if (
+                message.role == Role.TOOL
+                and groups
+                and self.messages[groups[-1][0]].tool_calls
+            ):
+                groups[-1] = (groups[-1][0], index + 1)
+            else:
+                groups.append((index, index + 1))
+        return groups
+
+    def _pinned_groups(self, groups: List[Tuple[int, int]]) -> Set[int]:
+        """Groups never evicted: system messages, the latest tool exchange and the last turn"""
+        pinned = {
+            i
+            for i, (start, _) in enumerate(groups)
+            if self.messages[start].role == Role.SYSTEM
+        }
+        if groups:
+            pinned.add(len(groups) - 1)
+        for i in range(len(groups) - 1, -1, -1):
+            if self.messages[groups[i][0]].tool_calls:
+                pinned.add(i)
+                break
+        return pinned
+
+    async def _compact(self) -> None:
+        """Evict the oldest turns once memory exceeds max_messages or the token budget.
+
+        Token-budget compaction goes down to `compaction_target` of the budget so it
+        does not run again on the next message. Evicted turns are optionally
+        replaced by a single rolling summary message.
+        """
+        over_budget = (
+            self.token_budget is not None and self._token_total > self.token_budget
+        )
+        if len(self.messages) <= self.max_messages and not over_budget:
+            return
+
+        target_tokens = (
+            int(self.token_budget * self.compaction_target) if over_budget else None
+        )
+        groups = self._turn_groups()
+        pinned = self._pinned_groups(groups)
+
+        evicted: Set[int] = set()
+        count, tokens = len(self.messages), self._token_total
+        # Leave room for the summary message that replaces the evicted turns
+        reserve = 1 if self.summarize and self.llm else 0
+        for i, (start, end) in enumerate(groups):
+            if count + reserve <= self.max_messages and (
+                target_tokens is None or tokens <= target_tokens
+            ):
+                break
+            if i in pinned:
+                continue
+            evicted.add(i)
+            count -= end - start
+            tokens -= sum(self._token_counts[start:end])
+        if not evicted:
+            return
+
+        evicted_messages = [
+            message
+            for i in sorted(evicted)
+            for message in self.messages[groups[i][0] : groups[i][1]]
+        ]
+        summary = await self._summarize(evicted_messages) if reserve else None
+        if summary is not None and self.llm.count_message(summary) >= (
+            self._token_total - tokens
+        ):
+            # A summary as large as the turns it replaces saves nothing
+            summary = None
+
+        has_store = self._has_store()
+        messages, counts, seqs = [], [], []
+        for i, (start, end) in enumerate(groups):
+            if i not in evicted:
+                messages.extend(self.messages[start:end])
+                counts.extend(self._token_counts[start:end])
+                if has_store:
+                    seqs.extend(self._seqs[start:end])
+            else:
+                for message in self.messages[start:end]:
+                    self._index_message(message, -1)
+                if has_store:
+                    self.store.deactivate(self.task_id, self._seqs[start:end])
+        if summary is not None:
+            # Place the summary right after the leading system messages
+            position = 0
+            while position < len(messages) and messages[position].role == Role.SYSTEM:
+                position += 1
+            messages.insert(position, summary)
+            counts.insert(position, self.llm.count_message(summary))
+            if has_store:
+                # Order the summary right before the first message it precedes
+                if position < len(seqs):
+                    seq = seqs[position] - 0.5
+                else:
+                    seq = float(self._next_seq)
+                    self._next_seq += 1
+                seqs.insert(position, seq)
+                self.store.save(self.task_id, [(seq, summary)])
+
+        # Update in place, callers may hold a reference to the list
+        self.messages[:] = messages
+        self._token_counts = counts
+        self._token_total = sum(counts)
+        self._seqs = seqs
+        self._wire.clear()
+        logger.info(
+            f"Compacted memory: evicted {len(evicted_messages)} messages "
+            f"({'summarized' if summary else 'dropped'}), "
+            f"{len(self.messages)} messages / {self._token_total} tokens left"
+        )
+
+    async def _summarize(self, messages: List[Message]) -> Optional[Message]:
+        """Summarize evicted messages, or None if the LLM call fails"""
+        lines = []
+        for message in messages:
+            content = message.content or ""
+            if content.startswith(SUMMARY_PREFIX):
+                content = content[len(SUMMARY_PREFIX) :]
+            if message.tool_calls:
+                calls = ", ".join(
+                    f"{call.function.name}({call.function.arguments})"
+                    for call in message.tool_calls
+                )
+                content = f"{content}\n[tool calls: {calls}]".strip()
+            lines.append(f"{message.role}: {content[:SUMMARY_MESSAGE_CHARS]}")
+        try:
+            summary = await self.llm.ask(
+                [
+                    Message.user_message(
+                        SUMMARY_PROMPT.format(conversation="\n\n".join(lines))
+                    )
+                ],
+                stream=False,
+            )
+        except Exception as e:
+            logger.warning(f"Memory summarization failed, dropping turns: {e}")
+            return None
+        return Message.user_message(SUMMARY_PREFIX + summary)
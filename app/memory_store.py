@@ -0,0 +1,215 @@
+"""Durable storage for agent memory.
+
+A `MemoryStore` persists every message of a task under a sequence number, so a
+task's conversation survives a worker restart and can be resumed without
+replaying LLM calls. Messages evicted by memory compaction stay in the store as
+inactive rows; they are not loaded on resume but can be paged in with
+`history()`.
+
+Writes are queued and flushed in batches by a background task (write-behind), so
+the agent loop never waits on disk I/O.
+"""
+
+import asyncio
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+from app.config import config
+from app.logger import logger
+from app.schema import Message
+
+
+# (sequence number, message) pairs, ordered by sequence number
+StoredMessages = List[Tuple[float, Message]]
+
+
+class MemoryStore(ABC):
+    """Interface of durable memory backends.
+
+    Write methods only enqueue the change and return immediately; `flush()` waits
+    until everything enqueued so far is persisted.
+    """
+
+    @abstractmethod
+    def save(self, task_id: str, entries: Iterable[Tuple[float, Message]]) -> None:
+        """Insert or replace messages as active"""
+
+    @abstractmethod
+    def deactivate(self, task_id: str, seqs: Iterable[float]) -> None:
+        """Mark messages as evicted from the active conversation"""
+
+    @abstractmethod
+    def delete(self, task_id: str) -> None:
+        """Remove every message of a task"""
+
+    @abstractmethod
+    async def load(self, task_id: str) -> StoredMessages:
+        """Load the active conversation of a task"""
+
+    @abstractmethod
+    async def history(
+        self, task_id: str, before: Optional[float] = None, limit: int = 50
+    ) -> StoredMessages:
+        """Load evicted messages older than `before`, most recent `limit` first page"""
+
+    async def flush(self) -> None:
+        """Wait until all enqueued writes are persisted"""
+
+    async def close(self) -> None:
+        await self.flush()
+
+
+class SQLiteMemoryStore(MemoryStore):
+    """SQLite (WAL) memory store with batched write-behind."""
+
+    def __init__(self, path: str, batch_size: int = 100, flush_interval: float = 0.2):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._pending: List[Tuple[str, tuple]] = []
+        self._flusher: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._write_lock: Optional[asyncio.Lock] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            # WAL keeps the database consistent on crash without fsync per commit
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS memory_messages ("
+                "task_id TEXT NOT NULL, seq REAL NOT NULL, data TEXT NOT NULL, "
+                "active INTEGER NOT NULL DEFAULT 1, PRIMARY KEY (task_id, seq))"
+            )
+            self._db.commit()
+        return self._db
+
+    # Write-behind queue
+
+    def _enqueue(self, sql: str, params: tuple) -> None:
+        self._pending.append((sql, params))
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No event loop (e.g. scripts), write through
+            self._write(self._take_pending())
+            return
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        if self._flusher is None or self._flusher.done():
+            self._flusher = loop.create_task(self._flush_loop())
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    def _take_pending(self) -> List[Tuple[str, tuple]]:
+        pending, self._pending = self._pending, []
+        return pending
+
+    def _write(self, operations: List[Tuple[str, tuple]]) -> None:
+        if not operations:
+            return
+        with self._db_lock:
+            db = self._connect()
+            with db:
+                for sql, params in operations:
+                    db.execute(sql, params)
+
+    async def _flush_loop(self) -> None:
+        while self._pending:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self._flush_pending()
+
+    async def _flush_pending(self) -> None:
+        if self._write_lock is None:
+            self._write_lock = asyncio.Lock()
+        # Batches must be written in the order they were enqueued
+        async with self._write_lock:
+            operations = self._take_pending()
+            try:
+                await asyncio.to_thread(self._write, operations)
+            except sqlite3.Error as e:
+                logger.error(f"Failed to persist {len(operations)} memory writes: {e}")
+
+    async def flush(self) -> None:
+        await self._flush_pending()
+
+    # MemoryStore interface
+
+    def save(self, task_id: str, entries: Iterable[Tuple[float, Message]]) -> None:
+        for seq, message in entries:
+            self._enqueue(
+                "INSERT OR REPLACE INTO memory_messages (task_id, seq, data, active) "
+                "VALUES (?, ?, ?, 1)",
+                (task_id, seq, message.model_dump_json()),
+            )
+
+    def deactivate(self, task_id: str, seqs: Iterable[float]) -> None:
+        for seq in seqs:
+            self._enqueue(
+                "UPDATE memory_messages SET active = 0 WHERE task_id = ? AND seq = ?",
+                (task_id, seq),
+            )
+
+    def delete(self, task_id: str) -> None:
+        self._enqueue("DELETE FROM memory_messages WHERE task_id = ?", (task_id,))
+
+    def _select(self, sql: str, params: tuple) -> StoredMessages:
+        with self._db_lock:
+            rows = self._connect().execute(sql, params).fetchall()
+        return [(seq, Message.model_validate_json(data)) for seq, data in rows]
+
+    async def load(self, task_id: str) -> StoredMessages:
+        await self.flush()
+        return await asyncio.to_thread(
+            self._select,
+            "SELECT seq, data FROM memory_messages "
+            "WHERE task_id = ? AND active = 1 ORDER BY seq",
+            (task_id,),
+        )
+
+    async def history(
+        self, task_id: str, before: Optional[float] = None, limit: int = 50
+    ) -> StoredMessages:
+        await self.flush()
+        rows = await asyncio.to_thread(
+            self._select,
+            "SELECT seq, data FROM memory_messages "
+            "WHERE task_id = ? AND active = 0 AND seq < ? ORDER BY seq DESC LIMIT ?",
+            (task_id, before if before is not None else float("inf"), limit),
+        )
+        return rows[::-1]
+
+    async def close(self) -> None:
+        await self.flush()
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+_memory_store: Optional[MemoryStore] = None
+
+
+def get_memory_store() -> Optional[MemoryStore]:
+    """The configured memory store, or None when memory is kept in process only"""
+    global _memory_store
+    settings = config.memory
+    if _memory_store is None and settings.store == "sqlite":
+        _memory_store = SQLiteMemoryStore(
+            settings.store_path,
+            batch_size=settings.store_batch_size,
+            flush_interval=settings.store_flush_interval,
+        )
+    return _memory_store
@@ -0,0 +1,272 @@
+"""Rate limiting and concurrency control for LLM requests.
+
+Each model/base_url pair gets one `RateLimiter` holding a requests-per-minute and a
+tokens-per-minute token bucket plus a cap on in-flight requests. Requests that
+cannot be admitted immediately wait in per-owner queues (one owner per task) that
+are served round-robin, so a single busy task cannot starve the others.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Deque, Dict, Optional, Tuple
+
+from app.logger import logger
+from app.metrics import registry
+
+
+# Owner of the LLM requests made in the current context, e.g. the task id
+llm_request_owner: ContextVar[str] = ContextVar("llm_request_owner", default="default")
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at `rate_per_minute`."""
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated_at) * self.rate
+        )
+        self.updated_at = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` tokens are available (0 if available now)."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float) -> None:
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+
+class _Waiter:
+    __slots__ = ("tokens", "future", "enqueued_at")
+
+    def __init__(self, tokens: int, future: asyncio.Future):
+        self.tokens = tokens
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+
+class RateLimiter:
+    """Admits requests under rpm/tpm budgets and a maximum number in flight."""
+
+    def __init__(
+        self,
+        name: str,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+        max_concurrent_requests: Optional[int] = None,
+    ):
+        self.name = name
+        self.request_bucket = (
+            TokenBucket(requests_per_minute) if requests_per_minute else None
+        )
+        self.token_bucket = (
+            TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        )
+        self.max_concurrent_requests = max_concurrent_requests
+
+        self.in_flight = 0
+        self._queues: "OrderedDict[str, Deque[_Waiter]]" = OrderedDict()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+
+        # Statistics
+        self.admitted_total = 0
+        self.queued_total = 0
+        self.wait_seconds_total = 0.0
+        self.max_wait_seconds = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def _delay(self, tokens: int) -> float:
+        """Seconds until a request with `tokens` input tokens can be admitted."""
+        delay = 0.0
+        if self.request_bucket:
+            delay = max(delay, self.request_bucket.wait_time(1))
+        if self.token_bucket:
+            delay = max(delay, self.token_bucket.wait_time(tokens))
+        return delay
+
+    def _has_slot(self) -> bool:
+        return (
+            self.max_concurrent_requests is None
+            or self.in_flight < self.max_concurrent_requests
+        )
+
+    def _admit(self, tokens: int, waited: float = 0.0) -> None:
+        if self.request_bucket:
+            self.request_bucket.consume(1)
+        if self.token_bucket:
+            self.token_bucket.consume(tokens)
+        self.in_flight += 1
+        self.admitted_total += 1
+        self.wait_seconds_total += waited
+        self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+    def _release(self) -> None:
+        self.in_flight -= 1
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    @asynccontextmanager
+    async def acquire(
+        self, tokens: int = 0, owner: Optional[str] = None
+    ) -> AsyncIterator[None]:
+        """Wait until a request with `tokens` input tokens may be sent.
+
+        Args:
+            tokens: Estimated input tokens of the request
+            owner: Queue to wait in, defaults to `llm_request_owner`
+        """
+        if not self.queue_depth and self._has_slot() and self._delay(tokens) == 0:
+            self._admit(tokens)
+        else:
+            owner = owner or llm_request_owner.get()
+            future = asyncio.get_running_loop().create_future()
+            waiter = _Waiter(tokens, future)
+            self._queues.setdefault(owner, deque()).append(waiter)
+            self.queued_total += 1
+            self._ensure_dispatcher()
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    # Admitted right before the cancellation, give the slot back
+                    self._release()
+                raise
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _ensure_dispatcher(self) -> None:
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        self._wakeup.set()
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+
+    def _next_waiter(self) -> Optional[Tuple[str, _Waiter]]:
+        """Peek the head waiter of the next owner in round-robin order."""
+        for owner in list(self._queues):
+            queue = self._queues[owner]
+            while queue and queue[0].future.done():
+                queue.popleft()  # Cancelled while waiting
+            if not queue:
+                del self._queues[owner]
+                continue
+            return owner, queue[0]
+        return None
+
+    async def _dispatch(self) -> None:
+        while True:
+            self._wakeup.clear()
+            head = self._next_waiter()
+            if head is None:
+                return
+            owner, waiter = head
+
+            if not self._has_slot():
+                await self._wakeup.wait()
+                continue
+            delay = self._delay(waiter.tokens)
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            self._queues[owner].popleft()
+            # Move the owner to the back of the round-robin order
+            self._queues.move_to_end(owner)
+            if not self._queues[owner]:
+                del self._queues[owner]
+            waited = time.monotonic() - waiter.enqueued_at
+            self._admit(waiter.tokens, waited)
+            waiter.future.set_result(None)
+            if waited > 1:
+                logger.info(
+                    f"LLM request for '{owner}' waited {waited:.2f}s in the "
+                    f"{self.name} rate limiter queue"
+                )
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.queue_depth,
+            "queued_owners": len(self._queues),
+            "in_flight": self.in_flight,
+            "admitted_total": self.admitted_total,
+            "queued_total": self.queued_total,
+            "wait_seconds_total": round(self.wait_seconds_total, 3),
+            "max_wait_seconds": round(self.max_wait_seconds, 3),
+            "avg_wait_seconds": round(self.wait_seconds_total / self.admitted_total, 3)
+            if self.admitted_total
+            else 0.0,
+        }
+
+
+_rate_limiters: Dict[Tuple[str, str], RateLimiter] = {}
+
+
+def get_rate_limiter(
+    model: str,
+    base_url: str,
+    requests_per_minute: Optional[int] = None,
+    tokens_per_minute: Optional[int] = None,
+    max_concurrent_requests: Optional[int] = None,
+) -> Optional[RateLimiter]:
+    """Get the limiter shared by all LLM instances for a model/base_url pair.
+
+    Returns None when no limit is configured. The first caller's limits win for a
+    given pair.
+    """
+    if not (requests_per_minute or tokens_per_minute or max_concurrent_requests):
+        return None
+    key = (model, (base_url or "").rstrip("/"))
+    if key not in _rate_limiters:
+        _rate_limiters[key] = RateLimiter(
+            name=f"{model}@{key[1]}",
+            requests_per_minute=requests_per_minute,
+            tokens_per_minute=tokens_per_minute,
+            max_concurrent_requests=max_concurrent_requests,
+        )
+    return _rate_limiters[key]
+
+
+def rate_limiter_stats() -> Dict[str, dict]:
+    """Queue depth, in-flight and wait time statistics of every limiter."""
+    return {limiter.name: limiter.stats() for limiter in _rate_limiters.values()}
+
+
+registry.gauge(
+    "openmanus_llm_rate_limiter_queued_requests",
+    "LLM requests waiting for a rate limiter slot",
+    labels=("limiter",),
+    callback=lambda: (
+        ((limiter.name,), limiter.queue_depth) for limiter in _rate_limiters.values()
+    ),
+)
+registry.gauge(
+    "openmanus_llm_rate_limiter_in_flight_requests",
+    "LLM requests admitted by a rate limiter and not finished yet",
+    labels=("limiter",),
+    callback=lambda: (
+        ((limiter.name,), limiter.in_flight) for limiter in _rate_limiters.values()
+    ),
+)
@@ -3,6 +3,7 @@ import io
 import os
 import tarfile
 import tempfile
+import time
 import uuid
 from typing import Dict, Optional
 
@@ -11,6 +12,7 @@ from docker.errors import NotFound
 from docker.models.containers import Container
 
 from app.config import SandboxSettings
+from app.metrics import SANDBOX_CREATE_SECONDS
 from app.sandbox.core.exceptions import SandboxTimeoutError
 from app.sandbox.core.terminal import AsyncDockerizedTerminal
 
@@ -56,6 +58,7 @@ class DockerSandbox:
             docker.errors.APIError: If Docker API call fails.
             RuntimeError: If container creation or startup fails.
         """
+        started = time.perf_counter()
         try:
             # Prepare container config
             host_config = self.client.api.create_host_config(
@@ -96,9 +99,15 @@ class DockerSandbox:
             )
             await self.terminal.init()
 
+            SANDBOX_CREATE_SECONDS.observe(
+                time.perf_counter() - started, outcome="success"
+            )
             return self
 
         except Exception as e:
+            SANDBOX_CREATE_SECONDS.observe(
+                time.perf_counter() - started, outcome="error"
+            )
             await self.cleanup()  # Ensure resources are cleaned up
             raise RuntimeError(f"Failed to create sandbox: {e}") from e
 
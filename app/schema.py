@@ -1,7 +1,7 @@
 from enum import Enum
-from typing import Any, List, Literal, Optional, Union
+from typing import Any, Dict, List, Literal, Optional, Union
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 
 
 class Role(str, Enum):
@@ -51,6 +51,47 @@ class ToolCall(BaseModel):
     function: Function
 
 
+def format_wire_message(message: dict, supports_images: bool) -> Optional[dict]:
+    """Convert a message dict to the OpenAI request format without mutating it.
+
+    Inlines `base64_image` as an image_url content part when the model supports
+    images, and drops it otherwise. Returns None for messages with neither
+    content nor tool calls, which are not sent.
+    """
+    if "role" not in message:
+        raise ValueError("Message dict must contain 'role' field")
+
+    image = message.get("base64_image")
+    if "base64_image" in message:
+        message = {k: v for k, v in message.items() if k != "base64_image"}
+    if supports_images and image:
+        # Initialize or convert content to appropriate format
+        content = message.get("content")
+        if not content:
+            parts = []
+        elif isinstance(content, str):
+            parts = [{"type": "text", "text": content}]
+        elif isinstance(content, list):
+            # Convert string items to proper text objects
+            parts = [
+                {"type": "text", "text": item} if isinstance(item, str) else item
+                for item in content
+            ]
+        else:
+            parts = [content]
+        parts.append(
+            {
+                "type": "image_url",
+                "image_url": {"url": f"data:image/jpeg;base64,{image}"},
+            }
+        )
+        message["content"] = parts
+
+    if "content" in message or "tool_calls" in message:
+        return message
+    return None
+
+
 class Message(BaseModel):
     """Represents a chat message in the conversation"""
 
@@ -60,6 +101,26 @@ class Message(BaseModel):
     name: Optional[str] = Field(default=None)
     tool_call_id: Optional[str] = Field(default=None)
     base64_image: Optional[str] = Field(default=None)
+    # Workspace path of the image file, used as reference once the image is evicted
+    image_path: Optional[str] = Field(default=None)
+
+    # Serialized dicts keyed by images support (None: plain `to_dict`). Rebound,
+    # never cleared, on field assignment, since copies share the private dict.
+    # Changes inside a field (e.g. appending to `tool_calls`) are not seen:
+    # assign a new value or use `model_copy(update=...)` instead.
+    _wire_cache: Dict[Optional[bool], Optional[dict]] = PrivateAttr(
+        default_factory=dict
+    )
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        super().__setattr__(name, value)
+        if name in Message.model_fields:
+            self._wire_cache = {}
+
+    def model_copy(self, *, update: Optional[Dict[str, Any]] = None, deep=False):
+        copied = super().model_copy(update=update, deep=deep)
+        copied._wire_cache = {}
+        return copied
 
     def __add__(self, other) -> List["Message"]:
         """支持 Message + list 或 Message + Message 的操作"""
@@ -83,6 +144,31 @@ class Message(BaseModel):
 
     def to_dict(self) -> dict:
         """Convert message to dictionary format"""
+        return dict(self._cached_wire(None))
+
+    def to_wire(self, supports_images: bool = False) -> Optional[dict]:
+        """The cached request dict of this message, or None if it is not sent.
+
+        The dict is shared between calls and must be treated as read-only.
+        """
+        return self._cached_wire(supports_images)
+
+    def _cached_wire(self, key: Optional[bool]) -> Optional[dict]:
+        # Read the private dict directly, attribute access to private fields
+        # goes through pydantic's (much slower) __getattr__
+        cache = self.__pydantic_private__["_wire_cache"]
+        try:
+            return cache[key]
+        except KeyError:
+            pass
+        if key is None:
+            wire = self._build_dict()
+        else:
+            wire = format_wire_message(self._cached_wire(None), key)
+        cache[key] = wire
+        return wire
+
+    def _build_dict(self) -> dict:
         message = {"role": self.role}
         if self.content is not None:
             message["content"] = self.content
@@ -98,10 +184,18 @@ class Message(BaseModel):
 
     @classmethod
     def user_message(
-        cls, content: str, base64_image: Optional[str] = None
+        cls,
+        content: str,
+        base64_image: Optional[str] = None,
+        image_path: Optional[str] = None,
     ) -> "Message":
         """Create a user message"""
-        return cls(role=Role.USER, content=content, base64_image=base64_image)
+        return cls(
+            role=Role.USER,
+            content=content,
+            base64_image=base64_image,
+            image_path=image_path,
+        )
 
     @classmethod
     def system_message(cls, content: str) -> "Message":
@@ -8,6 +8,10 @@ class BaseTool(ABC, BaseModel):
     name: str
     description: str
     parameters: Optional[dict] = None
+    # Whether calls may run concurrently with other tool calls of the same step.
+    # Off by default: most tools share the sandbox shell, files or browser, so
+    # only tools without side effects opt in
+    concurrency_safe: bool = False
 
     class Config:
         arbitrary_types_allowed = True
@@ -18,6 +18,7 @@ from app.tool.base import BaseTool, ToolResult
 from app.tool.web_search import WebSearch
 from app.workspace import resolve_path
 
+
 _BROWSER_DESCRIPTION = """\
 A powerful browser automation tool that allows interaction with web pages through various actions.
 * This tool provides commands for controlling a browser session, navigating web pages, and extracting information
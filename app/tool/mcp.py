@@ -1,5 +1,5 @@
 from contextlib import AsyncExitStack
-from typing import List, Optional
+from typing import Any, List, Optional, Union
 
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.sse import sse_client
@@ -11,6 +11,23 @@ from app.tool.base import BaseTool, ToolResult
 from app.tool.tool_collection import ToolCollection
 
 
+# Server tools opted into parallel calls: True for all of them, or their names
+ConcurrencySafeTools = Union[bool, List[str]]
+
+
+def is_concurrency_safe(tool: Any, opted_in: ConcurrencySafeTools) -> bool:
+    """Whether calls of a listed MCP server tool may run in parallel.
+
+    Server tools run serially unless the server config opts them in, or the
+    server annotates them as read-only (`readOnlyHint`, sent by MCP versions with
+    tool annotations).
+    """
+    if opted_in is True or (isinstance(opted_in, list) and tool.name in opted_in):
+        return True
+    annotations = getattr(tool, "annotations", None)
+    return bool(getattr(annotations, "readOnlyHint", False))
+
+
 class MCPClientTool(BaseTool):
     """Represents a tool proxy that can be called on the MCP server from the client side."""
 
@@ -45,6 +62,7 @@ class MCPClients(ToolCollection):
     exit_stack: AsyncExitStack = None
     description: str = "MCP client tools for server interaction"
     client_id: str = ""
+    concurrency_safe: ConcurrencySafeTools = False
 
     def __init__(self, client_id: str):
         super().__init__()  # Initialize with empty tools list
@@ -52,12 +70,15 @@ class MCPClients(ToolCollection):
         self.client_id = client_id
         self.exit_stack = AsyncExitStack()
 
-    async def connect_sse(self, server_url: str) -> None:
+    async def connect_sse(
+        self, server_url: str, concurrency_safe: ConcurrencySafeTools = False
+    ) -> None:
         """Connect to an MCP server using SSE transport."""
         if not server_url:
             raise ValueError("Server URL is required.")
         if self.session:
             await self.disconnect()
+        self.concurrency_safe = concurrency_safe
 
         streams_context = sse_client(url=server_url)
         streams = await self.exit_stack.enter_async_context(streams_context)
@@ -67,12 +88,18 @@ class MCPClients(ToolCollection):
 
         await self._initialize_and_list_tools()
 
-    async def connect_stdio(self, command: str, args: List[str]) -> None:
+    async def connect_stdio(
+        self,
+        command: str,
+        args: List[str],
+        concurrency_safe: ConcurrencySafeTools = False,
+    ) -> None:
         """Connect to an MCP server using stdio transport."""
         if not command:
             raise ValueError("Server command is required.")
         if self.session:
             await self.disconnect()
+        self.concurrency_safe = concurrency_safe
 
         server_params = StdioServerParameters(command=command, args=args)
         stdio_transport = await self.exit_stack.enter_async_context(
@@ -107,6 +134,7 @@ class MCPClients(ToolCollection):
                 parameters=tool.inputSchema,
                 session=self.session,
                 client_id=self.client_id,
+                concurrency_safe=is_concurrency_safe(tool, self.concurrency_safe),
             )
             self.tool_map[prefixed_name] = server_tool
 
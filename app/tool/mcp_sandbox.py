@@ -13,6 +13,7 @@ from mcp.types import TextContent
 from app.config import config
 from app.logger import logger
 from app.tool.base import BaseTool, ToolResult
+from app.tool.mcp import ConcurrencySafeTools, is_concurrency_safe
 from app.tool.tool_collection import ToolCollection
 
 GENERAL_SANDBOX_IMAGE_NAME: str = "iheytang/openmanus-sandbox:latest"
@@ -103,13 +104,18 @@ class MCPToolCallSandboxHost:
             await asyncio.to_thread(container.start)
 
     async def add_sse_client(
-        self, client_id: str, server_url: str
+        self,
+        client_id: str,
+        server_url: str,
+        concurrency_safe: ConcurrencySafeTools = False,
     ) -> "MCPSandboxClients":
         """Add a new SSE-based MCP client connection running in a sandbox.
 
         Args:
             client_id: Unique identifier for the client
             server_url: URL of the MCP server
+            concurrency_safe: Server tools whose calls may run in parallel, True
+                for all of them
 
         Returns:
             MCPSandboxClients: The newly created sandboxed client instance
@@ -124,6 +130,7 @@ class MCPToolCallSandboxHost:
             client_id=client_id,
             host=self,
             server_url=server_url,
+            concurrency_safe=concurrency_safe,
         )
         self.clients[client_id] = client
         return client
@@ -134,6 +141,7 @@ class MCPToolCallSandboxHost:
         command: str,
         args: Optional[List[str]] = None,
         env: Optional[Dict[str, str]] = None,
+        concurrency_safe: ConcurrencySafeTools = False,
     ) -> "MCPSandboxClients":
         """Add a new STDIO-based MCP client connection running in a sandbox.
 
@@ -142,6 +150,8 @@ class MCPToolCallSandboxHost:
             command: Command to execute
             args: List of command arguments
             env: Environment variables
+            concurrency_safe: Server tools whose calls may run in parallel, True
+                for all of them
 
         Returns:
             MCPSandboxClients: The newly created sandboxed client instance
@@ -158,6 +168,7 @@ class MCPToolCallSandboxHost:
             command=command,
             args=args or [],
             env=env or {},
+            concurrency_safe=concurrency_safe,
         )
         self.clients[client_id] = client
         return client
@@ -238,6 +249,7 @@ class MCPSandboxClients(ToolCollection):
     description: str = "MCP client tools running in container for server interaction"
     client_id: str = ""
     host: "MCPToolCallSandboxHost" = None
+    concurrency_safe: ConcurrencySafeTools = False
 
     def __new__(cls, *args, **kwargs):
         """Prevent direct instantiation of MCPSandboxClients."""
@@ -260,10 +272,12 @@ class MCPSandboxClients(ToolCollection):
         command: str,
         args: List[str],
         env: Dict[str, str],
+        concurrency_safe: ConcurrencySafeTools = False,
     ) -> "MCPSandboxClients":
         """Connect to an MCP server using stdio transport within a container."""
         inst = object.__new__(cls)
         inst.__init__(client_id=client_id, host=host)
+        inst.concurrency_safe = concurrency_safe
         inst.command_type = get_command_type(command)
         inst.container_name = inst.get_container_name()
 
@@ -290,11 +304,16 @@ class MCPSandboxClients(ToolCollection):
 
     @classmethod
     async def connect_sse(
-        cls, client_id: str, host: "MCPToolCallSandboxHost", server_url: str
+        cls,
+        client_id: str,
+        host: "MCPToolCallSandboxHost",
+        server_url: str,
+        concurrency_safe: ConcurrencySafeTools = False,
     ) -> "MCPSandboxClients":
         """Connect to an MCP server using SSE transport."""
         inst = object.__new__(cls)
         inst.__init__(client_id=client_id, host=host)
+        inst.concurrency_safe = concurrency_safe
 
         if not server_url:
             raise ValueError("Server URL is required.")
@@ -357,6 +376,7 @@ class MCPSandboxClients(ToolCollection):
                     parameters=tool.inputSchema,
                     session=self.session,
                     client_id=self.client_id,
+                    concurrency_safe=is_concurrency_safe(tool, self.concurrency_safe),
                 )
                 self.tool_map[prefixed_name] = server_tool
                 logger.info(f"Added tool: {prefixed_name}")
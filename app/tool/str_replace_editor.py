@@ -15,6 +15,7 @@ from app.tool.file_operators import (
     SandboxFileOperator,
 )
 
+
 Command = Literal[
     "view",
     "create",
@@ -1,11 +1,15 @@
 """Collection classes for managing multiple tools."""
 
-from typing import Any, Dict, List
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
 
 from app.exceptions import ToolError
 from app.tool.base import BaseTool, ToolFailure, ToolResult
 
 
+if TYPE_CHECKING:
+    from app.llm import LLM
+
+
 class ToolCollection:
     """A collection of defined tools."""
 
@@ -15,12 +19,48 @@ class ToolCollection:
     def __init__(self, *tools: BaseTool):
         self.tools = tools
         self.tool_map = {tool.name: tool for tool in tools}
+        self._invalidate_cache()
 
     def __iter__(self):
         return iter(self.tools)
 
     def to_params(self) -> List[Dict[str, Any]]:
-        return [tool.to_param() for tool in self.tools]
+        """Return the tool params, serialized once per change of the tool set"""
+        self._check_cache()
+        if self._params is None:
+            self._params = [tool.to_param() for tool in self.tools]
+        return self._params
+
+    def count_tokens(self, llm: "LLM") -> int:
+        """Return the token cost of the tool params for the given LLM's tokenizer.
+
+        Per-tool costs are cached by tokenizer and tool name, so the cost is only
+        computed for tools added since the last call.
+        """
+        self._check_cache()
+        tokenizer_name = getattr(llm.tokenizer, "name", None) or str(id(llm.tokenizer))
+        if tokenizer_name not in self._tokens_totals:
+            tool_costs = self._tool_token_costs.setdefault(tokenizer_name, {})
+            total = 0
+            for param in self.to_params():
+                name = param.get("function", {}).get("name")
+                if name not in tool_costs:
+                    tool_costs[name] = llm.count_tokens(str(param))
+                total += tool_costs[name]
+            self._tokens_totals[tokenizer_name] = total
+        return self._tokens_totals[tokenizer_name]
+
+    def _invalidate_cache(self, keep_tool_costs: bool = False) -> None:
+        self._cached_tools: Optional[Tuple[BaseTool, ...]] = self.tools
+        self._params: Optional[List[Dict[str, Any]]] = None
+        self._tokens_totals: Dict[str, int] = {}
+        if not keep_tool_costs:
+            self._tool_token_costs: Dict[str, Dict[str, int]] = {}
+
+    def _check_cache(self) -> None:
+        # Subclasses (e.g. MCP clients) may replace `tools` wholesale
+        if self.tools is not self._cached_tools:
+            self._invalidate_cache()
 
     async def execute(
         self, *, name: str, tool_input: Dict[str, Any] = None
@@ -51,6 +91,10 @@ class ToolCollection:
     def add_tool(self, tool: BaseTool):
         self.tools += (tool,)
         self.tool_map[tool.name] = tool
+        # Keep per-tool costs of the existing tools, only the new one is counted
+        self._invalidate_cache(keep_tool_costs=True)
+        for tool_costs in self._tool_token_costs.values():
+            tool_costs.pop(tool.name, None)
         return self
 
     def add_tools(self, *tools: BaseTool):
@@ -160,6 +160,7 @@ class WebSearch(BaseTool):
     description: str = """Search the web for real-time information about any topic.
     This tool returns comprehensive search results with relevant information, URLs, titles, and descriptions.
     If the primary search engine fails, it automatically falls back to alternative engines."""
+    concurrency_safe: bool = True
     parameters: dict = {
         "type": "object",
         "properties": {
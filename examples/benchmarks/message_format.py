@@ -0,0 +1,115 @@
+"""
+Benchmark for the cached wire dicts used by ``LLM.format_messages``.
+
+On every agent step the whole conversation is formatted for the request. Without
+the cache each step rebuilds every message dict from the pydantic objects
+(including tool calls and inlined images); with the cache only messages added
+since the previous step are built, older ones reuse their cached dict but are
+still looked up one by one. ``Memory.to_wire``, which ``ToolCallAgent`` passes to
+``ask_tool``, keeps the formatted list itself and only touches the new messages.
+
+Usage:
+    python -m examples.benchmarks.message_format
+"""
+
+import time
+from typing import List
+
+from app.llm import LLM
+from app.memory import Memory
+from app.schema import Function, Message, ToolCall, format_wire_message
+
+
+HISTORY_SIZES = [50, 100, 500]
+STEPS = 20
+IMAGE = "iVBORw0KGgo" * 2000
+
+
+def build_history(size: int) -> List[Message]:
+    """Build a synthetic conversation alternating assistant tool calls and tool results."""
+    messages = [Message.system_message("You are a helpful agent. " * 40)]
+    for i in range(1, size):
+        if i % 2:
+            message = Message.from_tool_calls(
+                [
+                    ToolCall(
+                        id=f"call_{i}",
+                        function=Function(
+                            name="browser_use",
+                            arguments=f'{{"action": "go_to_url", "url": "https://example.com/{i}"}}',
+                        ),
+                    )
+                ],
+                content=f"Step {i}: I will open page {i}.",
+            )
+        else:
+            message = Message.tool_message(
+                content=f"Observed output of cmd `browser_use` executed:\n"
+                + f"page text for {i}. " * 80,
+                name="browser_use",
+                tool_call_id=f"call_{i - 1}",
+                base64_image=IMAGE if i % 10 == 0 else None,
+            )
+        messages.append(message)
+    return messages
+
+
+def format_uncached(messages: List[Message], supports_images: bool) -> List[dict]:
+    """Format the conversation the way it was done before the cache."""
+    formatted = []
+    for message in messages:
+        wire = format_wire_message(message._build_dict(), supports_images)
+        if wire is not None:
+            formatted.append(wire)
+    return formatted
+
+
+def replay(history: List[Message], format_fn) -> float:
+    """Format the growing history once per step, return the mean step time (ms)."""
+    base = len(history) - STEPS
+    durations = []
+    for step in range(base + 1, len(history) + 1):
+        start = time.perf_counter()
+        format_fn(history[:step], True)
+        durations.append((time.perf_counter() - start) * 1000)
+    return sum(durations) / len(durations)
+
+
+def replay_memory(history: List[Message]) -> float:
+    """Like `replay`, formatting through `Memory.to_wire`."""
+    base = len(history) - STEPS
+    memory = Memory(max_messages=len(history) + 1, token_budget=None)
+    memory.messages.extend(history[:base])
+    # Earlier steps already formatted everything but the last STEPS messages
+    memory.to_wire(True)
+    durations = []
+    for message in history[base:]:
+        memory.messages.append(message)
+        start = time.perf_counter()
+        memory.to_wire(True)
+        durations.append((time.perf_counter() - start) * 1000)
+    return sum(durations) / len(durations)
+
+
+def main():
+    print(
+        f"{'messages':>10} {'uncached (ms)':>15} {'cached (ms)':>13} "
+        f"{'memory (ms)':>13} {'speedup':>9}"
+    )
+    for size in HISTORY_SIZES:
+        uncached = replay(build_history(size), format_uncached)
+
+        history = build_history(size)
+        # Earlier steps already formatted everything but the last STEPS messages
+        LLM.format_messages(history[: size - STEPS], True)
+        cached = replay(history, LLM.format_messages)
+        memory = replay_memory(build_history(size))
+
+        print(
+            f"{size:>10} {uncached:>15.3f} {cached:>13.3f} {memory:>13.3f} "
+            f"{uncached / memory:>8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
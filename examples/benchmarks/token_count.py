@@ -0,0 +1,93 @@
+"""
+Benchmark for the running token total used by ``LLM.ask_tool``.
+
+Replays a 100-message agent history the way ``ToolCallAgent`` sends it: on every
+step the conversation so far goes out with the request and its input tokens are
+counted. Recounting the list costs time proportional to the history, even when
+every message hits the per-message cache. ``Memory`` instead counts each message
+once when it is added and keeps a running total. ``ask_tool`` receives that total
+as ``messages_tokens`` and only counts the system prompt, so a step costs the same
+however long the conversation gets.
+
+Usage:
+    python -m examples.benchmarks.token_count
+"""
+
+import asyncio
+import time
+from typing import List
+
+from app.llm import LLM
+from app.memory import Memory
+from app.schema import Function, Message, ToolCall
+
+
+HISTORY_SIZE = 100
+REPORT_EVERY = 20
+SYSTEM_PROMPT = "You are a helpful agent. " * 40
+
+
+def build_history(size: int) -> List[Message]:
+    """Build a synthetic conversation alternating assistant tool calls and tool results."""
+    messages = []
+    for i in range(size):
+        if i % 2 == 0:
+            message = Message.from_tool_calls(
+                [
+                    ToolCall(
+                        id=f"call_{i}",
+                        function=Function(
+                            name="web_search",
+                            arguments=f'{{"query": "topic {i} latest results"}}',
+                        ),
+                    )
+                ],
+                content=f"Step {i}: I will search for more details about topic {i}.",
+            )
+        else:
+            message = Message.tool_message(
+                content=f"Observed output of cmd `web_search` executed:\n"
+                + f"result line for topic {i}. " * 80,
+                name="web_search",
+                tool_call_id=f"call_{i - 1}",
+            )
+        messages.append(message)
+    return messages
+
+
+async def replay(llm: LLM, history: List[Message], running_total: bool) -> List[float]:
+    """Count the input tokens of each step's request, return per-step durations (ms)"""
+    memory = Memory(llm=llm, max_messages=len(history) + 1, token_budget=None)
+    system_msgs = llm.format_messages([Message.system_message(SYSTEM_PROMPT)])
+    durations = []
+    for message in history:
+        await memory.add_message(message)
+        messages = llm.format_messages(memory.messages)
+        start = time.perf_counter()
+        if running_total:
+            llm._count_input_tokens(messages, system_msgs, memory.token_count)
+        else:
+            llm._count_input_tokens(system_msgs + messages, None, None)
+        durations.append((time.perf_counter() - start) * 1000)
+    return durations
+
+
+async def main():
+    llm = LLM()
+    history = build_history(HISTORY_SIZE)
+    # Warm the per-message cache, so recounting is measured at its best
+    llm.count_message_tokens(llm.format_messages(history))
+
+    recount = await replay(llm, history, running_total=False)
+    running = await replay(llm, history, running_total=True)
+
+    print(f"{'messages':>10} {'recount (ms)':>14} {'running total (ms)':>20}")
+    for step in range(REPORT_EVERY, HISTORY_SIZE + 1, REPORT_EVERY):
+        print(f"{step:>10} {recount[step - 1]:>14.3f} {running[step - 1]:>20.3f}")
+    print(
+        f"\nTotal: recount={sum(recount):.1f} ms, running total={sum(running):.1f} ms"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
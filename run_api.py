@@ -13,6 +13,10 @@ from fastapi.responses import JSONResponse
 from pydantic import ValidationError
 
 from app.apis import router
+from app.apis.services.task_manager import task_manager
+from app.http_pool import http_client_pool
+from app.memory_store import get_memory_store
+
 
 app = FastAPI()
 
@@ -27,6 +31,33 @@ app.add_middleware(
 app.include_router(router)
 
 
+@app.on_event("startup")
+async def start_task_lifecycle():
+    """Evict finished tasks periodically"""
+    task_manager.lifecycle.start()
+
+
+@app.on_event("shutdown")
+async def close_http_pool():
+    """Close the HTTP connection pools shared by LLM clients"""
+    await http_client_pool.aclose()
+
+
+@app.on_event("shutdown")
+async def close_memory_store():
+    """Flush pending agent memory writes"""
+    store = get_memory_store()
+    if store is not None:
+        await store.close()
+
+
+@app.on_event("shutdown")
+async def close_task_broker():
+    """Stop evicting tasks and close the task broker connection"""
+    await task_manager.lifecycle.stop()
+    await task_manager.broker.close()
+
+
 def format_validation_error(errors: list[Any]) -> Dict[str, Any]:
     """Format validation error messages"""
     formatted_errors = []
@@ -0,0 +1,8 @@
+import asyncio
+
+from app.apis.services.task_runner import run_worker
+
+
+if __name__ == "__main__":
+    # Runs the tasks submitted to the API when [broker] backend = "redis"
+    asyncio.run(run_worker())
@@ -0,0 +1,254 @@
+import asyncio
+import binascii
+import json
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List
+
+import pytest
+
+from app.bedrock import BedrockClient, BedrockStream
+
+
+def _encode_header(name: str, value: str) -> bytes:
+    name_bytes = name.encode()
+    value_bytes = value.encode()
+    return (
+        struct.pack(">B", len(name_bytes))
+        + name_bytes
+        + struct.pack(">BH", 7, len(value_bytes))
+        + value_bytes
+    )
+
+
+def encode_event(event_type: str, payload: dict) -> bytes:
+    """Encode one message of the AWS event stream binary format."""
+    headers = (
+        _encode_header(":event-type", event_type)
+        + _encode_header(":content-type", "application/json")
+        + _encode_header(":message-type", "event")
+    )
+    body = json.dumps(payload).encode()
+    total_length = 12 + len(headers) + len(body) + 4
+    prelude = struct.pack(">II", total_length, len(headers))
+    prelude += struct.pack(">I", binascii.crc32(prelude))
+    message = prelude + headers + body
+    return message + struct.pack(">I", binascii.crc32(message))
+
+
+STREAM_EVENTS = [
+    ("messageStart", {"role": "assistant"}),
+    ("contentBlockDelta", {"contentBlockIndex": 0, "delta": {"text": "Hello "}}),
+    ("contentBlockDelta", {"contentBlockIndex": 0, "delta": {"text": "world"}}),
+    ("contentBlockStop", {"contentBlockIndex": 0}),
+    (
+        "contentBlockStart",
+        {
+            "contentBlockIndex": 1,
+            "start": {"toolUse": {"toolUseId": "tool_1", "name": "terminate"}},
+        },
+    ),
+    (
+        "contentBlockDelta",
+        {"contentBlockIndex": 1, "delta": {"toolUse": {"input": '{"status": '}}},
+    ),
+    (
+        "contentBlockDelta",
+        {"contentBlockIndex": 1, "delta": {"toolUse": {"input": '"success"}'}}},
+    ),
+    ("contentBlockStop", {"contentBlockIndex": 1}),
+    ("messageStop", {"stopReason": "tool_use"}),
+    (
+        "metadata",
+        {
+            "usage": {"inputTokens": 10, "outputTokens": 5, "totalTokens": 15},
+            "metrics": {"latencyMs": 1},
+        },
+    ),
+]
+
+
+class StubBedrockHandler(BaseHTTPRequestHandler):
+    """Minimal stand-in for the Bedrock runtime converse APIs."""
+
+    protocol_version = "HTTP/1.1"
+    requests: List[Dict] = []
+    delay = 0.0
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.requests.append({"path": self.path, "body": body})
+        time.sleep(self.delay)
+
+        if self.path.endswith("/converse-stream"):
+            payload = b"".join(
+                encode_event(name, event) for name, event in STREAM_EVENTS
+            )
+            content_type = "application/vnd.amazon.eventstream"
+        else:
+            payload = json.dumps(
+                {
+                    "output": {
+                        "message": {
+                            "role": "assistant",
+                            "content": [{"text": "Hello from Bedrock"}],
+                        }
+                    },
+                    "stopReason": "end_turn",
+                    "usage": {"inputTokens": 10, "outputTokens": 4, "totalTokens": 14},
+                    "metrics": {"latencyMs": 1},
+                }
+            ).encode()
+            content_type = "application/json"
+
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def bedrock_server(monkeypatch) -> Iterator[str]:
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "test")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "test")
+    StubBedrockHandler.requests = []
+    StubBedrockHandler.delay = 0.0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubBedrockHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def bedrock_client(bedrock_server: str) -> Iterator[BedrockClient]:
+    client = BedrockClient(
+        endpoint_url=bedrock_server, region_name="us-west-2", max_workers=4
+    )
+    try:
+        yield client
+    finally:
+        client.close()
+
+
+MESSAGES = [
+    {"role": "system", "content": "You are a test assistant."},
+    {"role": "user", "content": "Say hello"},
+]
+
+
+@pytest.mark.asyncio
+async def test_non_streaming_completion(bedrock_client: BedrockClient):
+    """Tests a non-streaming request returns an OpenAI-shaped response."""
+    response = await bedrock_client.chat.completions.create(
+        model="test-model",
+        messages=MESSAGES,
+        max_tokens=100,
+        temperature=0.0,
+        stream=False,
+    )
+
+    assert response.choices[0].message.content == "Hello from Bedrock"
+    assert response.choices[0].message.tool_calls is None
+    assert response.usage.prompt_tokens == 10
+    assert response.usage.completion_tokens == 4
+
+    request = StubBedrockHandler.requests[0]
+    assert request["path"] == "/model/test-model/converse"
+    assert request["body"]["system"] == [{"text": "You are a test assistant."}]
+    assert "toolConfig" not in request["body"]
+
+
+@pytest.mark.asyncio
+async def test_streaming_completion_yields_openai_chunks(
+    bedrock_client: BedrockClient,
+):
+    """Tests streaming returns an async iterator of OpenAI-style chunks."""
+    stream = await bedrock_client.chat.completions.create(
+        model="test-model",
+        messages=MESSAGES,
+        max_tokens=100,
+        temperature=0.0,
+        stream=True,
+        tools=[
+            {
+                "type": "function",
+                "function": {
+                    "name": "terminate",
+                    "description": "Finish the task",
+                    "parameters": {"properties": {}},
+                },
+            }
+        ],
+    )
+    assert isinstance(stream, BedrockStream)
+
+    content = ""
+    tool_calls: Dict[int, Dict[str, str]] = {}
+    finish_reason = None
+    usage = None
+    async for chunk in stream:
+        delta = chunk.choices[0].delta
+        if delta.content:
+            content += delta.content
+        for call in delta.tool_calls or []:
+            entry = tool_calls.setdefault(call.index, {"id": "", "arguments": ""})
+            if call.id:
+                entry["id"] = call.id
+                entry["name"] = call.function.name
+            entry["arguments"] += call.function.arguments
+        finish_reason = chunk.choices[0].finish_reason or finish_reason
+        usage = chunk.usage or usage
+
+    assert content == "Hello world"
+    assert tool_calls == {
+        0: {"id": "tool_1", "name": "terminate", "arguments": '{"status": "success"}'}
+    }
+    assert finish_reason == "tool_use"
+    assert usage.completion_tokens == 5
+    assert StubBedrockHandler.requests[0]["path"] == "/model/test-model/converse-stream"
+
+
+@pytest.mark.asyncio
+async def test_requests_do_not_block_event_loop(bedrock_client: BedrockClient):
+    """Tests concurrent requests run in the worker pool without blocking the loop."""
+    StubBedrockHandler.delay = 0.3
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    ticker_task = asyncio.create_task(ticker())
+    start = time.monotonic()
+    responses = await asyncio.gather(
+        *[
+            bedrock_client.chat.completions.create(
+                model="test-model",
+                messages=MESSAGES,
+                max_tokens=100,
+                temperature=0.0,
+                stream=False,
+            )
+            for _ in range(4)
+        ]
+    )
+    elapsed = time.monotonic() - start
+    ticker_task.cancel()
+
+    assert all(r.choices[0].message.content == "Hello from Bedrock" for r in responses)
+    # The four requests overlap in the pool instead of running back to back
+    assert elapsed < 1.0
+    # The event loop kept running while the requests were in flight
+    assert ticks >= 10
@@ -0,0 +1,266 @@
+import asyncio
+from typing import Dict, List, Optional, Tuple
+
+import pytest
+import pytest_asyncio
+
+from app.agent.base import BaseAgentEvents
+from app.apis.services.broker import InProcessBroker, RedisBroker, TaskJob
+from app.config import BrokerSettings
+
+
+class SimpleString(str):
+    pass
+
+
+def encode(value) -> bytes:
+    """Encode a reply in the Redis serialization protocol (RESP2)."""
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, SimpleString):
+        return f"+{value}\r\n".encode()
+    if isinstance(value, int):
+        return f":{value}\r\n".encode()
+    if isinstance(value, str):
+        data = value.encode()
+        return b"$%d\r\n%s\r\n" % (len(data), data)
+    return b"*%d\r\n" % len(value) + b"".join(encode(item) for item in value)
+
+
+def stream_id(value: str) -> Tuple[int, int]:
+    ms, _, seq = value.partition("-")
+    return int(ms), int(seq or 0)
+
+
+class FakeRedis:
+    """Minimal in-memory Redis server, enough for the commands the broker uses."""
+
+    def __init__(self):
+        self.lists: Dict[str, List[str]] = {}
+        self.streams: Dict[str, List[Tuple[str, List[str]]]] = {}
+        self.hashes: Dict[str, Dict[str, str]] = {}
+        self.server: Optional[asyncio.AbstractServer] = None
+        self._next_id = 0
+
+    async def start(self) -> str:
+        self.server = await asyncio.start_server(self._serve, "127.0.0.1", 0)
+        port = self.server.sockets[0].getsockname()[1]
+        return f"redis://127.0.0.1:{port}/0"
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _serve(self, reader: asyncio.StreamReader, writer):
+        try:
+            while True:
+                header = await reader.readline()
+                if not header:
+                    break
+                args = []
+                for _ in range(int(header[1:])):
+                    length = int((await reader.readline())[1:])
+                    args.append((await reader.readexactly(length + 2))[:-2].decode())
+                writer.write(await self._execute(args[0].upper(), args[1:]))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _wait_for(self, condition, timeout: float) -> bool:
+        deadline = asyncio.get_running_loop().time() + timeout
+        while not condition():
+            if asyncio.get_running_loop().time() >= deadline:
+                return False
+            await asyncio.sleep(0.01)
+        return True
+
+    async def _execute(self, command: str, args: List[str]) -> bytes:
+        if command == "PING":
+            return encode(SimpleString("PONG"))
+        if command in ("CLIENT", "SELECT"):
+            return encode(SimpleString("OK"))
+        if command == "LPUSH":
+            items = self.lists.setdefault(args[0], [])
+            for value in args[1:]:
+                items.insert(0, value)
+            return encode(len(items))
+        if command == "LREM":
+            items = self.lists.get(args[0], [])
+            count, value = int(args[1]), args[2]
+            removed = 0
+            while value in items and removed < count:
+                items.remove(value)
+                removed += 1
+            return encode(removed)
+        if command == "LLEN":
+            return encode(len(self.lists.get(args[0], [])))
+        if command == "BRPOP":
+            *keys, timeout = args
+            if not await self._wait_for(
+                lambda: any(self.lists.get(key) for key in keys), float(timeout)
+            ):
+                return b"*-1\r\n"
+            key = next(key for key in keys if self.lists.get(key))
+            return encode([key, self.lists[key].pop()])
+        if command == "XADD":
+            key = args[0]
+            fields = args[args.index("*") + 1 :]
+            self._next_id += 1
+            event_id = f"{self._next_id}-0"
+            self.streams.setdefault(key, []).append((event_id, fields))
+            return encode(event_id)
+        if command == "XREAD":
+            options = {
+                args[i].upper(): args[i + 1] for i in range(0, args.index("STREAMS"), 2)
+            }
+            key, after = args[-2:]
+            count = int(options.get("COUNT", 0)) or None
+
+            def pending():
+                return [
+                    entry
+                    for entry in self.streams.get(key, [])
+                    if stream_id(entry[0]) > stream_id(after)
+                ][:count]
+
+            if "BLOCK" in options:
+                await self._wait_for(pending, int(options["BLOCK"]) / 1000)
+            entries = pending()
+            if not entries:
+                return b"*-1\r\n"
+            return encode([[key, [[event_id, fields] for event_id, fields in entries]]])
+        if command == "HSET":
+            values = self.hashes.setdefault(args[0], {})
+            added = sum(field not in values for field in args[1::2])
+            values.update(zip(args[1::2], args[2::2]))
+            return encode(added)
+        if command == "HGETALL":
+            values = self.hashes.get(args[0], {})
+            return encode([item for pair in values.items() for item in pair])
+        if command == "HDEL":
+            values = self.hashes.get(args[0], {})
+            return encode(
+                sum(values.pop(field, None) is not None for field in args[1:])
+            )
+        if command == "DEL":
+            removed = 0
+            for key in args:
+                for store in (self.lists, self.streams, self.hashes):
+                    removed += store.pop(key, None) is not None
+            return encode(removed)
+        return f"-ERR unknown command '{command}'\r\n".encode()
+
+
+@pytest_asyncio.fixture
+async def redis_broker():
+    server = FakeRedis()
+    url = await server.start()
+    broker = RedisBroker(BrokerSettings(backend="redis", url=url, prefix="test"))
+    yield broker
+    await broker.close()
+    await server.stop()
+
+
+def progress(event_name: str, **content) -> dict:
+    return {"type": "progress", "event_name": event_name, "step": 1, "content": content}
+
+
+async def check_event_stream(broker):
+    task_id = "org/task"
+    await broker.open_stream(task_id)
+    await broker.set_state(task_id, status="queued")
+
+    first = await broker.publish(task_id, progress("agent:lifecycle:start"))
+    await broker.publish(task_id, progress("agent:llm:stream", delta="Hel"))
+    await broker.publish(task_id, progress("agent:llm:stream", delta="lo"))
+
+    entries = await broker.read_events(task_id, None, timeout=0.1)
+    assert [event["event_name"] for _, event in entries] == [
+        "agent:lifecycle:start",
+        "agent:llm:stream",
+        "agent:llm:stream",
+    ]
+    # A reconnecting client resumes after the last id it received
+    resumed = await broker.read_events(task_id, first, timeout=0.1)
+    assert [event["content"]["delta"] for _, event in resumed] == ["Hel", "lo"]
+    cursor = entries[-1][0]
+    assert await broker.read_events(task_id, cursor, timeout=0.1) == []
+
+    await broker.publish(task_id, progress(BaseAgentEvents.LIFECYCLE_COMPLETE))
+    entries = await broker.read_events(task_id, cursor, timeout=0.1)
+    assert entries[-1][1]["event_name"] == BaseAgentEvents.LIFECYCLE_COMPLETE
+    assert await broker.read_events(task_id, entries[-1][0], timeout=0.1) is None
+
+    # A restart continues the same stream
+    await broker.open_stream(task_id)
+    assert await broker.read_events(task_id, entries[-1][0], timeout=0.1) == []
+
+
+async def check_termination(broker):
+    job = TaskJob(task_id="org/task", prompt="hello")
+    await broker.set_state(job.task_id, status="queued", run_id=job.run_id)
+    assert not await broker.termination_requested(job)
+
+    await broker.request_termination(job.task_id)
+    assert await broker.termination_requested(job)
+    # A restart submits a new run, which the earlier request does not stop
+    restarted = TaskJob(task_id=job.task_id, prompt="hello", restart=True)
+    assert not await broker.termination_requested(restarted)
+
+
+@pytest.mark.asyncio
+async def test_redis_broker_jobs(redis_broker):
+    await redis_broker.submit(TaskJob(task_id="org/first", prompt="one", priority=1))
+    await redis_broker.submit(TaskJob(task_id="org/second", prompt="two"))
+    assert await redis_broker.queued_jobs() == 2
+
+    job = await redis_broker.next_job(timeout=1)
+    assert (job.task_id, job.prompt, job.priority) == ("org/first", "one", 1)
+    assert (await redis_broker.next_job(timeout=1)).task_id == "org/second"
+    assert await redis_broker.next_job(timeout=1) is None
+
+
+@pytest.mark.asyncio
+async def test_redis_broker_rejects_jobs_beyond_max_queued(redis_broker):
+    assert await redis_broker.submit(TaskJob(task_id="org/first", prompt="one"), 1)
+    assert not await redis_broker.submit(TaskJob(task_id="org/second", prompt="two"), 1)
+    assert await redis_broker.queued_jobs() == 1
+    assert (await redis_broker.next_job(timeout=1)).task_id == "org/first"
+
+
+@pytest.mark.asyncio
+async def test_redis_broker_event_stream(redis_broker):
+    await check_event_stream(redis_broker)
+    await redis_broker.delete("org/task")
+    assert await redis_broker.get_state("org/task") is None
+
+
+@pytest.mark.asyncio
+async def test_redis_broker_get_states(redis_broker):
+    await redis_broker.set_state("org/first", status="running")
+    await redis_broker.set_state("org/third", status="queued")
+    assert await redis_broker.get_states(["org/first", "org/second", "org/third"]) == [
+        {"status": "running"},
+        None,
+        {"status": "queued"},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_redis_broker_termination(redis_broker):
+    await check_termination(redis_broker)
+
+
+@pytest.mark.asyncio
+async def test_in_process_broker():
+    broker = InProcessBroker()
+    await check_event_stream(broker)
+    await check_termination(broker)
+
+    await broker.submit(TaskJob(task_id="org/task", prompt="hello"))
+    assert await broker.queued_jobs() == 1
+    assert not await broker.submit(TaskJob(task_id="org/other", prompt="hi"), 1)
+    assert (await broker.next_job(timeout=0.1)).prompt == "hello"
+    assert await broker.next_job(timeout=0.1) is None
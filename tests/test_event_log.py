@@ -0,0 +1,181 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+from app.agent.base import BaseAgentEvents
+from app.apis.services.event_log import EventLog
+from app.apis.services.event_stream import coalesce_events, format_sse_frame
+
+
+def progress(event_name: str, step: int = 1, **content) -> dict:
+    return {
+        "type": "progress",
+        "event_name": event_name,
+        "step": step,
+        "content": content,
+    }
+
+
+def delta(text: str, step: int = 1) -> dict:
+    return progress("agent:llm:stream", step=step, delta=text)
+
+
+def ids(entries) -> list:
+    return [event_id for event_id, _ in entries]
+
+
+@pytest.mark.asyncio
+async def test_read_resumes_after_the_last_event_id():
+    log = EventLog("task")
+    for i in range(5):
+        log.append(delta(str(i)))
+
+    assert ids(await log.read(0, timeout=0)) == [1, 2, 3, 4, 5]
+    assert ids(await log.read(2, timeout=0)) == [3, 4, 5]
+    assert ids(await log.read(2, timeout=0, max_size=2)) == [3, 4]
+    assert await log.read(5, timeout=0.01) == []
+
+
+@pytest.mark.asyncio
+async def test_read_resumes_from_the_spill_file(tmp_path):
+    log = EventLog("org/task", capacity=3, spill_dir=str(tmp_path))
+    for i in range(10):
+        log.append(delta(str(i)))
+    assert log.first_id == 8
+
+    # Older events come from the spill file, one page at a time
+    page = await log.read(2, timeout=0, max_size=3)
+    assert ids(page) == [3, 4, 5]
+    assert [event["content"]["delta"] for _, event in page] == ["2", "3", "4"]
+    assert ids(await log.read(5, timeout=0, max_size=10)) == [6, 7]
+    # Past the spilled events the memory buffer takes over
+    assert ids(await log.read(7, timeout=0)) == [8, 9, 10]
+
+    assert log.spill_path.parent == tmp_path
+    lines = log.spill_path.read_text().splitlines()
+    assert [int(line.split("\t")[0]) for line in lines] == list(range(1, 8))
+
+    await log.close()
+    assert not log.spill_path.exists()
+
+
+@pytest.mark.asyncio
+async def test_spilled_events_are_written_off_the_event_loop(tmp_path, monkeypatch):
+    log = EventLog("task", capacity=1, spill_dir=str(tmp_path))
+    threads = []
+
+    def write(lines):
+        threads.append(threading.current_thread())
+        return EventLog._write_spill_file(log, lines)
+
+    monkeypatch.setattr(log, "_write_spill_file", write)
+    for i in range(4):
+        log.append(delta(str(i)))
+    # Appending only queues the lines
+    assert not log.spill_path.exists()
+
+    assert ids(await log.read(0, timeout=0)) == [1, 2, 3]
+    assert threads and threading.main_thread() not in threads
+    await log.close()
+
+
+@pytest.mark.asyncio
+async def test_missing_events_without_a_spill_dir():
+    log = EventLog("task", capacity=2)
+    for i in range(5):
+        log.append(delta(str(i)))
+    # Events dropped from memory are skipped, the reader continues after them
+    assert ids(await log.read(1, timeout=0)) == [4, 5]
+
+
+@pytest.mark.asyncio
+async def test_read_waits_for_new_events_and_batches_them():
+    log = EventLog("task")
+    reader = asyncio.create_task(log.read(0, timeout=1, window=0.05))
+    await asyncio.sleep(0)
+    log.append(delta("a"))
+    await asyncio.sleep(0.01)
+    assert not reader.done()  # Waiting for more within the window
+    log.append(delta("b"))
+
+    assert ids(await reader) == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_lifecycle_event_or_full_batch_ends_the_window():
+    log = EventLog("task")
+    reader = asyncio.create_task(log.read(0, timeout=1, window=10))
+    await asyncio.sleep(0)
+    log.append(delta("a"))
+    log.append(progress(BaseAgentEvents.LIFECYCLE_PLAN_START))
+    assert ids(await asyncio.wait_for(reader, 1)) == [1, 2]
+
+    reader = asyncio.create_task(log.read(2, timeout=1, window=10, max_size=2))
+    await asyncio.sleep(0)
+    log.append(delta("b"))
+    log.append(delta("c"))
+    log.append(delta("d"))
+    assert ids(await asyncio.wait_for(reader, 1)) == [3, 4]
+
+
+@pytest.mark.asyncio
+async def test_closed_log_ends_reads_right_away():
+    log = EventLog("task")
+    log.append(delta("a"))
+    reader = asyncio.create_task(log.read(1, timeout=10))
+    await asyncio.sleep(0)
+    log.append(progress(BaseAgentEvents.LIFECYCLE_COMPLETE))
+    assert ids(await asyncio.wait_for(reader, 1)) == [2]
+    assert log.closed
+
+    # Read up to its end, a completed log does not wait for the timeout
+    assert await asyncio.wait_for(log.read(2, timeout=10), 1) == []
+
+    # A restarted run continues the ids and waits again
+    log.reopen()
+    assert await log.read(2, timeout=0.01) == []
+    assert log.append(delta("b")) == 3
+
+
+@pytest.mark.asyncio
+async def test_close_wakes_waiting_readers():
+    log = EventLog("task")
+    reader = asyncio.create_task(log.read(0, timeout=10))
+    await asyncio.sleep(0)
+    await log.close()
+    assert await asyncio.wait_for(reader, 1) == []
+
+
+def test_consecutive_deltas_are_coalesced():
+    events = [
+        delta("Hel"),
+        delta("lo"),
+        progress("agent:tool:start", name="bash"),
+        delta("a", step=1),
+        delta("b", step=2),
+        progress(BaseAgentEvents.LIFECYCLE_COMPLETE),
+    ]
+    merged = coalesce_events(events)
+
+    assert [(event["event_name"], event["content"]) for event in merged] == [
+        ("agent:llm:stream", {"delta": "Hello"}),
+        ("agent:tool:start", {"name": "bash"}),
+        ("agent:llm:stream", {"delta": "a"}),
+        ("agent:llm:stream", {"delta": "b"}),
+        (BaseAgentEvents.LIFECYCLE_COMPLETE, {}),
+    ]
+    # The input events are not changed
+    assert events[0]["content"] == {"delta": "Hel"}
+
+
+def test_sse_frame_carries_one_data_line_per_event():
+    frame = format_sse_frame([delta("a"), delta("b")], event_id="7")
+    lines = frame.split("\n")
+    assert lines[0] == "id: 7"
+    assert [json.loads(line[len("data: ") :]) for line in lines[1:3]] == [
+        delta("a"),
+        delta("b"),
+    ]
+    assert frame.endswith("\n\n")
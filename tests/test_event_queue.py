@@ -0,0 +1,76 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from app.agent.base import BaseAgentEvents, EventItem, EventQueue
+
+
+def delta(text: str, step: int = 1) -> EventItem:
+    return EventItem(
+        name=BaseAgentEvents.LLM_STREAM,
+        kwargs={"delta": text},
+        step=step,
+        timestamp=datetime.now(),
+    )
+
+
+async def slow_handler_queue(max_size: int):
+    """An event queue whose only handler blocks until `release` is set"""
+    queue = EventQueue(max_size=max_size)
+    release = asyncio.Event()
+    received = []
+
+    async def handler(event_name: str, step: int, **kwargs):
+        await release.wait()
+        received.append(kwargs.get("delta"))
+
+    queue.add_handler(".*", handler)
+    queue.start()
+    return queue, release, received
+
+
+@pytest.mark.asyncio
+async def test_slow_handler_backlog_coalesces_stream_deltas():
+    queue, release, received = await slow_handler_queue(max_size=4)
+    pattern = queue._handlers[0]
+
+    # Let the dispatch loop hand every delta to the handler before the next
+    # one is put, so they pile up in the handler backlog rather than the queue
+    chunks = [f"{i} " for i in range(200)]
+    for chunk in chunks:
+        queue.put(delta(chunk), EventQueue.COALESCE)
+        await asyncio.sleep(0)
+        assert len(pattern.pending) <= 1
+
+    release.set()
+    for _ in range(10):
+        await asyncio.sleep(0)
+    queue.stop()
+
+    assert queue.dropped == 0
+    assert len(received) <= 2
+    assert "".join(received) == "".join(chunks)
+
+
+@pytest.mark.asyncio
+async def test_slow_handler_backlog_is_bounded():
+    queue, release, received = await slow_handler_queue(max_size=4)
+    pattern = queue._handlers[0]
+
+    for i in range(20):
+        queue.put(delta(str(i), step=i), EventQueue.DROP)
+        await asyncio.sleep(0)
+        assert len(pattern.pending) <= queue.max_size
+
+    # Events without a policy are never dropped
+    queue.put(delta("final", step=20))
+    await asyncio.sleep(0)
+
+    release.set()
+    for _ in range(10):
+        await asyncio.sleep(0)
+    queue.stop()
+
+    assert queue.dropped == 20 - 1 - queue.max_size
+    assert received == ["0", "1", "2", "3", "4", "final"]
@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+import pytest_asyncio
+
+from app.config import LLMSettings
+from app.http_pool import HttpClientPool
+from app.llm import LLM
+
+
+async def serve(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """Answer every request on the connection, with 500 for paths under /error"""
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            while (await reader.readline()) not in (b"\r\n", b""):
+                pass
+            status = "500 Error" if b" /error" in request_line else "200 OK"
+            writer.write(f"HTTP/1.1 {status}\r\nContent-Length: 2\r\n\r\nok".encode())
+            await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+@pytest_asyncio.fixture
+async def server_url():
+    server = await asyncio.start_server(serve, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    yield f"http://127.0.0.1:{port}"
+    server.close()
+    await server.wait_closed()
+
+
+def test_clients_are_shared_per_normalized_base_url():
+    pool = HttpClientPool()
+    client = pool.get_client("https://api.example.com/v1/")
+    assert pool.get_client("https://api.example.com/v1") is client
+    assert pool.get_client("https://other.example.com/v1") is not client
+    assert set(pool.stats()) == {
+        "https://api.example.com/v1",
+        "https://other.example.com/v1",
+    }
+
+
+def test_llm_instances_on_one_base_url_share_a_client():
+    def settings(api_key: str, base_url: str) -> LLMSettings:
+        return LLMSettings(
+            model="gpt-4o",
+            base_url=base_url,
+            api_key=api_key,
+            api_type="openai",
+            api_version="",
+        )
+
+    first = LLM("test-pool-first", settings("key-1", "https://pool.example.com/v1"))
+    second = LLM("test-pool-second", settings("key-2", "https://pool.example.com/v1/"))
+    try:
+        assert first.client is not second.client
+        assert first.client._client is second.client._client
+    finally:
+        LLM.release("test-pool-first")
+        LLM.release("test-pool-second")
+
+
+@pytest.mark.asyncio
+async def test_counting_transport_records_requests_and_errors(server_url):
+    pool = HttpClientPool()
+    client = pool.get_client(server_url)
+    assert (await client.get(f"{server_url}/ok")).status_code == 200
+    assert (await client.get(f"{server_url}/error")).status_code == 500
+
+    stats = pool.stats()[server_url]
+    assert stats["requests_total"] == 2
+    assert stats["errors_total"] == 1
+    assert stats["requests_in_flight"] == 0
+    # Both requests went over one kept-alive connection
+    assert stats["connections"] == 1 and stats["idle_connections"] == 1
+
+    await pool.aclose()
+    assert client.is_closed
+    # A client asked for after closing is a new one, the counters carry on
+    reopened = pool.get_client(server_url)
+    assert reopened is not client and not reopened.is_closed
+    await reopened.get(f"{server_url}/ok")
+    assert pool.stats()[server_url]["requests_total"] == 3
+    await pool.aclose()
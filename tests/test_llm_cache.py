@@ -0,0 +1,95 @@
+import pytest
+
+from app import llm_cache as llm_cache_module
+from app.config import LLMCacheSettings
+from app.llm_cache import LLMResponseCache
+
+
+class FakeClock:
+    """Stands in for the `time` module of the cache"""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> FakeClock:
+    clock = FakeClock()
+    monkeypatch.setattr(llm_cache_module, "time", clock)
+    return clock
+
+
+MESSAGES = [{"role": "user", "content": "Hello"}]
+TOOLS = [{"type": "function", "function": {"name": "terminate", "parameters": {}}}]
+
+
+def test_key_is_stable_and_covers_every_request_field():
+    key = LLMResponseCache.make_key("gpt-4o", MESSAGES, TOOLS, "auto", 0)
+    # Dict key order does not matter
+    reordered = [{"content": "Hello", "role": "user"}]
+    assert LLMResponseCache.make_key("gpt-4o", reordered, TOOLS, "auto", 0) == key
+    assert (
+        len(
+            {
+                key,
+                LLMResponseCache.make_key("gpt-4o-mini", MESSAGES, TOOLS, "auto", 0),
+                LLMResponseCache.make_key(
+                    "gpt-4o", MESSAGES + MESSAGES, TOOLS, "auto", 0
+                ),
+                LLMResponseCache.make_key("gpt-4o", MESSAGES, None, "auto", 0),
+                LLMResponseCache.make_key("gpt-4o", MESSAGES, TOOLS, "required", 0),
+                LLMResponseCache.make_key("gpt-4o", MESSAGES, TOOLS, "auto", 0.5),
+            }
+        )
+        == 6
+    )
+
+
+def test_only_deterministic_requests_are_cached_unless_forced():
+    cache = LLMResponseCache(LLMCacheSettings(enabled=True))
+    assert cache.should_cache(0) and cache.should_cache(None)
+    assert not cache.should_cache(0.7)
+    assert cache.should_cache(0.7, force=True)
+    assert LLMResponseCache(LLMCacheSettings(enabled=True, force=True)).should_cache(
+        0.7
+    )
+    assert not LLMResponseCache(LLMCacheSettings(enabled=False)).should_cache(0)
+
+
+@pytest.mark.asyncio
+async def test_memory_tier_evicts_least_recently_used(clock):
+    cache = LLMResponseCache(LLMCacheSettings(enabled=True, max_entries=2))
+    await cache.set("a", "response a")
+    await cache.set("b", "response b")
+    assert await cache.get("a") == "response a"  # "b" is now the oldest
+    await cache.set("c", "response c")
+
+    assert await cache.get("b") is None
+    assert await cache.get("a") == "response a"
+    assert await cache.get("c") == "response c"
+    assert cache.stats()["memory_entries"] == 2
+
+
+@pytest.mark.asyncio
+async def test_disk_tier_survives_restarts_until_the_ttl(clock, tmp_path):
+    settings = LLMCacheSettings(
+        enabled=True, disk_path=str(tmp_path / "cache.db"), ttl=60
+    )
+    cache = LLMResponseCache(settings)
+    await cache.set("key", {"content": "hi"}, input_tokens=10, completion_tokens=2)
+
+    restarted = LLMResponseCache(settings)
+    clock.now += 59
+    assert await restarted.get("key") == {"content": "hi"}
+    assert restarted.disk_hits == 1 and restarted.saved_input_tokens == 10
+
+    # Expired entries are dropped from both tiers
+    clock.now += 2
+    assert await restarted.get("key") is None
+    assert await LLMResponseCache(settings).get("key") is None
+    assert restarted._connect().execute(
+        "SELECT COUNT(*) FROM llm_cache"
+    ).fetchone() == (0,)
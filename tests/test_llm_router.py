@@ -0,0 +1,171 @@
+import asyncio
+from types import SimpleNamespace
+from typing import Optional
+
+import pytest
+
+from app.llm_router import Endpoint, LLMRouter
+
+
+class FakeResponse:
+    def __init__(self, name: str):
+        self.name = name
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeEndpoint(Endpoint):
+    """Endpoint whose client answers once `release` is set, or fails with `error`."""
+
+    def __init__(self, name: str, error: Optional[Exception] = None):
+        self.release = asyncio.Event()
+        self.error = error
+        self.requests = []
+        self.cancelled = False
+        self.response = FakeResponse(name)
+        completions = SimpleNamespace(create=self.create)
+        client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+        super().__init__(name, "gpt-4o", client)
+
+    async def create(self, **params):
+        self.requests.append(params)
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.error is not None:
+            raise self.error
+        return self.response
+
+
+async def until(predicate):
+    while not predicate():
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_fast_primary_is_not_hedged():
+    primary, hedge = FakeEndpoint("primary"), FakeEndpoint("hedge")
+    router = LLMRouter([primary, hedge], hedge_delay=10)
+    primary.release.set()
+
+    response, stack = await router._race(10, {"messages": []})
+    await stack.aclose()
+
+    assert response is primary.response
+    assert primary.requests == [{"messages": [], "model": "gpt-4o"}]
+    assert hedge.requests == [] and router.hedged_total == 0
+    assert primary.stats.requests_total == 1 and len(primary.stats.latencies) == 1
+
+
+@pytest.mark.asyncio
+async def test_fast_hedge_wins_over_slow_primary():
+    primary, hedge = FakeEndpoint("primary"), FakeEndpoint("hedge")
+    router = LLMRouter([primary, hedge], hedge_delay=0.01)
+    hedge.release.set()
+
+    response, stack = await router._race(10, {})
+    await stack.aclose()
+
+    assert response is hedge.response
+    assert router.hedged_total == 1
+    assert hedge.stats.hedges_won == 1 and hedge.stats.requests_total == 1
+    # The losing primary is cancelled; its wait so far still counts as a latency
+    assert primary.cancelled
+    assert primary.stats.cancelled_total == 1
+    assert primary.stats.requests_total == 0 and primary.stats.errors_total == 0
+    assert primary.stats.latencies[0] >= 0.01
+    assert primary.stats.in_flight == hedge.stats.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_hedge_answers_when_primary_fails():
+    primary = FakeEndpoint("primary", error=RuntimeError("primary down"))
+    hedge = FakeEndpoint("hedge")
+    router = LLMRouter([primary, hedge], hedge_delay=0.01)
+    race = asyncio.create_task(router._race(10, {}))
+
+    await until(lambda: len(hedge.requests) == 1)
+    primary.release.set()
+    await until(lambda: primary.stats.errors_total == 1)
+    assert not race.done()
+    hedge.release.set()
+
+    response, stack = await race
+    await stack.aclose()
+    assert response is hedge.response
+    assert hedge.stats.hedges_won == 1
+
+
+@pytest.mark.asyncio
+async def test_error_is_raised_when_every_endpoint_fails():
+    primary = FakeEndpoint("primary", error=RuntimeError("primary down"))
+    hedge = FakeEndpoint("hedge", error=RuntimeError("hedge down"))
+    router = LLMRouter([primary, hedge], hedge_delay=0.01)
+    race = asyncio.create_task(router._race(10, {}))
+
+    await until(lambda: len(hedge.requests) == 1)
+    primary.release.set()
+    await until(lambda: primary.stats.errors_total == 1)
+    hedge.release.set()
+
+    with pytest.raises(RuntimeError, match="(primary|hedge) down"):
+        await race
+    for endpoint in (primary, hedge):
+        assert endpoint.stats.requests_total == endpoint.stats.errors_total == 1
+        assert endpoint.stats.error_rate == 1.0
+        assert endpoint.stats.in_flight == 0
+    assert hedge.stats.hedges_won == 0
+
+
+@pytest.mark.asyncio
+async def test_loser_answering_in_the_same_round_is_closed():
+    primary, hedge = FakeEndpoint("primary"), FakeEndpoint("hedge")
+    # Both endpoints wait on one event, so both answer before the race looks
+    hedge.release = primary.release
+    router = LLMRouter([primary, hedge], hedge_delay=0.01)
+    race = asyncio.create_task(router._race(10, {}))
+
+    await until(lambda: len(hedge.requests) == 1)
+    primary.release.set()
+    response, stack = await race
+    await stack.aclose()
+
+    loser = hedge if response is primary.response else primary
+    assert not response.closed
+    assert loser.response.closed
+    assert primary.stats.requests_total == hedge.stats.requests_total == 1
+
+
+@pytest.mark.asyncio
+async def test_cancelled_race_discards_every_attempt():
+    primary, hedge = FakeEndpoint("primary"), FakeEndpoint("hedge")
+    router = LLMRouter([primary, hedge], hedge_delay=0.01)
+    race = asyncio.create_task(router._race(10, {}))
+
+    await until(lambda: len(hedge.requests) == 1)
+    race.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await race
+
+    assert primary.cancelled and hedge.cancelled
+    assert primary.stats.cancelled_total == hedge.stats.cancelled_total == 1
+    assert primary.stats.in_flight == hedge.stats.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_ranking_prefers_the_faster_endpoint():
+    slow, fast = FakeEndpoint("slow"), FakeEndpoint("fast")
+    router = LLMRouter([slow, fast])
+    for _ in range(3):
+        slow.stats.record_success(2.0)
+        fast.stats.record_success(0.5)
+    assert router.ranked() == [fast, slow]
+
+    # Errors inflate the score of an otherwise faster endpoint
+    for _ in range(3):
+        fast.stats.record_error()
+    assert router.ranked() == [slow, fast]
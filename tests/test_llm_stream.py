@@ -0,0 +1,161 @@
+from contextlib import asynccontextmanager
+from typing import List, Optional
+
+import pytest
+from openai.types.chat.chat_completion_chunk import (
+    ChatCompletionChunk,
+    Choice,
+    ChoiceDelta,
+    ChoiceDeltaToolCall,
+    ChoiceDeltaToolCallFunction,
+)
+
+from app.config import LLMSettings
+from app.llm import LLM
+from app.llm_stream import print_stream_sink
+from app.schema import Message
+
+
+def chunk(
+    content: Optional[str] = None,
+    index: Optional[int] = None,
+    call_id: Optional[str] = None,
+    name: Optional[str] = None,
+    arguments: Optional[str] = None,
+) -> ChatCompletionChunk:
+    tool_calls = None
+    if index is not None:
+        tool_calls = [
+            ChoiceDeltaToolCall(
+                index=index,
+                id=call_id,
+                type="function" if call_id else None,
+                function=ChoiceDeltaToolCallFunction(name=name, arguments=arguments),
+            )
+        ]
+    return ChatCompletionChunk(
+        id="chunk",
+        object="chat.completion.chunk",
+        created=0,
+        model="gpt-4o",
+        choices=[
+            Choice(
+                index=0,
+                delta=ChoiceDelta(content=content, tool_calls=tool_calls),
+                finish_reason=None,
+            )
+        ],
+    )
+
+
+def streaming_llm(chunks: List[ChatCompletionChunk]) -> LLM:
+    llm = LLM(
+        "test-stream-tool-calls",
+        LLMSettings(
+            model="gpt-4o",
+            base_url="https://stream.example.com/v1",
+            api_key="key",
+            api_type="openai",
+            api_version="",
+        ),
+    )
+
+    @asynccontextmanager
+    async def completion(input_tokens: int, **params):
+        assert params["stream"] is True
+
+        async def response():
+            for item in chunks:
+                yield item
+
+        yield response()
+
+    llm._completion = completion
+    return llm
+
+
+@pytest.mark.asyncio
+async def test_tool_calls_are_assembled_from_split_deltas():
+    llm = streaming_llm(
+        [
+            chunk(content="Let me "),
+            chunk(content="look."),
+            chunk(index=0, call_id="call_a", name="web_", arguments=""),
+            chunk(index=0, name="search", arguments='{"que'),
+            chunk(index=0, arguments='ry": "openmanus"}'),
+            chunk(index=1, call_id="call_b", name="bash", arguments='{"comm'),
+            chunk(index=1, arguments='and": "ls"}'),
+            chunk(index=2, call_id="call_c", name="terminate", arguments="{"),
+            chunk(index=2, arguments='"status": "success"}'),
+        ]
+    )
+    deltas, ready = [], []
+
+    async def on_tool_call(call):
+        # Each call is complete when the next one starts
+        ready.append(call.function.name)
+
+    try:
+        message = await llm._stream_tool_response(
+            0, {"model": "gpt-4o"}, deltas.append, on_tool_call
+        )
+    finally:
+        LLM.release("test-stream-tool-calls")
+
+    assert message.content == "Let me look." and deltas == ["Let me ", "look."]
+    assert [
+        (call.id, call.function.name, call.function.arguments)
+        for call in message.tool_calls
+    ] == [
+        ("call_a", "web_search", '{"query": "openmanus"}'),
+        ("call_b", "bash", '{"command": "ls"}'),
+        ("call_c", "terminate", '{"status": "success"}'),
+    ]
+    assert ready == ["web_search", "bash", "terminate"]
+    assert llm.total_completion_tokens > 0
+
+
+@pytest.mark.asyncio
+async def test_calls_with_invalid_arguments_are_not_reported_early():
+    llm = streaming_llm(
+        [
+            chunk(index=0, call_id="call_a", name="bash", arguments='{"command": '),
+            chunk(index=1, call_id="call_b", name="terminate", arguments="{}"),
+        ]
+    )
+    ready = []
+
+    async def on_tool_call(call):
+        ready.append(call.function.name)
+
+    try:
+        message = await llm._stream_tool_response(0, {}, None, on_tool_call)
+    finally:
+        LLM.release("test-stream-tool-calls")
+
+    assert ready == ["terminate"]
+    # The message still carries both calls, the agent reports the bad arguments
+    assert [call.function.name for call in message.tool_calls] == ["bash", "terminate"]
+    assert message.content is None
+
+
+def test_streaming_tool_calls_is_opt_in():
+    assert LLMSettings.model_fields["stream_tool_calls"].default is False
+
+
+@pytest.mark.asyncio
+async def test_streamed_answers_are_only_printed_when_asked(capsys):
+    llm = streaming_llm([chunk(content="Hello"), chunk(content=" there")])
+    messages = [Message.user_message("Hi")]
+    try:
+        quiet = await llm.ask(messages, use_cache=False)
+        assert capsys.readouterr().out == ""
+
+        printed = await llm.ask(
+            messages, use_cache=False, stream_sink=print_stream_sink
+        )
+        assert capsys.readouterr().out == "Hello there\n"
+    finally:
+        LLM.release("test-stream-tool-calls")
+
+    assert quiet == printed == "Hello there"
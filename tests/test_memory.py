@@ -0,0 +1,319 @@
+import json
+
+import pytest
+
+from app.llm import LLM
+from app.memory import Memory
+from app.schema import Function, Message, ToolCall
+
+
+def tool_call(name: str, **arguments) -> Message:
+    call = ToolCall(
+        id=f"call_{name}",
+        function=Function(name=name, arguments=json.dumps(arguments)),
+    )
+    return Message.from_tool_calls(tool_calls=[call])
+
+
+def scroll() -> Message:
+    return tool_call("browser_use", action="scroll_down")
+
+
+def tool_result(content: str) -> Message:
+    return Message.tool_message(content, name="tool", tool_call_id="call")
+
+
+@pytest.mark.asyncio
+async def test_repeated_tool_calls_count_only_consecutive_repeats():
+    memory = Memory(max_messages=100, token_budget=None)
+    await memory.add_messages([scroll(), tool_result("page 1")])
+    assert memory.repeated_tool_call_count() == 0
+
+    # Interleaved with other actions, repeating a call is not a loop
+    for page in range(2, 5):
+        await memory.add_messages([tool_call("bash", command="ls"), tool_result("")])
+        await memory.add_messages([scroll(), tool_result(f"page {page}")])
+        assert memory.repeated_tool_call_count() == 0
+
+    await memory.add_messages([scroll(), tool_result("page 5")])
+    assert memory.repeated_tool_call_count() == 1
+    await memory.add_message(scroll())
+    assert memory.repeated_tool_call_count() == 2
+
+    await memory.add_message(tool_call("bash", command="ls"))
+    assert memory.repeated_tool_call_count() == 0
+    # An assistant answer without tool calls ends the run
+    await memory.add_message(Message.assistant_message("done"))
+    assert memory.repeated_tool_call_count() == 0
+
+
+def recount(memory: Memory) -> int:
+    return sum(memory.llm.count_message(message) for message in memory.messages)
+
+
+def long_result(i: int) -> Message:
+    return Message.tool_message(
+        f"result {i} " * 50, name="bash", tool_call_id=f"call_bash_{i}"
+    )
+
+
+@pytest.mark.asyncio
+async def test_token_count_follows_added_messages():
+    memory = Memory(llm=LLM(), max_messages=100, token_budget=None)
+    await memory.add_message(Message.system_message("You are an agent"))
+    await memory.add_messages([tool_call("bash", command="ls"), tool_result("a b")])
+    assert memory.token_count == recount(memory) > 0
+
+    # Changes made to the list directly are picked up too
+    memory.messages.pop()
+    assert memory.token_count == recount(memory)
+
+
+@pytest.mark.asyncio
+async def test_token_count_after_image_eviction():
+    memory = Memory(llm=LLM(), max_messages=100, token_budget=None, max_inline_images=1)
+    for i in range(3):
+        await memory.add_message(
+            Message.user_message(f"screenshot {i}", base64_image="aGVsbG8=" * 100)
+        )
+    assert [bool(message.base64_image) for message in memory.messages] == [
+        False,
+        False,
+        True,
+    ]
+    assert memory.token_count == recount(memory)
+
+
+@pytest.mark.asyncio
+async def test_token_count_after_compaction():
+    memory = Memory(
+        llm=LLM(),
+        max_messages=100,
+        token_budget=400,
+        compaction_target=0.5,
+        summarize=False,
+    )
+    await memory.add_message(Message.system_message("You are an agent"))
+    for i in range(6):
+        await memory.add_messages([tool_call("bash", step=i), long_result(i)])
+        assert memory.token_count == recount(memory) <= 400
+
+    # Compaction by message count keeps the total right as well
+    memory.max_messages = 3
+    await memory.add_message(Message.user_message("next"))
+    # Only the pinned groups are left: system, latest tool exchange, last turn
+    assert len(memory.messages) == 4
+    assert memory.token_count == recount(memory)
+
+
+def exchange(i: int, results: int = 1) -> list:
+    """An assistant tool call message followed by its tool results"""
+    calls = [
+        ToolCall(
+            id=f"call_{i}_{j}",
+            function=Function(name="bash", arguments=json.dumps({"step": i})),
+        )
+        for j in range(results)
+    ]
+    return [Message.from_tool_calls(tool_calls=calls)] + [
+        Message.tool_message(
+            f"result {i}.{j} " * 30, name="bash", tool_call_id=f"call_{i}_{j}"
+        )
+        for j in range(results)
+    ]
+
+
+def assert_exchanges_whole(messages: list) -> None:
+    """Every tool result follows the assistant message that requested it"""
+    requested = set()
+    for message in messages:
+        if message.tool_calls:
+            requested = {call.id for call in message.tool_calls}
+        elif message.role == "tool":
+            assert message.tool_call_id in requested
+        else:
+            requested = set()
+
+
+@pytest.mark.asyncio
+async def test_turn_groups_keep_tool_results_with_their_call():
+    memory = Memory(max_messages=100, token_budget=None)
+    await memory.add_message(Message.system_message("You are an agent"))
+    await memory.add_message(Message.user_message("task"))
+    await memory.add_messages(exchange(0, results=2))
+    await memory.add_message(Message.assistant_message("thinking"))
+    await memory.add_messages(exchange(1))
+
+    groups = memory._turn_groups()
+    assert groups == [(0, 1), (1, 2), (2, 5), (5, 6), (6, 8)]
+    # System message, the latest tool exchange (also the last turn)
+    assert memory._pinned_groups(groups) == {0, 4}
+
+    await memory.add_message(Message.user_message("next"))
+    groups = memory._turn_groups()
+    assert memory._pinned_groups(groups) == {0, 4, 5}
+
+
+@pytest.mark.asyncio
+async def test_compaction_never_splits_a_tool_exchange():
+    memory = Memory(max_messages=6, token_budget=None, summarize=False)
+    await memory.add_message(Message.system_message("You are an agent"))
+    for i in range(5):
+        await memory.add_messages(exchange(i, results=2))
+        assert len(memory.messages) <= 6
+        assert memory.messages[0].role == "system"
+        assert_exchanges_whole(memory.messages)
+
+    # Whole exchanges were evicted oldest first, the latest is kept
+    assert [message.tool_call_id for message in memory.messages[1:]] == [
+        None,
+        "call_4_0",
+        "call_4_1",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_compaction_reaches_the_target_and_keeps_pinned_groups():
+    memory = Memory(
+        llm=LLM(),
+        max_messages=100,
+        token_budget=600,
+        compaction_target=0.5,
+        summarize=False,
+    )
+    system = Message.system_message("You are an agent")
+    await memory.add_message(system)
+    compactions = 0
+    for i in range(8):
+        before = len(memory.messages)
+        await memory.add_messages(exchange(i))
+        if len(memory.messages) < before + 2:
+            compactions += 1
+            # Compaction goes down to the target, not just under the budget
+            assert memory.token_count <= 300
+        assert_exchanges_whole(memory.messages)
+
+    assert compactions > 0
+    assert memory.messages[0] is system
+    assert memory.messages[-1].tool_call_id == "call_7_0"
+
+
+@pytest.mark.asyncio
+async def test_compaction_summary_follows_the_system_message(monkeypatch):
+    llm = LLM()
+    summarized = []
+
+    async def ask(messages, **kwargs):
+        summarized.append(messages[0].content)
+        return "ran bash"
+
+    monkeypatch.setattr(llm, "ask", ask)
+    memory = Memory(llm=llm, max_messages=6, token_budget=None, summarize=True)
+    await memory.add_message(Message.system_message("You are an agent"))
+    for i in range(3):
+        await memory.add_messages(exchange(i))
+
+    assert len(summarized) == 1
+    assert "result 0.0" in summarized[0]
+    assert [message.role for message in memory.messages] == [
+        "system",
+        "user",
+        "assistant",
+        "tool",
+        "assistant",
+        "tool",
+    ]
+    assert memory.messages[1].content.endswith("ran bash")
+    assert memory.token_count == recount(memory)
+
+
+def screenshot(i: int, image_path=None) -> Message:
+    return Message.user_message(
+        f"screenshot {i}", base64_image=f"image{i}", image_path=image_path
+    )
+
+
+@pytest.mark.asyncio
+async def test_only_the_latest_images_stay_inline():
+    memory = Memory(max_messages=100, token_budget=None, max_inline_images=2)
+    first = screenshot(0, image_path="/workspace/shot0.png")
+    await memory.add_message(first)
+    await memory.add_messages([screenshot(1), Message.assistant_message("looked")])
+    await memory.add_messages([screenshot(2), screenshot(3)])
+
+    assert [message.base64_image for message in memory.messages] == [
+        None,
+        None,
+        None,
+        "image2",
+        "image3",
+    ]
+    assert memory.messages[0].content == (
+        "screenshot 0\n[Image omitted, saved at /workspace/shot0.png]"
+    )
+    assert memory.messages[1].content == "screenshot 1\n[Image omitted]"
+    # The evicted message is replaced, not changed in place
+    assert first.base64_image == "image0" and first.content == "screenshot 0"
+
+
+@pytest.mark.asyncio
+async def test_images_are_kept_without_a_limit():
+    memory = Memory(max_messages=100, token_budget=None, max_inline_images=None)
+    await memory.add_messages([screenshot(i) for i in range(4)])
+    assert all(message.base64_image for message in memory.messages)
+
+    memory.max_inline_images = 0
+    await memory.add_message(Message.user_message("no images"))
+    assert not any(message.base64_image for message in memory.messages)
+
+
+@pytest.mark.asyncio
+async def test_wire_list_only_formats_new_messages():
+    memory = Memory(max_messages=100, token_budget=None, max_inline_images=1)
+    await memory.add_message(Message.system_message("You are an agent"))
+    await memory.add_message(Message.user_message("look", base64_image="aW1n"))
+    wire = memory.to_wire(True)
+    assert memory.to_wire(True) is wire and len(wire) == 2
+    first = wire[1]
+
+    await memory.add_message(Message.assistant_message("ok"))
+    # Messages appended to the list directly are picked up too
+    memory.messages.append(Message.user_message("more"))
+    assert memory.to_wire(True) is wire
+    assert [message["role"] for message in wire] == [
+        "system",
+        "user",
+        "assistant",
+        "user",
+    ]
+    assert wire[1] is first
+    assert memory.to_wire(False) == memory.to_dict_list()[:1] + [
+        {"role": "user", "content": "look"},
+        {"role": "assistant", "content": "ok"},
+        {"role": "user", "content": "more"},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_wire_list_is_rebuilt_after_eviction_and_compaction():
+    memory = Memory(
+        max_messages=4, token_budget=None, max_inline_images=1, summarize=False
+    )
+    await memory.add_message(Message.user_message("first", base64_image="aW1n"))
+    wire = memory.to_wire(True)
+    assert wire[0]["content"][1]["type"] == "image_url"
+
+    await memory.add_message(Message.user_message("second", base64_image="aW1n"))
+    evicted = memory.to_wire(True)
+    assert evicted[0]["content"] == "first\n[Image omitted]"
+    assert evicted[1]["content"][1]["type"] == "image_url"
+
+    for i in range(4):
+        await memory.add_message(Message.user_message(f"m{i}"))
+    compacted = memory.to_wire(True)
+    assert [message["content"] for message in compacted] == ["m0", "m1", "m2", "m3"]
+
+    memory.messages.pop()
+    assert len(memory.to_wire(True)) == 3
+    memory.clear()
+    assert memory.to_wire(True) == []
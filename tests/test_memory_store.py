@@ -0,0 +1,172 @@
+import asyncio
+import sqlite3
+
+import pytest
+import pytest_asyncio
+
+import app.memory
+from app.apis.services.broker import TaskJob
+from app.apis.services.task_runner import build_agent
+from app.memory import Memory
+from app.memory_store import SQLiteMemoryStore
+from app.schema import Message
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "memory.sqlite")
+
+
+@pytest_asyncio.fixture
+async def store(path):
+    store = SQLiteMemoryStore(path, batch_size=3, flush_interval=60)
+    yield store
+    await store.close()
+
+
+def stored_rows(path: str) -> list:
+    """Rows as another process sees them"""
+    db = sqlite3.connect(path)
+    try:
+        return db.execute(
+            "SELECT task_id, seq, active FROM memory_messages ORDER BY seq"
+        ).fetchall()
+    except sqlite3.OperationalError:  # Not created yet
+        return []
+    finally:
+        db.close()
+
+
+async def until(predicate):
+    for _ in range(1000):
+        if predicate():
+            return
+        await asyncio.sleep(0.001)
+    raise AssertionError("Condition not reached")
+
+
+@pytest.mark.asyncio
+async def test_writes_are_batched_behind_the_caller(store, path):
+    store.save("task", [(0.0, Message.user_message("a"))])
+    store.save("task", [(1.0, Message.user_message("b"))])
+    await asyncio.sleep(0.01)
+    # Below the batch size and before the flush interval nothing is written
+    assert stored_rows(path) == []
+
+    store.save("task", [(2.0, Message.user_message("c"))])
+    await until(lambda: len(stored_rows(path)) == 3)
+
+    store.deactivate("task", [0.0])
+    await store.flush()
+    assert stored_rows(path) == [
+        ("task", 0.0, 0),
+        ("task", 1.0, 1),
+        ("task", 2.0, 1),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_flush_interval_writes_small_batches(path):
+    store = SQLiteMemoryStore(path, batch_size=100, flush_interval=0.01)
+    try:
+        store.save("task", [(0.0, Message.user_message("a"))])
+        await until(lambda: len(stored_rows(path)) == 1)
+    finally:
+        await store.close()
+
+
+@pytest.mark.asyncio
+async def test_conversation_survives_a_restart(store, path):
+    store.save("task", [(float(i), Message.user_message(f"m{i}")) for i in range(4)])
+    store.save("other", [(0.0, Message.user_message("other"))])
+    store.deactivate("task", [0.0, 1.0])
+    await store.close()
+
+    reopened = SQLiteMemoryStore(path)
+    try:
+        active = await reopened.load("task")
+        assert [(seq, message.content) for seq, message in active] == [
+            (2.0, "m2"),
+            (3.0, "m3"),
+        ]
+        history = await reopened.history("task", before=2.0, limit=1)
+        assert [message.content for _, message in history] == ["m1"]
+
+        reopened.delete("task")
+        assert await reopened.load("task") == []
+        assert len(await reopened.load("other")) == 1
+    finally:
+        await reopened.close()
+
+
+@pytest.mark.asyncio
+async def test_memory_resumes_where_it_left_off(store, path):
+    memory = Memory(max_messages=4, token_budget=None, summarize=False)
+    memory.attach_store("task", store)
+    await memory.add_message(Message.system_message("You are an agent"))
+    for i in range(5):
+        await memory.add_message(Message.user_message(f"m{i}"))
+    await memory.flush()
+    await store.close()
+
+    reopened = SQLiteMemoryStore(path)
+    resumed = Memory(max_messages=4, token_budget=None, summarize=False)
+    try:
+        assert await resumed.resume("task", reopened) == 4
+        assert [message.content for message in resumed.messages] == [
+            "You are an agent",
+            "m2",
+            "m3",
+            "m4",
+        ]
+        assert resumed.token_count == memory.token_count
+        history = await resumed.load_history()
+        assert [message.content for _, message in history] == ["m0", "m1"]
+
+        # New messages are stored after the resumed ones
+        await resumed.add_message(Message.user_message("m5"))
+        await resumed.flush()
+        active = await reopened.load("task")
+        assert [message.content for _, message in active][-1] == "m5"
+        assert active[-1][0] > active[-2][0]
+    finally:
+        await reopened.close()
+
+
+@pytest.mark.asyncio
+async def test_nothing_to_resume(store):
+    memory = Memory()
+    assert await memory.resume("unknown", store) == 0
+    assert memory.store is None and memory.messages == []
+
+
+@pytest.mark.asyncio
+async def test_restart_resumes_before_the_agent_is_prepared(store, monkeypatch):
+    monkeypatch.setattr(app.memory, "get_memory_store", lambda: store)
+
+    agent = await build_agent(TaskJob(task_id="task", prompt="hello"))
+    # What the first run's `Manus.prepare` and `run` store
+    await agent.update_memory("system", "You are an agent")
+    await agent.update_memory("user", "hello")
+    await agent.memory.flush()
+
+    restarted = await build_agent(TaskJob(task_id="task", prompt="go", restart=True))
+    assert restarted.memory.store is store
+    # `Manus.prepare` sees the resumed system prompt and does not add another
+    assert [message.role for message in restarted.memory.messages] == [
+        "system",
+        "user",
+    ]
+
+    # A restart with an explicit history starts over from that history
+    replayed = await build_agent(
+        TaskJob(
+            task_id="task",
+            prompt="go",
+            restart=True,
+            history=[{"role": "user", "message": "earlier"}],
+        )
+    )
+    assert [message.content for message in replayed.memory.messages] == ["earlier"]
+    await replayed.memory.flush()
+    assert [message.content for _, message in await store.load("task")] == ["earlier"]
@@ -0,0 +1,52 @@
+import pytest
+
+from app.metrics import MetricsRegistry
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    histogram = registry.histogram(
+        "test_duration_seconds", "Test durations", labels=("outcome",), buckets=(1, 0.5)
+    )
+    for value in (0.2, 0.5, 0.7, 3):
+        histogram.observe(value, outcome="ok")
+    histogram.observe(0.1, outcome="error")
+
+    assert registry.render().splitlines() == [
+        "# HELP test_duration_seconds Test durations",
+        "# TYPE test_duration_seconds histogram",
+        'test_duration_seconds_bucket{outcome="error",le="0.5"} 1',
+        'test_duration_seconds_bucket{outcome="error",le="1"} 1',
+        'test_duration_seconds_bucket{outcome="error",le="+Inf"} 1',
+        'test_duration_seconds_sum{outcome="error"} 0.1',
+        'test_duration_seconds_count{outcome="error"} 1',
+        'test_duration_seconds_bucket{outcome="ok",le="0.5"} 2',
+        'test_duration_seconds_bucket{outcome="ok",le="1"} 3',
+        'test_duration_seconds_bucket{outcome="ok",le="+Inf"} 4',
+        'test_duration_seconds_sum{outcome="ok"} 4.4',
+        'test_duration_seconds_count{outcome="ok"} 4',
+    ]
+    assert histogram.count(outcome="ok") == 4
+
+
+def test_counter_and_callback_gauge_rendering():
+    registry = MetricsRegistry()
+    counter = registry.counter("test_total", 'Quoted "help"\nline', labels=("kind",))
+    counter.inc(kind='say "hi"')
+    counter.inc(2, kind='say "hi"')
+    registry.gauge(
+        "test_queued", "Queued items", labels=("owner",), callback=lambda: [(("a",), 3)]
+    )
+
+    assert registry.render().splitlines() == [
+        '# HELP test_total Quoted "help"\\nline',
+        "# TYPE test_total counter",
+        'test_total{kind="say \\"hi\\""} 3',
+        "# HELP test_queued Queued items",
+        "# TYPE test_queued gauge",
+        'test_queued{owner="a"} 3',
+    ]
+    with pytest.raises(ValueError):
+        counter.inc(-1, kind="x")
+    with pytest.raises(ValueError):
+        counter.inc(kind="x", extra="y")
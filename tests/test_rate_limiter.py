@@ -0,0 +1,135 @@
+import asyncio
+from typing import List
+
+import pytest
+
+from app import rate_limiter as rate_limiter_module
+from app.rate_limiter import RateLimiter, TokenBucket, llm_request_owner
+
+
+class FakeClock:
+    """Stands in for the `time` module of the rate limiter"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> FakeClock:
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter_module, "time", clock)
+    return clock
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+async def advance(limiter: RateLimiter, clock: FakeClock, seconds: float):
+    """Move the clock and let the dispatcher recheck its waiting requests"""
+    clock.now += seconds
+    if limiter._wakeup is not None:
+        limiter._wakeup.set()
+    await settle()
+
+
+class Requests:
+    """Requests made through a limiter, holding their slot until released"""
+
+    def __init__(self, limiter: RateLimiter):
+        self.limiter = limiter
+        self.admitted: List[str] = []
+        self.release = asyncio.Event()
+        self.tasks: List[asyncio.Task] = []
+
+    def send(self, name: str, tokens: int = 0, owner: str = "default"):
+        async def request():
+            llm_request_owner.set(owner)
+            async with self.limiter.acquire(tokens):
+                self.admitted.append(name)
+                await self.release.wait()
+
+        self.tasks.append(asyncio.create_task(request()))
+
+    async def finish(self):
+        self.release.set()
+        await asyncio.gather(*self.tasks)
+
+
+def test_token_bucket_refills_continuously_up_to_capacity(clock):
+    bucket = TokenBucket(60)
+    bucket.consume(60)
+    assert bucket.wait_time(1) == pytest.approx(1.0)
+
+    clock.now += 0.5
+    assert bucket.wait_time(1) == pytest.approx(0.5)
+    clock.now += 0.5
+    assert bucket.wait_time(1) == 0
+
+    clock.now += 600
+    bucket.consume(0)
+    assert bucket.tokens == 60
+    # More than the capacity only ever waits for a full bucket
+    assert bucket.wait_time(1000) == 0
+
+
+@pytest.mark.asyncio
+async def test_requests_per_minute(clock):
+    limiter = RateLimiter("test", requests_per_minute=2)
+    requests = Requests(limiter)
+    for name in ("first", "second", "third"):
+        requests.send(name)
+    await settle()
+    assert requests.admitted == ["first", "second"]
+    assert limiter.queue_depth == 1
+
+    # One request is refilled every 30 seconds
+    await advance(limiter, clock, 29)
+    assert requests.admitted == ["first", "second"]
+    await advance(limiter, clock, 1)
+    assert requests.admitted == ["first", "second", "third"]
+    await requests.finish()
+    assert limiter.stats()["max_wait_seconds"] == 30
+
+
+@pytest.mark.asyncio
+async def test_tokens_per_minute(clock):
+    limiter = RateLimiter("test", tokens_per_minute=1200)
+    requests = Requests(limiter)
+    requests.send("large", tokens=1000)
+    requests.send("small", tokens=400)
+    await settle()
+    assert requests.admitted == ["large"]
+
+    # 200 tokens are left, the other 200 take 10 seconds at 20 per second
+    await advance(limiter, clock, 9)
+    assert requests.admitted == ["large"]
+    await advance(limiter, clock, 1)
+    assert requests.admitted == ["large", "small"]
+    await requests.finish()
+
+
+@pytest.mark.asyncio
+async def test_waiting_owners_are_served_round_robin(clock):
+    limiter = RateLimiter("test", max_concurrent_requests=1)
+    running = Requests(limiter)
+    running.send("running")
+    await settle()
+
+    waiting = Requests(limiter)
+    for i in range(3):
+        waiting.send(f"busy-{i}", owner="busy")
+    waiting.send("quiet-0", owner="quiet")
+    await settle()
+    assert limiter.queue_depth == 4
+
+    # Each request gets the slot in turn as soon as it is released
+    waiting.release.set()
+    await running.finish()
+    await asyncio.gather(*waiting.tasks)
+    assert waiting.admitted == ["busy-0", "quiet-0", "busy-1", "busy-2"]
+    assert limiter.in_flight == 0 and limiter.queue_depth == 0
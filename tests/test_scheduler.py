@@ -0,0 +1,122 @@
+import asyncio
+from typing import Dict, List
+
+import pytest
+
+from app.apis.services.task_manager import TaskRejected, TaskScheduler
+from app.config import TaskSchedulerSettings
+
+
+class Runs:
+    """Runs that record their start and block until finished"""
+
+    def __init__(self):
+        self.started: List[str] = []
+        self._finish: Dict[str, asyncio.Event] = {}
+
+    def __call__(self, task_id: str):
+        finish = self._finish[task_id] = asyncio.Event()
+
+        async def run():
+            self.started.append(task_id)
+            await finish.wait()
+
+        return run
+
+    def finish(self, *task_ids: str) -> None:
+        for task_id in task_ids or list(self._finish):
+            self._finish[task_id].set()
+
+
+def scheduler(**settings) -> TaskScheduler:
+    return TaskScheduler(
+        notify=lambda task_id, event_name, content: None,
+        settings=TaskSchedulerSettings(**settings),
+    )
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_free_slots_go_to_the_least_served_organization():
+    tasks = scheduler(max_running=2)
+    runs = Runs()
+    # A burst from one organization takes every slot, then another one submits
+    for i in range(4):
+        tasks.submit(f"busy/{i}", runs(f"busy/{i}"))
+    tasks.submit("quiet/0", runs("quiet/0"))
+    await settle()
+    assert runs.started == ["busy/0", "busy/1"]
+
+    # The organization without a running task gets the slot, despite its place
+    runs.finish("busy/0")
+    await settle()
+    assert runs.started == ["busy/0", "busy/1", "quiet/0"]
+
+    runs.finish("busy/1")
+    await settle()
+    assert runs.started[-1] == "busy/2"
+    runs.finish()
+    await settle()
+    assert runs.started[-1] == "busy/3"
+
+
+@pytest.mark.asyncio
+async def test_per_organization_limit():
+    tasks = scheduler(max_running=3, max_running_per_org=2)
+    runs = Runs()
+    for i in range(3):
+        tasks.submit(f"a/{i}", runs(f"a/{i}"))
+    tasks.submit("b/0", runs("b/0"))
+    await settle()
+    assert sorted(runs.started) == ["a/0", "a/1", "b/0"]
+    assert tasks.stats()["organizations"]["a"] == {"running": 2, "queued": 1}
+    runs.finish()
+    await settle()
+
+
+@pytest.mark.asyncio
+async def test_waiting_tasks_start_by_priority_then_submission_order():
+    tasks = scheduler(max_running=1)
+    runs = Runs()
+    tasks.submit("org/first", runs("org/first"))
+    tasks.submit("org/low", runs("org/low"), priority=0)
+    tasks.submit("org/high", runs("org/high"), priority=5)
+    tasks.submit("org/low-2", runs("org/low-2"), priority=0)
+    runs.finish()
+    await settle()
+    assert runs.started == ["org/first", "org/high", "org/low", "org/low-2"]
+
+
+@pytest.mark.asyncio
+async def test_unlimited_by_default():
+    tasks = scheduler()
+    runs = Runs()
+    for i in range(10):
+        tasks.submit(f"org/{i}", runs(f"org/{i}"))
+    await settle()
+    assert len(runs.started) == 10 and tasks.queued == 0
+    runs.finish()
+    await settle()
+
+
+@pytest.mark.asyncio
+async def test_max_queued_and_restart_replacing_a_waiting_run():
+    tasks = scheduler(max_running=1, max_queued=1)
+    runs = Runs()
+    tasks.submit("org/running", runs("org/running"))
+    tasks.submit("org/waiting", runs("org/waiting"))
+    with pytest.raises(TaskRejected):
+        tasks.submit("org/other", runs("org/other"))
+
+    # Restarting the waiting task replaces its run instead of taking a place
+    tasks.check_capacity("org/waiting")
+    tasks.submit("org/waiting", runs("org/restarted"))
+    assert tasks.queued == 1
+
+    runs.finish()
+    await settle()
+    assert runs.started == ["org/running", "org/restarted"]
@@ -0,0 +1,43 @@
+from app.schema import Function, Message, ToolCall
+
+
+def bash_call(command: str) -> ToolCall:
+    return ToolCall(
+        id=f"call_{command}", function=Function(name="bash", arguments=command)
+    )
+
+
+def test_wire_dict_is_built_once():
+    message = Message.user_message("look", base64_image="aW1hZ2U=")
+    with_images = message.to_wire(True)
+    assert message.to_wire(True) is with_images
+    assert with_images["content"][1]["image_url"]["url"].endswith("aW1hZ2U=")
+
+    # Each images setting has its own entry, built from the plain dict
+    without_images = message.to_wire(False)
+    assert without_images == {"role": "user", "content": "look"}
+    assert message.to_wire(False) is without_images
+    assert message.to_dict()["base64_image"] == "aW1hZ2U="
+
+
+def test_field_assignment_invalidates_the_wire_dict():
+    message = Message.from_tool_calls([bash_call("ls")])
+    before = message.to_wire(False)
+
+    message.tool_calls = message.tool_calls + [bash_call("pwd")]
+    after = message.to_wire(False)
+    assert after is not before
+    assert [call["id"] for call in after["tool_calls"]] == ["call_ls", "call_pwd"]
+
+    message.base64_image = "aW1hZ2U="
+    assert message.to_wire(True)["content"][0]["type"] == "image_url"
+    message.base64_image = None
+    assert message.to_wire(True) == message.to_wire(False)
+
+
+def test_copies_do_not_share_the_wire_dict():
+    message = Message.assistant_message("first")
+    message.to_wire(False)
+    copied = message.model_copy(update={"content": "second"})
+    assert copied.to_wire(False)["content"] == "second"
+    assert message.to_wire(False)["content"] == "first"
@@ -0,0 +1,62 @@
+import pytest
+
+from app.apis.models.task import TaskStatus
+from app.apis.services.task_index import TaskIndex
+
+
+def ids(page):
+    return [entry.id for entry in page.tasks]
+
+
+def index_of(count: int) -> TaskIndex:
+    index = TaskIndex()
+    for i in range(count):
+        index.add(f"{'a' if i % 2 else 'b'}/{i}", "a" if i % 2 else "b")
+    return index
+
+
+def test_pages_are_newest_first_and_cover_every_task_once():
+    index = index_of(7)
+    first = index.page(limit=3)
+    assert ids(first) == ["b/6", "a/5", "b/4"]
+    second = index.page(cursor=first.next_cursor, limit=3)
+    assert ids(second) == ["a/3", "b/2", "a/1"]
+    last = index.page(cursor=second.next_cursor, limit=3)
+    assert ids(last) == ["b/0"] and last.next_cursor is None
+
+
+def test_cursor_is_stable_when_tasks_are_added_or_removed():
+    index = index_of(7)
+    first = index.page(limit=3)
+
+    # The last task of the page and the first of the next one go away, a new
+    # task arrives: the next page continues where the first one ended
+    index.remove("b/4")
+    index.remove("a/3")
+    index.add("a/7", "a")
+    assert ids(index.page(cursor=first.next_cursor, limit=3)) == ["b/2", "a/1", "b/0"]
+
+
+def test_filters_by_status_and_organization():
+    index = index_of(6)
+    index.update("a/1", status=TaskStatus.RUNNING)
+    index.update("a/3", status=TaskStatus.RUNNING)
+    index.update("b/2", status=TaskStatus.RUNNING)
+
+    assert ids(index.page(status=TaskStatus.RUNNING)) == ["a/3", "b/2", "a/1"]
+    assert ids(index.page(organization="a")) == ["a/5", "a/3", "a/1"]
+    both = index.page(status=TaskStatus.RUNNING, organization="a", limit=1)
+    assert ids(both) == ["a/3"]
+    assert ids(
+        index.page(status=TaskStatus.RUNNING, organization="a", cursor=both.next_cursor)
+    ) == ["a/1"]
+    assert index.counts() == {"queued": 3, "running": 3}
+
+    # A restart keeps the task's place in the listing
+    index.add("a/1", "a")
+    assert ids(index.page(status=TaskStatus.QUEUED)) == ["a/5", "b/4", "a/1", "b/0"]
+
+
+def test_invalid_cursor():
+    with pytest.raises(ValueError):
+        index_of(1).page(cursor="not a cursor")
@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+
+from app.agent.manus import Manus
+from app.apis.models.task import TaskStatus
+from app.apis.routes.tasks import agent_state
+from app.apis.services.broker import InProcessBroker
+from app.apis.services.task_manager import TaskManager
+from app.llm import llm_usage
+
+
+@pytest.mark.asyncio
+async def test_replaced_run_does_not_overwrite_the_restart_status():
+    manager = TaskManager(broker=InProcessBroker())
+    manager.index.add("org/task", "org", run_id="first")
+    await manager.broker.set_state("org/task", run_id="first")
+    assert await manager.set_status("org/task", TaskStatus.RUNNING, run_id="first")
+
+    # A restart queues a new run while the first one is still stopping
+    manager.index.add("org/task", "org", run_id="second")
+    await manager.broker.set_state("org/task", run_id="second")
+    assert await manager.set_status("org/task", TaskStatus.QUEUED, run_id="second")
+
+    assert not await manager.set_status(
+        "org/task", TaskStatus.TERMINATED, run_id="first"
+    )
+    assert manager.index.get("org/task").status == TaskStatus.QUEUED
+    assert (await manager.broker.get_state("org/task"))["status"] == "queued"
+
+    # Nor does a run of a task that was removed meanwhile recreate its state
+    await manager.remove_task("org/task")
+    assert not await manager.set_status(
+        "org/task", TaskStatus.COMPLETED, run_id="second"
+    )
+    assert await manager.broker.get_state("org/task") is None
+
+
+@pytest.mark.asyncio
+async def test_sync_index_follows_the_broker_state_of_worker_tasks():
+    broker = InProcessBroker()
+    broker.distributed = True
+    manager = TaskManager(broker=broker)
+    for task_id in ("org/done", "org/evicted", "org/waiting"):
+        manager.index.add(task_id, "org", run_id="run")
+        await broker.set_state(task_id, status="queued", run_id="run")
+
+    # Workers ran one task to the end and already evicted another
+    await broker.set_state("org/done", status="completed")
+    await broker.delete("org/evicted")
+
+    await manager.sync_index(["org/done", "org/evicted"])
+    assert manager.index.get("org/done").status == TaskStatus.COMPLETED
+    assert manager.index.get("org/done").finished_at is not None
+    assert manager.index.get("org/evicted") is None
+
+    await broker.delete("org/waiting")
+    await manager.sync_index()
+    assert manager.index.ids() == ["org/done"]
+
+
+@pytest.mark.asyncio
+async def test_tasks_sharing_the_default_llm_report_their_own_tokens():
+    manager = TaskManager(broker=InProcessBroker())
+    first, second = Manus(enable_event_queue=False), Manus(enable_event_queue=False)
+    assert first.llm is second.llm
+
+    async def run(task_id: str, agent: Manus, tokens: int):
+        manager.index.add(task_id, "org")
+        task = manager.create_task(task_id, agent)
+        # What `run_task` sets up before the agent runs
+        llm_usage.set(task.usage)
+        for _ in range(2):
+            agent.llm.update_token_count(tokens, completion_tokens=1)
+            await asyncio.sleep(0)
+        await manager.update_task_progress(task_id, "agent:step:complete", step=1)
+
+    await asyncio.gather(
+        asyncio.create_task(run("org/first", first, 10)),
+        asyncio.create_task(run("org/second", second, 100)),
+    )
+
+    for task_id, tokens in (("org/first", 20), ("org/second", 200)):
+        task = manager.tasks[task_id]
+        entry = manager.index.get(task_id)
+        assert (entry.total_input_tokens, entry.total_completion_tokens) == (tokens, 2)
+        state = agent_state(task)
+        assert (state["total_input_tokens"], state["total_completion_tokens"]) == (
+            tokens,
+            2,
+        )
+        summary = manager.lifecycle.summarize(task)
+        assert summary.total_input_tokens == tokens
+        assert summary.total_completion_tokens == 2
@@ -0,0 +1,147 @@
+import asyncio
+import json
+from types import SimpleNamespace
+from typing import List
+
+import pytest
+from mcp import ClientSession
+from mcp.types import ListToolsResult, TextContent, Tool
+
+import app.agent.toolcall as toolcall_module
+from app.agent.toolcall import ToolCallContextHelper
+from app.memory import Memory
+from app.schema import Function, ToolCall
+from app.tool.mcp import MCPClients, is_concurrency_safe
+
+
+class FakeSession(ClientSession):
+    """MCP session recording how many tool calls run at the same time."""
+
+    def __init__(self, names: List[str]):  # No transport, so no super().__init__
+        self.names = names
+        self.running = 0
+        self.max_running = 0
+        self.log = []
+
+    async def initialize(self):
+        pass
+
+    async def list_tools(self):
+        return ListToolsResult(
+            tools=[
+                Tool(name=name, description=name, inputSchema={}) for name in self.names
+            ]
+        )
+
+    async def call_tool(self, name: str, arguments: dict):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        self.log.append(("start", arguments["n"]))
+        await asyncio.sleep(0.01)
+        self.log.append(("end", arguments["n"]))
+        self.running -= 1
+        return SimpleNamespace(
+            content=[TextContent(type="text", text=json.dumps(arguments))]
+        )
+
+
+async def connect(session: FakeSession, concurrency_safe) -> MCPClients:
+    client = MCPClients("srv")
+    client.session = session
+    client.concurrency_safe = concurrency_safe
+    await client._initialize_and_list_tools()
+    return client
+
+
+def calls(*names: str) -> List[ToolCall]:
+    return [
+        ToolCall(
+            id=f"call_{n}",
+            function=Function(name=f"srv-{name}", arguments=json.dumps({"n": n})),
+        )
+        for n, name in enumerate(names)
+    ]
+
+
+def helper(monkeypatch, client: MCPClients, max_parallel: int):
+    # The sandbox host needs Docker, the MCP client here talks to a fake session
+    monkeypatch.setattr(toolcall_module, "MCPToolCallSandboxHost", lambda _: None)
+    agent = SimpleNamespace(
+        task_id="task",
+        emit=lambda *args, **kwargs: None,
+        memory=Memory(max_messages=100, token_budget=None),
+    )
+    helper = ToolCallContextHelper(agent)
+    helper.available_tools = client
+    helper.max_parallel_tool_calls = max_parallel
+    return helper
+
+
+def test_server_config_and_annotations_opt_in():
+    read = SimpleNamespace(name="read", annotations=None)
+    assert not is_concurrency_safe(read, False)
+    assert is_concurrency_safe(read, True)
+    assert is_concurrency_safe(read, ["read"])
+    assert not is_concurrency_safe(read, ["write"])
+
+    annotated = SimpleNamespace(
+        name="read", annotations=SimpleNamespace(readOnlyHint=True)
+    )
+    assert is_concurrency_safe(annotated, False)
+
+
+@pytest.mark.asyncio
+async def test_mcp_tools_are_serial_by_default(monkeypatch):
+    session = FakeSession(["read"])
+    client = await connect(session, False)
+    assert not client.tool_map["srv-read"].concurrency_safe
+
+    runner = helper(monkeypatch, client, max_parallel=4)
+    runner.tool_calls = calls("read", "read", "read")
+    await runner.execute_tool()
+    assert session.max_running == 1
+
+
+@pytest.mark.asyncio
+async def test_safe_batch_runs_within_the_parallel_limit(monkeypatch):
+    session = FakeSession(["read"])
+    client = await connect(session, True)
+    runner = helper(monkeypatch, client, max_parallel=2)
+    runner.tool_calls = calls(*["read"] * 5)
+
+    results = await runner.execute_tool()
+
+    assert session.max_running == 2
+    # Results and tool messages keep the order of the calls
+    assert [json.loads(result.split("\n")[1])["n"] for result in results] == [
+        0,
+        1,
+        2,
+        3,
+        4,
+    ]
+    assert [message.tool_call_id for message in runner.agent.memory.messages] == [
+        f"call_{n}" for n in range(5)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_unsafe_call_splits_the_batch(monkeypatch):
+    session = FakeSession(["read", "write"])
+    client = await connect(session, ["read"])
+    assert client.tool_map["srv-read"].concurrency_safe
+    assert not client.tool_map["srv-write"].concurrency_safe
+    runner = helper(monkeypatch, client, max_parallel=4)
+    runner.tool_calls = calls("read", "read", "write", "read", "read")
+
+    await runner.execute_tool()
+
+    starts = [event for event in session.log if event[0] == "start"]
+    # The reads before the write run together, the write runs alone after them
+    assert session.log[:2] == [("start", 0), ("start", 1)]
+    write = session.log.index(("start", 2))
+    assert {("end", 0), ("end", 1)} <= set(session.log[:write])
+    assert session.log[write + 1] == ("end", 2)
+    # The reads after the write run together again
+    assert session.log[write + 2 : write + 4] == [("start", 3), ("start", 4)]
+    assert len(starts) == 5 and session.max_running == 2
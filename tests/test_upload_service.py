@@ -0,0 +1,70 @@
+from io import BytesIO
+from pathlib import Path
+
+import pytest
+from fastapi import UploadFile
+
+from app.apis.services.upload_service import UploadRejected, save_upload
+from app.config import UploadSettings
+
+
+def upload(filename: str, data: bytes, size_known: bool = True) -> UploadFile:
+    return UploadFile(
+        BytesIO(data), filename=filename, size=len(data) if size_known else None
+    )
+
+
+def part_files(task_dir: Path):
+    return [path.name for path in task_dir.iterdir() if path.name.endswith(".part")]
+
+
+@pytest.mark.asyncio
+async def test_save_upload_copies_in_chunks(tmp_path):
+    settings = UploadSettings(chunk_size=4)
+    saved = await save_upload(
+        upload("../notes.txt", b"hello world"), tmp_path, settings
+    )
+
+    # Directory components of the client's filename are dropped
+    assert (saved.filename, saved.size, saved.sha256) == ("notes.txt", 11, None)
+    assert (tmp_path / "notes.txt").read_bytes() == b"hello world"
+    assert part_files(tmp_path) == []
+
+
+@pytest.mark.asyncio
+async def test_save_upload_rejects_files_over_the_size_limit(tmp_path):
+    settings = UploadSettings(max_file_size=8, chunk_size=4)
+    with pytest.raises(UploadRejected):
+        await save_upload(upload("big.bin", b"x" * 9), tmp_path, settings)
+
+    # Without a declared size the limit is enforced while copying, and the
+    # partial file is removed
+    with pytest.raises(UploadRejected):
+        await save_upload(
+            upload("big.bin", b"x" * 9, size_known=False), tmp_path, settings
+        )
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_save_upload_rejects_missing_filename(tmp_path):
+    with pytest.raises(UploadRejected):
+        await save_upload(upload("", b"data"), tmp_path)
+
+
+@pytest.mark.asyncio
+async def test_save_upload_dedupe_reuses_identical_files(tmp_path):
+    settings = UploadSettings(dedupe=True, chunk_size=4)
+    first = await save_upload(upload("data.csv", b"a,b\n1,2\n"), tmp_path, settings)
+    assert not first.reused and first.sha256
+
+    target = tmp_path / "data.csv"
+    mtime = target.stat().st_mtime_ns
+    again = await save_upload(upload("data.csv", b"a,b\n1,2\n"), tmp_path, settings)
+    assert again.reused and again.sha256 == first.sha256
+    assert target.stat().st_mtime_ns == mtime
+    assert part_files(tmp_path) == []
+
+    changed = await save_upload(upload("data.csv", b"a,b\n3,4\n"), tmp_path, settings)
+    assert not changed.reused and changed.sha256 != first.sha256
+    assert target.read_bytes() == b"a,b\n3,4\n"